@@ -1,9 +1,40 @@
+import copy
 from dataclasses import dataclass
 import logging
+import mmap
+import os
+
+from bitey.cpu.cpu import (
+    CPU,
+    CPUState,
+    CPUStateChange,
+    CPUWatchpoint,
+    RunResult,
+    StopReason,
+    log_instruction,
+)
+from bitey.cpu.instruction.instruction import (
+    UndocumentedInstruction,
+    UndocumentedOpcode,
+)
+from bitey.memory.mapped_memory import MappedMemory, MemoryMapError
+from bitey.memory.memory import Memory, MemoryOutOfRange
 
-from bitey.cpu.cpu import CPU, CPUState, CPUStateChange
-from bitey.cpu.instruction.instruction import UndocumentedInstruction
-from bitey.memory.memory import Memory
+
+@dataclass
+class Snapshot:
+    """
+    A snapshot of the state of a computer, see Computer.snapshot
+    """
+
+    registers: list
+    "The register file, including the flags byte in the P register"
+
+    cycles: int
+    "The number of clock cycles executed"
+
+    memory: tuple
+    "The memory pages, see Memory.snapshot"
 
 
 @dataclass
@@ -24,51 +55,143 @@ class Computer:
         Initialize the computer
         """
         self.logger = logging.getLogger("bitey.computer.computer.Computer")
+        self.block_compiler = None
         self.cpu.reset(self.memory)
 
-    def build_from_json(json_data):
+    def build_from_json(json_data, instruction_set=None, cache=True):
         """
         Build a computer from a JSON representation
+        instruction_set is an optional instruction set to share with
+        other computers and cache selects the chip cache, see
+        CPU.build_from_json
         """
         logger = logging.getLogger("bitey.computer.computer.Computer")
         logger.debug("Building computer")
-        cpu = CPU.build_from_json(json_data)
+        cpu = CPU.build_from_json(json_data, instruction_set, cache)
         logger.debug("Allocating memory")
-        memory = Memory(bytearray(65536))
+        memory = Memory(65536)
 
         return Computer(cpu, memory)
 
     def load(self, data, offset=0):
         """
         Load data into memory
-        Loads data into memory at offset
+        Loads data into memory at offset, data past the end of memory
+        is dropped
         """
-        for byte in data:
-            if offset < len(self.memory):
-                self.memory.write(offset, byte)
-                offset += 1
-            else:
-                break
+        if offset < len(self.memory):
+            self.memory.write_range(offset, data[: len(self.memory) - offset])
+
+    def load_image(self, path, base=0, readonly=True):
+        """
+        Load a binary image file into memory at base
+
+        If readonly is True the image is ROM.  The file is mapped with
+        mmap and the pages are backed by the mapping directly, so
+        nothing is copied and the file is only read as it is accessed.
+        This needs a MappedMemory and a page aligned base.  If the
+        image doesn't end on a page boundary, the last partial page is
+        copied into memory instead.
+
+        If readonly is False the image is read into RAM with one slice
+        assignment.
+
+        Returns the size of the image.  MemoryOutOfRange is raised if
+        the image doesn't fit in memory at base.
+        """
+        size = os.path.getsize(path)
+        if (base < 0) or (base + size > len(self.memory)):
+            raise MemoryOutOfRange(
+                "Image {} of 0x{:x} bytes doesn't fit in memory at 0x{:04x}".format(
+                    path, size, base
+                )
+            )
+        if not readonly:
+            with open(path, "rb") as f:
+                self.memory.write_range(base, f.read())
+            return size
+
+        if not isinstance(self.memory, MappedMemory):
+            raise MemoryMapError("ROM images need a MappedMemory")
+        if size == 0:
+            return size
+        with open(path, "rb") as f:
+            image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mapped = size - (size % Memory.page_size)
+        if mapped > 0:
+            self.memory.map_buffer(base, memoryview(image)[:mapped])
+        if mapped < size:
+            # The rest of the last page is zero, the page is bytes so
+            # it is read-only like the mapped pages
+            page = image[mapped:] + bytes(Memory.page_size - (size - mapped))
+            self.memory.map_buffer(base + mapped, page)
+        return size
+
+    def clone(self):
+        """
+        Return a copy of the computer, without resetting it
+
+        This is a cheap way to make many machines in the same state:
+        build and initialize one template computer, then clone it.  The
+        clones share the template's instruction set and opcode table,
+        and copy its registers, flags and memory, see CPU.clone and
+        Memory.clone.
+        """
+        clone = copy.copy(self)
+        clone.cpu = self.cpu.clone()
+        clone.memory = self.memory.clone()
+        clone.block_compiler = None
+        return clone
 
     def step(self, instruction_loaded=False):
         """
         Run a single instruction
 
         This changes the CPU state to running, if it is not already
-        running.
+        running.  The instruction is a batch of its own, see
+        Memory.begin_batch.
         """
         try:
             self.cpu.set_state(CPUState.RUNNING)
         except CPUStateChange:
             pass
 
-        self.cpu.step(self.memory, 1, instruction_loaded)
+        self.memory.begin_batch()
+        try:
+            self.cpu.step(self.memory, 1, instruction_loaded)
+        finally:
+            self.memory.end_batch()
 
     def reset(self):
         "Reset the computer"
         self.memory.reset()
         self.cpu.reset(self.memory)
 
+    def snapshot(self):
+        """
+        Return a Snapshot of the registers, flags, cycle count and memory
+
+        Memory pages that weren't written to since the last snapshot
+        or restore are shared with it, so a snapshot only copies the
+        pages that changed.
+        """
+        cpu = self.cpu
+        # Materialize any pending N and Z result into the flags byte
+        cpu.registers["P"].get()
+        return Snapshot(list(cpu.register_data), cpu.cycles, self.memory.snapshot())
+
+    def restore(self, snapshot):
+        """
+        Restore the computer to a Snapshot
+        Only the memory pages that changed are copied back.
+        """
+        cpu = self.cpu
+        cpu.register_data[:] = snapshot.registers
+        # Update the individual flags from the flags byte
+        cpu.registers["P"].set(snapshot.registers[cpu.p_index])
+        cpu.cycles = snapshot.cycles
+        self.memory.restore(snapshot.memory)
+
     def set_instructions_loaded_limit(self, limit):
         """
         Set an instruction load limit on the CPU.
@@ -103,13 +226,54 @@ class Computer:
         instruction_loaded=False,
         num_instructions_loaded_limit=None,
         num_instructions_executed_limit=None,
+        max_cycles=None,
     ):
         """
         Run the processor
 
         This changes the CPU state to running, if it is not already
         running.
+
+        max_cycles is a budget of clock cycles for this run, or None to
+        run until another stop condition occurs.  The CPU stops before
+        loading the first instruction after the budget is used up, so
+        the last instruction can take the run a few cycles past the
+        budget.  The PC points to the next instruction to run, so
+        running machines in fixed cycle slices is a loop of run calls.
+
+        If a watchpoint is hit, the CPU stops after the instruction
+        that hit it and CPUWatchpoint is raised with the hits, see
+        CPU.set_watchpoint.
+
+        If DEBUG logging is enabled for the CPU logger and there is no
+        other trace hook, every instruction is logged, see
+        CPU.set_trace_hook.  This is checked once per run.
         """
+        trace_hook = self.cpu.trace_hook
+        if (trace_hook is None) and self.cpu.logger.isEnabledFor(logging.DEBUG):
+            self.cpu.set_trace_hook(log_instruction)
+        if max_cycles is not None:
+            self.cpu.cycles_limit = self.cpu.cycles + max_cycles
+        self.memory.begin_batch()
+        try:
+            self.run_until_stopped(
+                instruction_loaded,
+                num_instructions_loaded_limit,
+                num_instructions_executed_limit,
+            )
+        finally:
+            self.cpu.set_trace_hook(trace_hook)
+            self.cpu.cycles_limit = None
+            self.memory.end_batch()
+
+    def run_until_stopped(
+        self,
+        instruction_loaded=False,
+        num_instructions_loaded_limit=None,
+        num_instructions_executed_limit=None,
+    ):
+        "Run the processor until it stops, see run"
+        self.cpu.watchpoint_hits = []
         if num_instructions_executed_limit is not None:
             self.set_instructions_executed_limit(num_instructions_executed_limit)
 
@@ -147,6 +311,185 @@ class Computer:
             )
         )
 
+        if self.cpu.watchpoint_hits:
+            hits = self.cpu.watchpoint_hits
+            self.cpu.watchpoint_hits = []
+            raise CPUWatchpoint(hits)
+
+    def run_fast(self, max_instructions=None, max_cycles=None, trap_brk=False):
+        """
+        Run the processor in a fast batch loop
+
+        This is an alternative to run() for batch jobs.  The fetch,
+        decode and execute steps are done in one loop using local
+        variables, with a single instruction limit check per
+        instruction.  No exceptions are used for control flow, the
+        reason execution stopped is returned as a RunResult.
+
+        max_instructions is the number of instructions to execute
+        before stopping, or None to run until another stop condition
+        occurs.
+
+        max_cycles is a budget of clock cycles, checked before each
+        instruction the same way as in run(), or None for no budget.
+
+        If trap_brk is True, execution stops when a BRK instruction is
+        fetched, before it is executed.
+
+        CPU breakpoints stop execution and are handled the same way as
+        in run(), a second call resumes past the breakpoint.  A
+        watchpoint hit stops execution after the instruction that hit
+        it, with the hits in the RunResult.  The
+        instruction limits set with set_instructions_loaded_limit and
+        set_instructions_executed_limit are not checked, the counters
+        are updated when the loop stops.
+
+        The loop updates the PC in the register file directly, so
+        listeners registered on the PC are not notified of instruction
+        fetches.  A CPU trace hook is called before each instruction
+        if one is set.  Instructions are decoded once and taken from the
+        CPU's decoded instruction cache after that.
+        """
+        cpu = self.cpu
+        memory = self.memory
+        peek = memory.peek
+        opcode_table = cpu.opcode_table
+        decode = cpu.decode_instruction
+        if cpu.decoded_memory is not memory:
+            cpu.attach_decode_cache(memory)
+        decoded_instructions = cpu.decoded_instructions
+        trace_hook = cpu.trace_hook
+        inspect = trap_brk or (trace_hook is not None)
+        # The breakpoint bitmap is only tested if there are breakpoints
+        breakpoint_map = cpu.breakpoint_map if cpu.cpu_breakpoints else None
+        registers = cpu.register_data
+        pc_index = cpu.pc_index
+
+        # A limit of -1 is never reached, so there is only one check
+        # per instruction whether or not there is a limit
+        limit = -1 if max_instructions is None else max_instructions
+        executed = 0
+        start_cycles = cpu.cycles
+        cycles_limit = None if max_cycles is None else start_cycles + max_cycles
+        reason = StopReason.LIMIT
+        ignore_breakpoint = cpu.ignore_breakpoints_until_next_instruction
+        cpu.state = CPUState.RUNNING
+        pc = registers[pc_index]
+        # Watchpoint hits are appended to the list by CPU.watchpoint_hit
+        watchpoint_hits = cpu.watchpoint_hits = []
+
+        memory.begin_batch()
+        try:
+            while executed != limit:
+                pc = registers[pc_index]
+                if watchpoint_hits:
+                    break
+                if cycles_limit is not None and cpu.cycles >= cycles_limit:
+                    break
+                if breakpoint_map is not None:
+                    if (
+                        breakpoint_map[pc]
+                        and not ignore_breakpoint
+                        and cpu.breakpoint_hit(pc, memory)
+                    ):
+                        reason = StopReason.BREAKPOINT
+                        break
+                    ignore_breakpoint = False
+
+                decoded = decoded_instructions.get(pc)
+                if decoded is None:
+                    decoded = decode(memory, pc)
+                if inspect:
+                    # The opcode was read when the instruction was
+                    # decoded, it isn't read again so I/O handlers and
+                    # watchpoints only see the fetch
+                    if decoded is not None:
+                        instruction = decoded[0]
+                    else:
+                        instruction = opcode_table[peek(pc)]
+                    if trap_brk and instruction.opcode.opcode == 0x00:
+                        reason = StopReason.BRK
+                        break
+                    if trace_hook is not None:
+                        trace_hook(cpu, pc, instruction)
+                if decoded is not None:
+                    registers[pc_index] = (pc + decoded[3]) & 0xFFFF
+                    decoded[1](cpu, memory, decoded[2])
+                    cycles = decoded[4]
+                    if cycles is None:
+                        cycles = decoded[0].opcode.get_cycles(
+                            cpu.registers, memory, decoded[2]
+                        )
+                else:
+                    # The instruction runs past the end of memory
+                    instruction = opcode_table[peek(pc)]
+                    registers[pc_index] = (pc + 1) & 0xFFFF
+                    instruction.execute(cpu, memory)
+                    cycles = instruction.opcode.cycles
+                cpu.cycles += cycles
+                executed += 1
+            else:
+                pc = registers[pc_index]
+        except UndocumentedInstruction:
+            reason = StopReason.ILLEGAL_OPCODE
+            cpu.num_instructions_loaded += 1
+        finally:
+            memory.end_batch()
+
+        if watchpoint_hits and (reason == StopReason.LIMIT):
+            reason = StopReason.WATCHPOINT
+        cpu.watchpoint_hits = []
+        cpu.state = CPUState.STOPPED
+        cpu.ignore_breakpoints_until_next_instruction = reason == StopReason.BREAKPOINT
+        cpu.num_instructions_loaded += executed
+        cpu.num_instructions_executed += executed
+
+        return RunResult(
+            reason, pc, executed, cpu.cycles - start_cycles, watchpoint_hits
+        )
+
+    def run_compiled(
+        self, max_instructions=None, trap_brk=False, lockstep=False, max_cycles=None
+    ):
+        """
+        Run the processor with the basic-block compiler
+
+        Code is compiled into Python functions one basic block at a
+        time and the compiled blocks are cached until the memory they
+        were compiled from changes.  The arguments and the returned
+        RunResult are the same as for run_fast.
+
+        If lockstep is True, every block is also run with the reference
+        interpreter and LockstepMismatch is raised if the results
+        differ.  This is slow and meant for testing the compiler.
+        """
+        block_compiler = self.get_block_compiler()
+        self.memory.begin_batch()
+        try:
+            return block_compiler.run(max_instructions, trap_brk, lockstep, max_cycles)
+        finally:
+            self.memory.end_batch()
+
+    def get_block_compiler(self):
+        "Get the basic-block compiler for the current memory, see run_compiled"
+        if (self.block_compiler is None) or (
+            self.block_compiler.memory is not self.memory
+        ):
+            # The compiler imports every instruction implementation, so
+            # it is only imported when it is used
+            from bitey.cpu.jit import BlockCompiler
+
+            self.block_compiler = BlockCompiler(self.cpu, self.memory)
+        return self.block_compiler
+
+    def precompile(self, addresses):
+        """
+        Compile the basic blocks at a list of addresses ahead of time
+        For example the blocks of a ControlFlowGraph from
+        bitey.disasm.control_flow.  Returns the number of blocks compiled.
+        """
+        return self.get_block_compiler().precompile(addresses)
+
     def parse(self):
         """
         Parse the next instruction.
@@ -156,22 +499,16 @@ class Computer:
         This is a destructive operation since it changes the Program
         Counter.
         """
-        consumed = 0
-        instruction = None
-
-        try:
-            instruction = self.cpu.get_next_instruction(self.memory)
-            addressing_mode = instruction.opcode.addressing_mode
-            consumed = addressing_mode.bytes
-        except UndocumentedInstruction:
+        instruction = self.cpu.get_next_instruction(self.memory)
+        if isinstance(instruction, UndocumentedOpcode):
             self.logger.debug(
                 "Found undocumented instruction at address 0x{0:02x}".format(
                     self.cpu.registers["PC"].value - 1
                 )
             )
-            consumed = 1
+            return (None, 1)
 
-        return (instruction, consumed)
+        return (instruction, instruction.opcode.addressing_mode.bytes)
 
     def disassemble(self):
         """
@@ -188,6 +525,9 @@ class Computer:
         Memory, but it uses and tests the existing execution machinery.
 
         If an invalid opcode is found, it prints it as "INV"
+
+        bitey.disasm.disassembler.Disassembler disassembles without
+        using the CPU, and streams the lines.
         """
         total_consumed = 0
         self.cpu.registers["PC"].set(0x00)
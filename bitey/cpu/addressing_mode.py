@@ -27,6 +27,40 @@ class AddressingMode:
         """
         return (None, None)
 
+    def read_operand(self, memory, address):
+        """
+        Read the operand bytes of an instruction
+        address is the address of the opcode
+        Returns the bytes following the opcode
+        """
+        return bytes(memory.read_range(address + 1, address + self.bytes))
+
+    def get_operand_address(self, flags, registers, memory, operand):
+        """
+        Return the effective address using operand bytes that were
+        read ahead of time with read_operand
+        The PC must already point past the operand.
+        """
+        return None
+
+    def get_operand_value(self, flags, registers, memory, operand):
+        """
+        Get the value using operand bytes that were read ahead of time
+        Returns a tuple of the address and value like get_value
+        """
+        address = self.get_operand_address(flags, registers, memory, operand)
+        if address is None:
+            return (None, None)
+        return (address, memory.read(address))
+
+    def crosses_page(self, registers, memory, operand):
+        """
+        Return True if indexing the base address in the operand bytes
+        crosses a page boundary
+        Indexed addressing modes take an extra cycle when it does.
+        """
+        return False
+
     def get_address(self, flags, registers, memory):
         """
         Return the effective address
@@ -104,26 +138,23 @@ class AbsoluteAddressingMode(AddressingMode):
     0x3412  NOP
     """
 
-    adl: int = 0
-    "The low-order byte"
-
-    adh: int = 0
-    "The high-order byte"
-
     bytes: ClassVar[int] = 3
 
     def get_address(self, flags, registers, memory):
-        self.adl = memory.read(registers["PC"].get())
+        adl = memory.read(registers["PC"].get())
         registers["PC"].inc()
-        self.adh = memory.read(registers["PC"].get())
+        adh = memory.read(registers["PC"].get())
         registers["PC"].inc()
 
-        return memory.get_16bit_address(self.adl, self.adh)
+        return memory.get_16bit_address(adl, adh)
 
     def get_value(self, flags, registers, memory):
         address = self.get_address(flags, registers, memory)
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        return memory.get_16bit_address(operand[0], operand[1])
+
     def get_inst_str(self, flags, registers, memory):
         # address = self.get_address(flags, registers, memory)
         address = self.get_address(flags, registers, memory)
@@ -154,6 +185,9 @@ class AccumulatorAddressingMode(AddressingMode):
         value = registers["A"].get()
         return (address, value)
 
+    def get_operand_value(self, flags, registers, memory, operand):
+        return (None, registers["A"].get())
+
     def get_inst_str(self, flags, registers, memory):
         self.get_address(flags, registers, memory)
         return ""
@@ -194,30 +228,28 @@ class AbsoluteIndirectAddressingMode(AddressingMode):
     0x3415  0xEA  NOP
     """
 
-    adl: int = 0
-    "The low-order byte"
-
-    adh: int = 0
-    "The high-order byte"
-
     bytes: ClassVar[int] = 3
 
     def get_address(self, flags, registers, memory):
-        self.adl = memory.read(registers["PC"].get())
+        adl = memory.read(registers["PC"].get())
         registers["PC"].inc()
-        self.adh = memory.read(registers["PC"].get())
+        adh = memory.read(registers["PC"].get())
         registers["PC"].inc()
 
-        address_to_address = memory.get_16bit_address(self.adl, self.adh)
-        self.adl = memory.read(address_to_address)
-        self.adh = memory.read(address_to_address + 1)
-        effective_address = memory.get_16bit_address(self.adl, self.adh)
+        address_to_address = memory.get_16bit_address(adl, adh)
+        adl = memory.read(address_to_address)
+        adh = memory.read(address_to_address + 1)
+        effective_address = memory.get_16bit_address(adl, adh)
         return effective_address
 
     def get_value(self, flags, registers, memory):
         address = self.get_address(flags, registers, memory)
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        address_to_address = memory.get_16bit_address(operand[0], operand[1])
+        return memory.get_16bit_value(address_to_address, address_to_address + 1)
+
     def get_inst_str(self, flags, registers, memory):
         address = self.get_address(flags, registers, memory)
         if address is not None:
@@ -259,22 +291,16 @@ class AbsoluteIndirectPageBoundaryBugAddressingMode(AddressingMode):
     0x3415  0xEA  NOP
     """
 
-    adl: int = 0
-    "The low-order byte"
-
-    adh: int = 0
-    "The high-order byte"
-
     bytes: ClassVar[int] = 3
 
     def get_address(self, flags, registers, memory):
         pc = registers["PC"].get()
 
-        self.adl = memory.read(pc)
+        adl = memory.read(pc)
 
         if (pc & 0xFF) == 0xFF:
             # Memory form 0x??FF should wrap to the same page
-            self.adh = memory.read(pc & 0xFF00)
+            adh = memory.read(pc & 0xFF00)
             registers["PC"].inc()
         else:
             # Other memory should work the same as the normal AbsoluteIndirectAddressingMode
@@ -284,20 +310,34 @@ class AbsoluteIndirectPageBoundaryBugAddressingMode(AddressingMode):
             # instructions
             # But for more accurate simulation and cycle-dependent stuff, it may matter
             registers["PC"].inc()
-            self.adh = memory.read(registers["PC"].get())
+            adh = memory.read(registers["PC"].get())
 
         registers["PC"].inc()
 
-        address_to_address = memory.get_16bit_address(self.adl, self.adh)
-        self.adl = memory.read(address_to_address)
-        self.adh = memory.read(address_to_address + 1)
-        effective_address = memory.get_16bit_address(self.adl, self.adh)
+        address_to_address = memory.get_16bit_address(adl, adh)
+        adl = memory.read(address_to_address)
+        adh = memory.read(address_to_address + 1)
+        effective_address = memory.get_16bit_address(adl, adh)
         return effective_address
 
     def get_value(self, flags, registers, memory):
         address = self.get_address(flags, registers, memory)
         return (address, memory.read(address))
 
+    def read_operand(self, memory, address):
+        """
+        Read the operand bytes of an instruction
+        The high byte wraps to the start of the page, like get_address
+        """
+        pc = address + 1
+        if (pc & 0xFF) == 0xFF:
+            return bytes([memory.read(pc), memory.read(pc & 0xFF00)])
+        return bytes(memory.read_range(pc, pc + 2))
+
+    def get_operand_address(self, flags, registers, memory, operand):
+        address_to_address = memory.get_16bit_address(operand[0], operand[1])
+        return memory.get_16bit_value(address_to_address, address_to_address + 1)
+
     def get_inst_str(self, flags, registers, memory):
         address = self.get_address(flags, registers, memory)
         if address is not None:
@@ -321,27 +361,15 @@ class AbsoluteXAddressingMode(AddressingMode):
     The X Index is then added to this address
     """
 
-    adl: int = 0
-    """
-    The low-order byte
-    This does not include the X offset
-    """
-
-    adh: int = 0
-    """
-    The high-order byte
-    This does not include the X offset
-    """
-
     bytes: ClassVar[int] = 3
 
     def get_address(self, flags, registers, memory):
-        self.adl = memory.read(registers["PC"].get())
+        adl = memory.read(registers["PC"].get())
         registers["PC"].inc()
-        self.adh = memory.read(registers["PC"].get())
+        adh = memory.read(registers["PC"].get())
         registers["PC"].inc()
 
-        address = memory.get_16bit_address(self.adl, self.adh)
+        address = memory.get_16bit_address(adl, adh)
         address += registers["X"].get()
 
         # Wrap at end of memory
@@ -353,11 +381,19 @@ class AbsoluteXAddressingMode(AddressingMode):
         address = self.get_address(flags, registers, memory)
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        address = memory.get_16bit_address(operand[0], operand[1])
+        return (address + registers["X"].get()) % 0x10000
+
+    def crosses_page(self, registers, memory, operand):
+        return operand[0] + registers["X"].get() > 0xFF
+
     def get_inst_str(self, flags, registers, memory):
-        # address = self.get_address(flags, registers, memory)
+        pc = registers["PC"].get()
+        base_address = memory.get_16bit_address(memory.read(pc), memory.read(pc + 1))
         address = self.get_address(flags, registers, memory)
         if address is not None:
-            return "${0:04x},X".format(memory.get_16bit_address(self.adl, self.adh))
+            return "${0:04x},X".format(base_address)
         else:
             return ""
 
@@ -377,29 +413,17 @@ class AbsoluteYAddressingMode(AddressingMode):
     The Y Index is then added to this address
     """
 
-    adl: int = 0
-    """
-    The low-order byte
-    This does not include the X offset
-    """
-
-    adh: int = 0
-    """
-    The high-order byte
-    This does not include the X offset
-    """
-
     bytes: ClassVar[int] = 3
 
     def get_address(self, flags, registers, memory):
-        self.adl = memory.read(registers["PC"].get())
+        adl = memory.read(registers["PC"].get())
         # TODO: Maybe wrap the flag with bounds checking too, read expected
         # behavior
         registers["PC"].inc()
-        self.adh = memory.read(registers["PC"].get())
+        adh = memory.read(registers["PC"].get())
         registers["PC"].inc()
 
-        address = memory.get_16bit_address(self.adl, self.adh)
+        address = memory.get_16bit_address(adl, adh)
         address += registers["Y"].get()
 
         # Wrap at end of memory
@@ -412,11 +436,19 @@ class AbsoluteYAddressingMode(AddressingMode):
         address = self.get_address(flags, registers, memory)
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        address = memory.get_16bit_address(operand[0], operand[1])
+        return (address + registers["Y"].get()) % 0x10000
+
+    def crosses_page(self, registers, memory, operand):
+        return operand[0] + registers["Y"].get() > 0xFF
+
     def get_inst_str(self, flags, registers, memory):
-        # address = self.get_address(flags, registers, memory)
+        pc = registers["PC"].get()
+        base_address = memory.get_16bit_address(memory.read(pc), memory.read(pc + 1))
         address = self.get_address(flags, registers, memory)
         if address is not None:
-            return "${0:04x},Y".format(memory.get_16bit_address(self.adl, self.adh))
+            return "${0:04x},Y".format(base_address)
         else:
             return ""
 
@@ -438,6 +470,9 @@ class ImmediateAddressingMode(AddressingMode):
 
         return (None, byte)
 
+    def get_operand_value(self, flags, registers, memory, operand):
+        return (None, operand[0])
+
     def get_inst_str(self, flags, registers, memory):
         (address, value) = self.get_value(flags, registers, memory)
         return "#${0:02x}".format(value)
@@ -501,6 +536,12 @@ class IndexedIndirectAddressingMode(AddressingMode):
 
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        zero_page_address = (operand[0] + registers["X"].get()) % 0x0100
+        return memory.get_16bit_value(
+            zero_page_address, (zero_page_address + 1) % 0x0100
+        )
+
     def get_inst_str(self, flags, registers, memory):
         address = memory.read(registers["PC"].get())
         self.get_address(flags, registers, memory)
@@ -546,6 +587,16 @@ class IndirectIndexedAddressingMode(AddressingMode):
 
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        address = memory.get_16bit_value(operand[0], operand[0] + 1)
+        return (address + registers["Y"].get()) % 0x10000
+
+    def crosses_page(self, registers, memory, operand):
+        # Only the low byte of the pointer matters.  It was already
+        # read by the instruction, so it is peeked to not call I/O
+        # handlers or check watchpoints again.
+        return memory.peek(operand[0]) + registers["Y"].get() > 0xFF
+
     def get_inst_str(self, flags, registers, memory):
         address = memory.read(registers["PC"].get())
         self.get_address(flags, registers, memory)
@@ -570,6 +621,9 @@ class IndirectXAddressingMode(AddressingMode):
     def get_value(self, flags, registers, memory):
         return self.am.get_value(flags, registers, memory)
 
+    def get_operand_value(self, flags, registers, memory, operand):
+        return self.am.get_operand_value(flags, registers, memory, operand)
+
     def get_inst_str(self, flags, registers, memory):
         return self.am.get_inst_str(flags, registers, memory)
 
@@ -592,6 +646,12 @@ class IndirectYAddressingMode(AddressingMode):
     def get_value(self, flags, registers, memory):
         return self.am.get_value(flags, registers, memory)
 
+    def get_operand_value(self, flags, registers, memory, operand):
+        return self.am.get_operand_value(flags, registers, memory, operand)
+
+    def crosses_page(self, registers, memory, operand):
+        return self.am.crosses_page(registers, memory, operand)
+
     def get_inst_str(self, flags, registers, memory):
         return self.am.get_inst_str(flags, registers, memory)
 
@@ -618,6 +678,9 @@ class ZeroPageAddressingMode(AddressingMode):
         address = self.get_address(flags, registers, memory)
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        return operand[0]
+
 
 @dataclass
 class ZeroPageXAddressingMode(AddressingMode):
@@ -645,6 +708,9 @@ class ZeroPageXAddressingMode(AddressingMode):
 
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        return (operand[0] + registers["X"].get()) % 0x100
+
     def get_inst_str(self, flags, registers, memory):
         address = memory.read(registers["PC"].get())
         self.get_value(flags, registers, memory)
@@ -672,6 +738,9 @@ class ZeroPageYAddressingMode(AddressingMode):
 
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        return (operand[0] + registers["Y"].get()) % 0x100
+
     def get_inst_str(self, flags, registers, memory):
         address = memory.read(registers["PC"].get())
         self.get_value(flags, registers, memory)
@@ -710,6 +779,10 @@ class RelativeAddressingMode(AddressingMode):
         address = self.get_address(flags, registers, memory)
         return (address, memory.read(address))
 
+    def get_operand_address(self, flags, registers, memory, operand):
+        offset = EightBitArch.twos_complement_to_signed_int(operand[0])
+        return (registers["PC"].get() + offset) % 0x10000
+
     def get_inst_str(self, flags, registers, memory):
         "Return the address as an effective address"
         (address, value) = self.get_value(flags, registers, memory)
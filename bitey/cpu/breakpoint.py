@@ -0,0 +1,188 @@
+import ast
+from dataclasses import dataclass, field
+from typing import ClassVar
+
+
+class ConditionError(Exception):
+    "A breakpoint condition uses syntax or names that aren't allowed"
+
+
+class ConditionCompiler(ast.NodeTransformer):
+    """
+    Compile a breakpoint condition into a Python function
+
+    Conditions are Python expressions restricted to integer and
+    boolean constants, arithmetic, bitwise and comparison operators,
+    and, or and not.  They can use these names:
+
+    - The registers by short name, for example A or PC
+    - The flags by short name, for example Z or C, which are 0 or 1
+    - mem[address], the byte at an address
+
+    For example "A == 0x10 and mem[0x20] > 3".  The expression is
+    parsed and checked once.  Register and flag names are replaced
+    with direct reads of the CPU register file and flags, and memory
+    reads use Memory.peek so watchpoints and I/O handlers aren't
+    triggered.  The function takes the CPU and the memory.
+    """
+
+    allowed_nodes: ClassVar[tuple] = (
+        ast.Expression,
+        ast.BoolOp,
+        ast.And,
+        ast.Or,
+        ast.UnaryOp,
+        ast.Not,
+        ast.USub,
+        ast.Invert,
+        ast.BinOp,
+        ast.Add,
+        ast.Sub,
+        ast.Mult,
+        ast.FloorDiv,
+        ast.Mod,
+        ast.BitAnd,
+        ast.BitOr,
+        ast.BitXor,
+        ast.LShift,
+        ast.RShift,
+        ast.Compare,
+        ast.Eq,
+        ast.NotEq,
+        ast.Lt,
+        ast.LtE,
+        ast.Gt,
+        ast.GtE,
+        ast.Constant,
+        ast.Name,
+        ast.Load,
+        ast.Subscript,
+    )
+    "The syntax tree nodes a condition can contain"
+
+    memory_name: ClassVar[str] = "mem"
+    "The name used to read memory in conditions"
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+
+    def compile(self, condition):
+        "Compile a condition string, raises ConditionError if it isn't allowed"
+        try:
+            tree = ast.parse(condition, mode="eval")
+        except SyntaxError as e:
+            raise ConditionError("Invalid condition {}: {}".format(condition, e))
+        for node in ast.walk(tree):
+            if not isinstance(node, ConditionCompiler.allowed_nodes):
+                raise ConditionError(
+                    "{} isn't allowed in conditions".format(type(node).__name__)
+                )
+            if isinstance(node, ast.Constant) and not isinstance(node.value, int):
+                raise ConditionError("Only integer constants are allowed")
+
+        body = self.visit(tree.body)
+        function = ast.Expression(
+            ast.Lambda(
+                ast.arguments(
+                    posonlyargs=[],
+                    args=[ast.arg("r"), ast.arg("f"), ast.arg("m")],
+                    kwonlyargs=[],
+                    kw_defaults=[],
+                    defaults=[],
+                ),
+                body,
+            )
+        )
+        ast.fix_missing_locations(function)
+        code = compile(function, "<condition {}>".format(condition), "eval")
+        # Conditions can't name int or any other builtin, the only
+        # names they can use are replaced by visit_Name
+        test = eval(code, {"__builtins__": {}, "int": int})
+        return lambda cpu, memory: test(cpu.register_data, cpu.flags, memory)
+
+    def visit_Name(self, node):
+        "Replace register and flag names with reads of the CPU state"
+        name = node.id.upper()
+        if name == "P":
+            # The flags byte, with any pending N and Z result applied
+            return self.call("f", "get_data")
+        if name in self.cpu.registers:
+            return ast.Subscript(
+                ast.Name("r", ast.Load()),
+                ast.Constant(self.cpu.registers.index(name)),
+                ast.Load(),
+            )
+        if name in self.cpu.flags.flag_dict:
+            # Flags are 0 or 1, like the bits of the P register
+            return ast.Call(
+                ast.Name("int", ast.Load()),
+                [
+                    ast.Attribute(
+                        ast.Subscript(
+                            ast.Name("f", ast.Load()), ast.Constant(name), ast.Load()
+                        ),
+                        "status",
+                        ast.Load(),
+                    )
+                ],
+                [],
+            )
+        raise ConditionError("Unknown name {} in condition".format(node.id))
+
+    def visit_Subscript(self, node):
+        "Replace mem[address] with a memory read"
+        if not (
+            isinstance(node.value, ast.Name)
+            and node.value.id == ConditionCompiler.memory_name
+        ):
+            raise ConditionError(
+                "Only {}[address] can be indexed".format(ConditionCompiler.memory_name)
+            )
+        address = ast.BinOp(self.visit(node.slice), ast.BitAnd(), ast.Constant(0xFFFF))
+        return self.call("m", "peek", [address])
+
+    def call(self, name, method, args=None):
+        "Build a call of a method of one of the function arguments"
+        return ast.Call(
+            ast.Attribute(ast.Name(name, ast.Load()), method, ast.Load()),
+            args or [],
+            [],
+        )
+
+
+@dataclass
+class Breakpoint:
+    """
+    A CPU breakpoint
+
+    A breakpoint can have a condition, see ConditionCompiler, and only
+    counts as hit when the condition is true.  With a hit_count, the
+    CPU only stops from that hit on, so stopping in the 50,000th
+    iteration of a loop doesn't stop the CPU 49,999 times before.
+    A one-shot breakpoint is cleared when it stops the CPU.
+    """
+
+    address: int
+    "The address of the instruction to stop at"
+
+    condition: str = None
+    "The condition expression, or None to stop every time"
+
+    hit_count: int = 0
+    "The hit to start stopping at, 0 or 1 stop at the first hit"
+
+    one_shot: bool = False
+    "Clear the breakpoint when it stops the CPU"
+
+    hits: int = 0
+    "The number of times the breakpoint was hit"
+
+    test: object = field(default=None, repr=False, compare=False)
+    "The compiled condition, see ConditionCompiler"
+
+    def should_stop(self, cpu, memory):
+        "Count a hit if the condition is true, return True if the CPU should stop"
+        if self.test is not None and not self.test(cpu, memory):
+            return False
+        self.hits += 1
+        return self.hits >= self.hit_count
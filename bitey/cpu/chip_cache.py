@@ -0,0 +1,222 @@
+from dataclasses import dataclass
+import hashlib
+import json
+import logging
+import os
+import pickle
+from typing import ClassVar
+
+from bitey.cpu.instruction.instruction import InstructionSet
+from bitey.cpu.instruction.instruction_json_decoder import InstructionSetJSONDecoder
+
+
+@dataclass
+class ChipDefinition:
+    """
+    A decoded chip definition, see ChipCache
+    """
+
+    key: str
+    "The cache key of the chip JSON the definition was decoded from"
+
+    parsed_json: dict
+    "The parsed chip JSON without the instructions"
+
+    instruction_set: InstructionSet
+    "The decoded instruction set, shared by the CPUs built from the chip"
+
+
+def default_cache_directory():
+    """
+    Get the directory bitey caches files in
+    This is the BITEY_CACHE_DIR environment variable, or bitey in the
+    user cache directory.
+    """
+    directory = os.environ.get("BITEY_CACHE_DIR")
+    if directory is None:
+        cache_home = os.environ.get(
+            "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+        )
+        directory = os.path.join(cache_home, "bitey")
+    return directory
+
+
+class ChipCache:
+    """
+    Cache of decoded chip definitions
+
+    Decoding a chip JSON file and building its instruction set takes
+    much longer than building the registers and flags from the parsed
+    JSON.  The cache keeps each decoded definition in memory, and
+    pickled in a cache directory so other processes can load it
+    without decoding the JSON.
+
+    Definitions are keyed by a hash of the chip JSON and of the bitey
+    CPU source files, so a changed chip file or a changed bitey gets a
+    new entry.  A cache file is checked against its key when it is
+    loaded, and rebuilt if it can't be loaded or doesn't match.  Keys
+    start with a hash of the chip JSON alone, and writing a cache file
+    removes the older files of the same chip, so only the newest file
+    of each chip is kept.
+
+    The directory defaults to default_cache_directory().  If the
+    directory can't be written, definitions are only cached in memory.
+    """
+
+    format_version: ClassVar[int] = 2
+    "The version of the cache file format, part of every key"
+
+    def __init__(self, directory=None):
+        self.logger = logging.getLogger("bitey.cpu.chip_cache.ChipCache")
+        if directory is None:
+            directory = default_cache_directory()
+        self.directory = directory
+        "The directory cache files are stored in"
+
+        self.definitions = {}
+        "The definitions loaded in this process, by the hash of their JSON"
+
+        self.source_hash = None
+        "The hash of the CPU source files, see get_source_hash"
+
+    def get_source_hash(self):
+        """
+        Hash the names, sizes and modification times of the CPU source
+        files, so a changed bitey doesn't load stale definitions
+        This is done once per cache.
+        """
+        if self.source_hash is None:
+            source_hash = hashlib.sha256()
+            cpu_dir = os.path.dirname(os.path.abspath(__file__))
+            for root, dirs, files in sorted(os.walk(cpu_dir)):
+                for name in sorted(files):
+                    if name.endswith(".py"):
+                        stat = os.stat(os.path.join(root, name))
+                        source_hash.update(
+                            "{} {} {}\n".format(
+                                os.path.relpath(os.path.join(root, name), cpu_dir),
+                                stat.st_size,
+                                stat.st_mtime_ns,
+                            ).encode()
+                        )
+            self.source_hash = source_hash.hexdigest()
+        return self.source_hash
+
+    def key(self, json_data):
+        """
+        Get the cache key of a chip JSON document
+        The key is the chip hash, see chip_hash, and a hash of the
+        cache format, the source files and the JSON.
+        """
+        key_hash = hashlib.sha256()
+        key_hash.update(str(ChipCache.format_version).encode())
+        key_hash.update(self.get_source_hash().encode())
+        if isinstance(json_data, str):
+            json_data = json_data.encode()
+        key_hash.update(json_data)
+        return "{}-{}".format(self.chip_hash(json_data), key_hash.hexdigest())
+
+    def chip_hash(self, json_data):
+        "Get the short hash of a chip JSON document that starts its keys"
+        if isinstance(json_data, str):
+            json_data = json_data.encode()
+        return hashlib.sha256(json_data).hexdigest()[:16]
+
+    def path(self, key):
+        "Get the path of the cache file for a key"
+        return os.path.join(self.directory, "chip-{}.pickle".format(key))
+
+    def load(self, json_data):
+        """
+        Get the ChipDefinition for a chip JSON document
+
+        The definition is taken from memory or the cache directory,
+        the JSON is only decoded if neither has it.
+        """
+        if isinstance(json_data, str):
+            json_data = json_data.encode()
+        # Definitions loaded in this process are found by the hash of
+        # the JSON alone, the source files are only hashed on a miss
+        json_hash = hashlib.sha256(json_data).hexdigest()
+        definition = self.definitions.get(json_hash)
+        if definition is None:
+            key = self.key(json_data)
+            definition = self.read(key)
+            if definition is None:
+                definition = self.decode(key, json_data)
+                self.write(definition)
+            self.definitions[json_hash] = definition
+        return definition
+
+    def decode(self, key, json_data):
+        "Decode a chip JSON document into a ChipDefinition"
+        parsed_json = json.loads(json_data)
+        instruction_set = None
+        if "instructions" in parsed_json:
+            instruction_set = InstructionSetJSONDecoder().decode_parsed(
+                parsed_json.pop("instructions")
+            )
+        return ChipDefinition(key, parsed_json, instruction_set)
+
+    def read(self, key):
+        """
+        Read a definition from the cache directory
+        Returns None if there is no valid cache file for the key.
+        """
+        try:
+            with open(self.path(key), "rb") as f:
+                definition = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.debug("Invalid chip cache file for {}: {}".format(key, e))
+            return None
+        if not isinstance(definition, ChipDefinition) or (definition.key != key):
+            self.logger.debug("Chip cache file for {} doesn't match".format(key))
+            return None
+        return definition
+
+    def write(self, definition):
+        """
+        Write a definition to the cache directory
+        The file is written under a temporary name and renamed, so
+        other processes never read a partial file.  The stale files of
+        the same chip are removed after, see prune.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(definition.key)
+            temp_path = "{}.{}.tmp".format(path, os.getpid())
+            try:
+                with open(temp_path, "wb") as f:
+                    pickle.dump(definition, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self.prune(definition.key)
+        except Exception as e:
+            self.logger.debug("Can't write the chip cache: {}".format(e))
+
+    def prune(self, key):
+        """
+        Remove the cache files of the chip of a key, except the key's
+        Files from before keys started with the chip hash, which have
+        no chip hash in their name, are stale too and are removed.
+        """
+        current = os.path.basename(self.path(key))
+        chip_prefix = "chip-{}-".format(key.split("-")[0])
+        for name in os.listdir(self.directory):
+            if (name == current) or not name.endswith(".pickle"):
+                continue
+            if name.startswith(chip_prefix) or (
+                name.startswith("chip-") and name.count("-") == 1
+            ):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+# The chip cache used by CPU.build_from_json
+chip_cache = ChipCache()
@@ -1,3 +1,4 @@
+import copy
 from dataclasses import dataclass, field
 from enum import Enum
 import json
@@ -11,7 +12,13 @@ from bitey.cpu.addressing_mode import (
     # ImmediateAddressingMode,
     ImpliedAddressingMode,
 )
-from bitey.cpu.instruction.instruction import Instruction, InstructionSet
+from bitey.cpu.breakpoint import Breakpoint, ConditionCompiler
+from bitey.cpu.chip_cache import chip_cache
+from bitey.cpu.instruction.instruction import (
+    Instruction,
+    InstructionSet,
+    UndocumentedOpcode,
+)
 from bitey.cpu.instruction.instruction_json_decoder import InstructionSetJSONDecoder
 
 from bitey.cpu.instruction.cld import CLD
@@ -28,9 +35,19 @@ from bitey.cpu.pin import Pins
 from bitey.cpu.register import (
     Registers,
     RegistersJSONDecoder,
+    StatusRegister,
 )
 
 
+def log_instruction(cpu, address, instruction):
+    "A CPU trace hook that logs each instruction at the DEBUG level"
+    cpu.logger.debug(
+        "0x{:04X}: {} opcode 0x{:02X}".format(
+            address, instruction.name, instruction.opcode.opcode
+        )
+    )
+
+
 class StackOverflow(Exception):
     """
     Stack overflow exception
@@ -55,6 +72,16 @@ class CPUBreakpoint(Exception):
         self.address = address
 
 
+class CPUWatchpoint(Exception):
+    """
+    CPU Watchpoint exception
+    Raised if a watchpoint is hit, hits is a list of WatchpointHit
+    """
+
+    def __init__(self, hits):
+        self.hits = hits
+
+
 class CPUStateChange(Exception):
     """
     CPUStateChange exception
@@ -75,6 +102,49 @@ class CPUState(Enum):
     RUNNING = 1
 
 
+class StopReason(Enum):
+    """
+    The reason a batch run loop stopped executing instructions
+    """
+
+    LIMIT = 0
+    "The instruction limit or cycle budget was reached"
+
+    BREAKPOINT = 1
+    "A CPU breakpoint was hit"
+
+    BRK = 2
+    "A BRK instruction was trapped"
+
+    ILLEGAL_OPCODE = 3
+    "An undocumented or invalid opcode was fetched"
+
+    WATCHPOINT = 4
+    "A watchpoint was hit by the last instruction executed"
+
+
+@dataclass
+class RunResult:
+    """
+    The result of a batch run loop such as Computer.run_fast
+    """
+
+    reason: StopReason
+    "Why execution stopped"
+
+    address: int
+    "The address of the instruction execution stopped at"
+
+    instructions_executed: int
+    "The number of instructions executed during this run"
+
+    cycles: int = 0
+    "The number of clock cycles the instructions executed took"
+
+    watchpoint_hits: list = field(default_factory=list)
+    "The WatchpointHits, if execution stopped at a watchpoint"
+
+
 @dataclass
 class CPU:
     """
@@ -94,6 +164,12 @@ class CPU:
     The stack is automatically located in "Page One".  Page size is 0x0100
     """
 
+    max_instruction_length: ClassVar[int] = 3
+    "The length in bytes of the longest instruction"
+
+    address_space_size: ClassVar[int] = 0x10000
+    "The number of addresses the CPU can address"
+
     registers: Registers
 
     flags: Flags
@@ -119,12 +195,22 @@ class CPU:
     num_instructions_executed: int = 0
     "The number of instructions that have been executed by the processor"
 
+    cycles: int = 0
+    "The number of clock cycles the executed instructions have taken"
+
     cpu_breakpoints: Dict = field(default_factory=lambda: {})
     "A dictionary of all CPU breakpoints"
 
     ignore_breakpoints_until_next_instruction: bool = False
     "Ignore breakpoints until the next instruction is loaded"
 
+    lazy_flags: bool = True
+    """
+    Evaluate the N and Z flags lazily
+    Instructions record their result byte and the flags are only
+    updated when they are read.  See Flags.set_nz
+    """
+
     def __post_init__(self):
         """
         Called after the generated __init__ method
@@ -140,18 +226,116 @@ class CPU:
         # Set the number of instructions that can be executed to None,
         # so there is no limit
         self.num_instructions_executed_limit = None
+        # Set the cycle count execution stops at to None, so there is
+        # no limit
+        self.cycles_limit = None
+
+        # One byte per address, set if there is a breakpoint there
+        self.breakpoint_map = bytearray(CPU.address_space_size)
+        self.update_breakpoints()
+
+        # Watchpoint hits since the last run, see set_watchpoint
+        self.watchpoint_hits = []
+        self.watched_memory = None
+
+        # Build the opcode dispatch table once, so decoding an opcode
+        # is a single list index
+        if self.instruction_set is not None:
+            self.opcode_table = self.instruction_set.opcode_table
+        else:
+            self.opcode_table = [
+                UndocumentedOpcode(opcode)
+                for opcode in range(InstructionSet.opcode_table_size)
+            ]
 
-        # Connect up the P register and flags with the Watcher/Listener API
-        # We can profile later if speed is an issue
-        if self.registers and self.flags:
-            register = self.registers["P"]
-            register.register(self.flags.pflag_listener)
+        # Called before each instruction is executed, see set_trace_hook
+        self.trace_hook = None
 
-            # Connect up the flags and the P register so they are both in sync
-            self.flags.register(register.flags_listener)
+        # Instructions decoded by address, see decode_instruction
+        self.decoded_instructions = {}
+        self.decoded_memory = None
+        self.current_decoded = None
+
+        # The flags byte is stored in the P register's slot, so the
+        # flags and the P register are always in sync
+        if self.registers and self.flags:
+            self.flags.attach_register(self.registers["P"], self.lazy_flags)
+
+        # Indexes into the register file for the fast register properties
+        if self.registers:
+            self.register_data = self.registers.data
+            for short_name in ["A", "X", "Y", "S", "P", "PC"]:
+                if short_name in self.registers:
+                    setattr(
+                        self,
+                        "{}_index".format(short_name.lower()),
+                        self.registers.index(short_name),
+                    )
 
         return
 
+    # Fast register access
+    # These properties read and write the register file directly, so
+    # register listeners are not notified.  Use the Register objects in
+    # registers when listeners need to see the change.
+
+    @property
+    def a(self):
+        "The Accumulator"
+        return self.register_data[self.a_index]
+
+    @a.setter
+    def a(self, value):
+        self.register_data[self.a_index] = value
+
+    @property
+    def x(self):
+        "Index register X"
+        return self.register_data[self.x_index]
+
+    @x.setter
+    def x(self, value):
+        self.register_data[self.x_index] = value
+
+    @property
+    def y(self):
+        "Index register Y"
+        return self.register_data[self.y_index]
+
+    @y.setter
+    def y(self, value):
+        self.register_data[self.y_index] = value
+
+    @property
+    def s(self):
+        "The Stack pointer"
+        return self.register_data[self.s_index]
+
+    @s.setter
+    def s(self, value):
+        self.register_data[self.s_index] = value
+
+    @property
+    def p(self):
+        "The Processor Status Register"
+        # Any pending N and Z result needs to be materialized first
+        return self.registers["P"].get()
+
+    @p.setter
+    def p(self, value):
+        # The individual flags are derived from the P register, so this
+        # always goes through the register
+        self.registers["P"].set(value)
+
+    @property
+    def pc(self):
+        "The Program Counter"
+        return self.register_data[self.pc_index]
+
+    @pc.setter
+    def pc(self, value):
+        self.register_data[self.pc_index] = value
+
     def reset(self, memory, housekeeping=True, load_first_instruction=True):
         """
         Reset the CPU
@@ -188,6 +372,8 @@ class CPU:
         self.num_instructions_loaded_limit = None
         self.num_instructions_executed = 0
         self.num_instructions_executed_limit = None
+        self.cycles = 0
+        self.cycles_limit = None
 
         # TODO: Use a different builder for this
         # opcodes = Opcodes([Opcode(120, ImpliedAddressingMode)])
@@ -214,11 +400,11 @@ class CPU:
         # TODO: Initialize data devices
 
         if housekeeping:
-            opcodes = Opcodes([Opcode(88, ImpliedAddressingMode)])
+            opcodes = Opcodes([Opcode(88, ImpliedAddressingMode, 2)])
             cli = CLI("CLI", opcodes, "Clear Interrupt Disable")
             cli.execute(self, memory)
 
-            opcodes = Opcodes([Opcode(216, ImpliedAddressingMode)])
+            opcodes = Opcodes([Opcode(216, ImpliedAddressingMode, 2)])
             cld = CLD("CLD", opcodes, "Clear Decimal Mode")
             cld.execute(self, memory)
             # The MOS 6502 family specification documents include a set of
@@ -231,6 +417,7 @@ class CPU:
             # wondering where extra instructions are coming from.
             self.num_instructions_loaded += 2
             self.num_instructions_executed += 2
+            self.cycles += 4
 
         # TODO: Initialize the decimal mode
         # For now, test with all flags initialized to zero
@@ -254,43 +441,86 @@ class CPU:
             self.state = state
             raise CPUStateChange(state)
 
-    def build_from_json(json_data):
+    def build_from_json(json_data, instruction_set=None, cache=True):
+        """
+        Build a CPU from a JSON representation
+
+        If instruction_set is given, it is used instead of decoding the
+        instructions in the JSON.  Instructions don't keep any
+        execution state, so CPUs built from the same chip can share one
+        instruction set.
+
+        If cache is True, the decoded chip definition is taken from the
+        chip cache, see ChipCache.  CPUs built from the same JSON then
+        share the cached instruction set and the JSON is only decoded
+        once.
+        """
         logger = logging.getLogger("bitey.cpu.cpu.CPU")
-        decoder = CPUJSONDecoder()
         logger.debug("Building CPU")
-        cpu = decoder.decode(json_data)
+        if cache:
+            definition = chip_cache.load(json_data)
+            if instruction_set is None:
+                instruction_set = definition.instruction_set
+            decoder = CPUJSONDecoder(instruction_set)
+            cpu = decoder.decode_parsed(definition.parsed_json)
+        else:
+            decoder = CPUJSONDecoder(instruction_set)
+            cpu = decoder.decode(json_data)
 
         return cpu
 
+    def check_limits(self):
+        "Stop the CPU if an instruction or cycle limit has been reached"
+        if self.num_instructions_loaded_limit is not None:
+            if self.num_instructions_loaded >= self.num_instructions_loaded_limit:
+                self.set_state(CPUState.STOPPED)
+
+        if self.cycles_limit is not None:
+            if self.cycles >= self.cycles_limit:
+                self.set_state(CPUState.STOPPED)
+
+    def get_next_instruction_debug(self, memory):
+        """
+        Load and decode the next instruction, stopping at breakpoints
+        This replaces get_next_instruction while there are breakpoints,
+        see update_breakpoints.
+        """
+        address = self.registers["PC"].value
+        if (
+            self.breakpoint_map[address]
+            and not self.ignore_breakpoints_until_next_instruction
+            and self.breakpoint_hit(address, memory)
+        ):
+            self.check_limits()
+            self.last_opcode_address = address
+            self.ignore_breakpoints_until_next_instruction = True
+            raise CPUBreakpoint(address)
+        return CPU.get_next_instruction(self, memory)
+
     def get_next_instruction(self, memory):
         """
         Load and decode the next instruction
         Increments the PC
+
+        Breakpoints aren't checked here, while there are any
+        get_next_instruction_debug is used instead.
         """
-        if self.num_instructions_loaded_limit is not None:
-            if self.num_instructions_loaded >= self.num_instructions_loaded_limit:
-                self.set_state(CPUState.STOPPED)
+        self.check_limits()
 
-        # Save the instruction address to test for breakpoints
+        # Save the address of the instruction being loaded
         self.last_opcode_address = self.registers["PC"].value
+        self.ignore_breakpoints_until_next_instruction = False
 
-        if not self.ignore_breakpoints_until_next_instruction and (
-            self.last_opcode_address in self.cpu_breakpoints
-        ):
-            self.ignore_breakpoints_until_next_instruction = True
-            raise CPUBreakpoint(self.last_opcode_address)
+        self.current_decoded = self.decode_instruction(memory, self.last_opcode_address)
+        if self.current_decoded is not None:
+            self.num_instructions_loaded += 1
+            self.current_instruction = self.current_decoded[0]
+            self.current_opcode = self.current_instruction.opcode.opcode
         else:
-            self.ignore_breakpoints_until_next_instruction = False
-
-        self.current_opcode = self.load_opcode(memory)
-        self.logger.debug(
-            "get_next_instruction opcode: {}, 0x{:2X}".format(
-                self.current_opcode, self.current_opcode
-            )
-        )
+            self.current_opcode = self.load_opcode(memory)
+            self.current_instruction = self.opcode_table[self.current_opcode]
 
         self.registers["PC"].inc()
-        self.current_instruction = self.decode_opcode(self.current_opcode)
 
         return self.current_instruction
 
@@ -299,39 +529,175 @@ class CPU:
         Return the next instruction without incrementing the PC or
         changing the CPU state.
         """
-        opcode = memory.read(self.registers["PC"].get())
-        instruction = self.instruction_set.get_instruction_by_opcode(opcode)
-
-        return instruction
+        return self.opcode_table[memory.read(self.registers["PC"].get())]
 
     def load_opcode(self, memory):
         "Load the opcode pointed to by the PC from memory"
-
-        self.logger.debug(
-            "Loading opcode at 0x{:04X}".format(self.registers["PC"].get())
-        )
-
         self.num_instructions_loaded += 1
         return memory.read(self.registers["PC"].get())
 
-    def decode_opcode(self, opcode):
-        "Decode the current opcode"
-        # TODO: refactor this, figure out how to build cleaner
-        # TODO: Add tests for this
-        instruction = self.instruction_set.get_instruction_by_opcode(opcode)
-        self.logger.debug("Decoded {}".format(instruction))
+    def decode_instruction(self, memory, address):
+        """
+        Decode the instruction at an address, using the decoded
+        instruction cache
+
+        Returns a tuple of the instruction, the method that executes
+        it, the operand bytes, the length of the instruction and the
+        number of cycles it takes, or None if the instruction runs
+        past the end of memory.  The method is called with the cpu,
+        memory and operand bytes, after the PC is set to the next
+        instruction.  The number of cycles is None if it depends on
+        whether indexing crosses a page, see Opcode.get_cycles.
+
+        Cached instructions are dropped when the memory they were
+        decoded from is written to with Memory.write.  Only pages with
+        decoded instructions are tracked, so other writes stay cheap.
+        """
+        if memory is not self.decoded_memory:
+            self.attach_decode_cache(memory)
+
+        decoded = self.decoded_instructions.get(address)
+        if decoded is None:
+            instruction = self.opcode_table[memory.read(address)]
+            opcode = instruction.opcode
+            length = opcode.addressing_mode.bytes
+            if address + length > len(memory):
+                return None
+            decoded = (
+                instruction,
+                instruction.decoded_handler(),
+                opcode.addressing_mode.read_operand(memory, address),
+                length,
+                None if opcode.page_cross_cycles else opcode.cycles,
+            )
+            self.decoded_instructions[address] = decoded
+            memory.mark_code(address, address + length)
+
+        return decoded
+
+    def clone(self):
+        """
+        Return a copy of the CPU without resetting it
+
+        The registers, flags, counters and breakpoints are copied.  The
+        instruction set and opcode table are shared, instructions don't
+        keep any execution state.  The clone starts with an empty
+        decoded instruction cache and no watchpoints.
+        """
+        cpu = copy.copy(self)
+        registers = [copy.copy(r) for r in self.registers.registers]
+        flags = [copy.copy(f) for f in self.flags.flags]
+        # Listeners belong to the original, the copies start without any
+        for watcher in registers + flags:
+            watcher.listeners = []
+        for register in registers:
+            if isinstance(register, StatusRegister):
+                register.flags = None
+        cpu.registers = Registers(registers)
+        cpu.registers.set_logger(self.logger)
+        cpu.flags = Flags(flags, None)
+        cpu.flags.attach_register(cpu.registers["P"], self.flags.lazy)
+        cpu.flags.nz_result = self.flags.nz_result
+        cpu.register_data = cpu.registers.data
+        cpu.pins = copy.deepcopy(self.pins)
+        cpu.cpu_breakpoints = {
+            address: copy.copy(breakpoint)
+            for (address, breakpoint) in self.cpu_breakpoints.items()
+        }
+        cpu.breakpoint_map = bytearray(len(self.breakpoint_map))
+        cpu.update_breakpoints()
+        cpu.watchpoint_hits = []
+        cpu.watched_memory = None
+        cpu.decoded_instructions = {}
+        cpu.decoded_memory = None
+        cpu.current_decoded = None
+        return cpu
 
-        return instruction
+    def attach_decode_cache(self, memory):
+        "Start caching decoded instructions from a different memory"
+        if self.decoded_memory is not None:
+            self.decoded_memory.remove_code_listener(self.invalidate_decoded)
+        self.decoded_instructions.clear()
+        memory.add_code_listener(self.invalidate_decoded)
+        self.decoded_memory = memory
+
+    def invalidate_decoded(self, start, end):
+        "Drop the decoded instructions overlapping a range of memory"
+        if end - start > 0x100:
+            self.decoded_instructions.clear()
+            return
+        for address in range(start - CPU.max_instruction_length + 1, end):
+            self.decoded_instructions.pop(address, None)
+
+    def set_trace_hook(self, hook):
+        """
+        Set a function to call before each instruction is executed
+
+        The hook is called with the CPU, the address of the instruction
+        and the Instruction.  log_instruction is a hook that logs each
+        instruction.  Setting the hook to None turns tracing off, there
+        is no per-instruction logging cost when tracing is off.
+        """
+        self.trace_hook = hook
+
+    def decode_opcode(self, opcode):
+        """
+        Decode an opcode
+        Undocumented opcodes decode to an UndocumentedOpcode, which
+        raises UndocumentedInstruction when it is executed.
+        """
+        return self.opcode_table[opcode]
 
     def execute_instruction(self, memory):
-        "Execute an instruction"
+        """
+        Execute an instruction
+        The cycles the instruction takes are added to cycles.
+        """
         if self.num_instructions_executed_limit is not None:
             if self.num_instructions_executed >= self.num_instructions_executed_limit:
                 self.set_state(CPUState.STOPPED)
 
-        self.logger.debug("Executing instruction")
-        self.current_instruction.execute(self, memory)
+        if self.trace_hook is not None:
+            self.trace_hook(self, self.last_opcode_address, self.current_instruction)
+
+        decoded = self.current_decoded
+        pc = self.registers["PC"].get()
+        if (
+            decoded is not None
+            and pc == self.last_opcode_address + 1
+            and self.decoded_instructions.get(self.last_opcode_address) is decoded
+        ):
+            # The instruction is still the one that was loaded, skip
+            # reading the operand again
+            self.registers["PC"].set((self.last_opcode_address + decoded[3]) & 0xFFFF)
+            decoded[1](self, memory, decoded[2])
+            cycles = decoded[4]
+            if cycles is None:
+                cycles = decoded[0].opcode.get_cycles(
+                    self.registers, memory, decoded[2]
+                )
+        else:
+            opcode = self.current_instruction.opcode
+            operand = None
+            if opcode.page_cross_cycles:
+                operand = opcode.addressing_mode.read_operand(memory, pc - 1)
+            self.current_instruction.execute(self, memory)
+            cycles = opcode.cycles
+            if operand is not None:
+                cycles = opcode.get_cycles(self.registers, memory, operand)
         self.num_instructions_executed += 1
+        self.cycles += cycles
+
+    def branch(self, address):
+        """
+        Take a branch to an address
+        Branch instructions call this when the branch is taken.  A
+        taken branch takes one more cycle, or two more if the address
+        is on a different page than the next instruction.
+        """
+        pc = self.registers["PC"].get()
+        self.cycles += 2 if (pc ^ address) & 0xFF00 else 1
+        self.registers["PC"].set(address)
 
     def step(self, memory, count=1, instruction_loaded=False):
         """
@@ -450,13 +816,89 @@ class CPU:
 
     # Debugger related methods
 
-    def set_breakpoint(self, address):
-        "Set a breakpoint in the CPU"
-        self.cpu_breakpoints[address] = True
+    def set_breakpoint(self, address, condition=None, hit_count=0, one_shot=False):
+        """
+        Set a breakpoint in the CPU
+        condition is an expression like "A == 0x10 and mem[0x20] > 3",
+        it's compiled once here, see ConditionCompiler.  The CPU only
+        stops when the condition is true, from the hit_count hit on.
+        A one_shot breakpoint is cleared when it stops the CPU.
+        ConditionError is raised if the condition isn't valid.
+        """
+        breakpoint = Breakpoint(address, condition, hit_count, one_shot)
+        if condition is not None:
+            breakpoint.test = ConditionCompiler(self).compile(condition)
+        self.cpu_breakpoints[address] = breakpoint
+        self.update_breakpoints()
 
     def clear_breakpoint(self, address):
         "Clear a breakpoint in the CPU"
         del self.cpu_breakpoints[address]
+        self.update_breakpoints()
+
+    def update_breakpoints(self):
+        """
+        Rebuild the breakpoint bitmap from cpu_breakpoints
+
+        The bitmap has a byte per address, set if there is a
+        breakpoint.  The instruction fetch only tests it while there
+        are breakpoints: get_next_instruction_debug is set as the
+        instance's get_next_instruction then, and removed again when
+        the last breakpoint is cleared.  Call this after changing
+        cpu_breakpoints directly.
+        """
+        self.breakpoint_map[:] = bytes(len(self.breakpoint_map))
+        for address in self.cpu_breakpoints:
+            self.breakpoint_map[address] = 1
+        if self.cpu_breakpoints:
+            self.get_next_instruction = self.get_next_instruction_debug
+        elif "get_next_instruction" in self.__dict__:
+            del self.get_next_instruction
+
+    def breakpoint_hit(self, address, memory):
+        """
+        Called when an instruction with a breakpoint is reached
+        Returns True if the CPU should stop, see Breakpoint.should_stop.
+        One-shot breakpoints are cleared when they stop the CPU.
+        """
+        breakpoint = self.cpu_breakpoints[address]
+        if not breakpoint.should_stop(self, memory):
+            return False
+        if breakpoint.one_shot:
+            self.clear_breakpoint(address)
+        return True
+
+    def set_watchpoint(self, address, memory, end=None, read=False, write=True):
+        """
+        Set a watchpoint on an address or a range of addresses
+
+        The range includes the start location but not the end
+        location, if end is None only address is watched.  A hit stops
+        the CPU after the instruction that accessed the address.
+        Computer.run raises CPUWatchpoint, Computer.run_fast and
+        Computer.run_compiled return a RunResult with the
+        StopReason.WATCHPOINT reason and the hits.  See
+        Memory.add_watchpoint
+        """
+        if self.watched_memory is not memory:
+            if self.watched_memory is not None:
+                self.watched_memory.remove_watch_listener(self.watchpoint_hit)
+            memory.add_watch_listener(self.watchpoint_hit)
+            self.watched_memory = memory
+        memory.add_watchpoint(address, end, read, write)
+
+    def clear_watchpoint(self, address, memory, end=None):
+        "Clear a watchpoint on an address or a range of addresses"
+        memory.remove_watchpoint(address, end)
+
+    def watchpoint_hit(self, hit):
+        """
+        Record a watchpoint hit and stop the CPU
+        The state is changed without raising CPUStateChange, so the
+        current instruction finishes.
+        """
+        self.watchpoint_hits.append(hit)
+        self.state = CPUState.STOPPED
 
 
 class CPUJSONDecoder(JSONDecoder):
@@ -464,8 +906,9 @@ class CPUJSONDecoder(JSONDecoder):
     Decode a CPU in JSON format
     """
 
-    def __init__(self):
+    def __init__(self, instruction_set=None):
         self.logger = logging.getLogger("bitey.cpu.cpu.CPUJSONDecoder")
+        self.instruction_set = instruction_set
 
     def decode(self, json_doc):
         parsed_json = json.loads(json_doc)
@@ -482,8 +925,8 @@ class CPUJSONDecoder(JSONDecoder):
             registers_decoder = RegistersJSONDecoder()
             registers = registers_decoder.decode_parsed(parsed_json["registers"])
 
-        instruction_set = None
-        if "instructions" in parsed_json:
+        instruction_set = self.instruction_set
+        if (instruction_set is None) and ("instructions" in parsed_json):
             instruction_set_decoder = InstructionSetJSONDecoder()
             instruction_set = instruction_set_decoder.decode_parsed(
                 parsed_json["instructions"]
@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
 from typing import Dict
+from bitey.cpu.register import StatusRegister
 from bitey.listener import Listener
 from bitey.watcher import Watcher
 
@@ -33,7 +34,9 @@ class Flag(Watcher):
     "Optional dictionary of enabled bugs or quirks for this instruction"
 
     def __post_init__(self):
+        super().__init__()
         self.flags = None
+        self.mask = 1 << self.bit_field_pos
         # self.pflag_listener = Listener()
         # self.pflag_listener.register_callback(self.update_flag_data)
 
@@ -44,24 +47,76 @@ class Flag(Watcher):
     def set(self, update=True):
         "Set this flag.  Set it to true."
         self.status = True
-        if self.flags is not None:
-            self.flags.set_bit(self.short_name)
-        if update:
+        flags = self.flags
+        if flags is not None:
+            # Only this flag's bit changes, so a pending N and Z result
+            # doesn't need to be materialized
+            flags.store[flags.index] |= self.mask
+        if update and self.listeners:
             self.update()
 
     def clear(self, update=True):
         "Clear this flag.  Set it to False."
         self.status = False
-        if self.flags is not None:
-            self.flags.clear_bit(self.short_name)
-        if update:
+        flags = self.flags
+        if flags is not None:
+            flags.store[flags.index] &= ~self.mask & 0xFF
+        if update and self.listeners:
             self.update()
 
 
+@dataclass
+class LazyFlag(Flag):
+    """
+    A flag that can be derived from the last result byte
+
+    The N and Z flags are set by most instructions from a single
+    result byte.  In lazy mode the Flags object records that byte
+    instead of setting the flags, and the status of a LazyFlag is
+    computed from the pending result when it is read.
+
+    Subclasses implement test_pending to compute the status from a
+    result byte.
+    """
+
+    def get_status(self):
+        "Get the flag status, computing it from a pending result if there is one"
+        flags = self.flags
+        if flags is not None and flags.nz_result is not None:
+            return self.test_pending(flags.nz_result)
+        return self.stored_status
+
+    def set_status(self, status):
+        "Set the stored flag status"
+        self.stored_status = status
+
+    def test_pending(self, result):
+        "Compute the status of the flag from a result byte"
+        raise NotImplementedError
+
+    def set(self, update=True):
+        "Set this flag.  Set it to true."
+        if self.flags is not None and self.flags.nz_result is not None:
+            self.flags.materialize()
+        super().set(update)
+
+    def clear(self, update=True):
+        "Clear this flag.  Set it to False."
+        if self.flags is not None and self.flags.nz_result is not None:
+            self.flags.materialize()
+        super().clear(update)
+
+
 @dataclass
 class Flags(Watcher):
     """
     Define a set of processor flags
+
+    The flags byte is kept in a one-slot store until the flags are
+    attached to a status register with attach_register.  After that
+    the flags byte and the register share the same register file
+    slot, so setting a flag updates the register without any listener
+    calls.
     """
 
     flags: list[Flag]
@@ -69,10 +124,20 @@ class Flags(Watcher):
 
     def __post_init__(self):
         "Create a dictionary so we can access flags by short name"
+        super().__init__()
         self.flag_dict = {}
         for f in self.flags:
             self.flag_dict[f.short_name] = f
 
+        self.lazy = False
+        """
+        In lazy mode, set_nz records the result byte and the N and Z
+        flags are only updated when the flags byte is read
+        """
+
+        self.nz_result = None
+        "The result byte N and Z should be set from, or None"
+
         # Create a reference in each Flag to this Flags object
         for f in self.flags:
             f.flags = self
@@ -82,6 +147,96 @@ class Flags(Watcher):
         self.pflag_listener = Listener()
         self.pflag_listener.register_callback(self.update_flag_data)
 
+    def get_data(self):
+        "Get the flags byte"
+        if self.nz_result is not None:
+            self.materialize()
+        return self.store[self.index]
+
+    def set_data(self, data):
+        "Set the flags byte"
+        self.nz_result = None
+        try:
+            self.store[self.index] = data
+        except AttributeError:
+            # The generated __init__ sets the data before there is a store
+            self.store = [data]
+            self.index = 0
+
+    def attach_register(self, register, lazy=False):
+        """
+        Keep the flags byte in a register's slot
+
+        The flags byte and the register share storage after this, and
+        the individual flags are updated when the register is set.
+
+        If lazy is True and the register is a StatusRegister, N and Z
+        are evaluated lazily, see set_nz.
+        """
+        self.store = register.store
+        self.index = register.index
+        register.register(self.pflag_listener)
+        self.update_flag_data(register)
+
+        if isinstance(register, StatusRegister):
+            register.flags = self
+            self.lazy = lazy
+
+    def set_nz(self, result):
+        """
+        Set the N and Z flags from a result byte
+
+        N is set if bit seven of the result is one.
+        Z is set if the result is zero.
+
+        In lazy mode the result is only recorded.  Reading the N or Z
+        flag status computes it from the result, and reading the flags
+        byte or the P register materializes both flags.
+        """
+        self.nz_result = result
+        if not self.lazy:
+            self.materialize()
+
+    def materialize(self):
+        "Update the N and Z flags from a pending result"
+        result = self.nz_result
+        if result is None:
+            return
+        self.nz_result = None
+
+        negative = self.flag_dict["N"]
+        if (result & 0x80) != 0:
+            negative.set()
+        else:
+            negative.clear()
+
+        zero = self.flag_dict["Z"]
+        if (result & 0xFF) == 0:
+            zero.set()
+        else:
+            zero.clear()
+
+    def set_bits(self, mask, bits):
+        """
+        Set the flags in mask from the matching bits of a flags byte
+
+        This updates several flags with one write to the flags byte.
+        """
+        if self.nz_result is not None:
+            nz_mask = self.flag_dict["N"].mask | self.flag_dict["Z"].mask
+            if (mask & nz_mask) == nz_mask:
+                self.nz_result = None
+            else:
+                self.materialize()
+
+        data = (self.store[self.index] & ~mask & 0xFF) | (bits & mask)
+        self.store[self.index] = data
+        for flag in self.flags:
+            if flag.mask & mask:
+                flag.status = (data & flag.mask) != 0
+                if flag.listeners:
+                    flag.update()
+
     def __str__(self):
         "Return a string representation of the flags"
         return ", ".join([str(x) for x in self.flags])
@@ -92,43 +247,46 @@ class Flags(Watcher):
     def set(self, flag):
         "Set a flag and the bit in the flags byte"
         self[flag].set()
-        self.set_bit(flag)
-        self.update()
+        if self.listeners:
+            self.update()
 
     def set_bit(self, flag):
         """
         Set a flag bit in the flags byte
         This is a private method
         """
-        bit = 2 ** self[flag].bit_field_pos
-        self.data = self.data | bit
-        self.update()
+        self.data |= self[flag].mask
+        if self.listeners:
+            self.update()
 
     def clear(self, flag):
         "Clear a flag and the bit in the flags byte"
         self[flag].clear()
-        self.clear_bit(flag)
-        self.update()
+        if self.listeners:
+            self.update()
 
     def clear_bit(self, flag):
         """
         Clear a flag bit in the flags byte
         This is a private method
         """
-        # Clear the bit
-        bit = 2 ** self[flag].bit_field_pos
-        self.data = self.data & (0xFF - bit)
-        self.update()
+        self.data &= ~self[flag].mask & 0xFF
+        if self.listeners:
+            self.update()
 
     def update_flag_data(self, register):
-        "Update Flags data if the P register is updated"
-        self.data = register.get()
+        "Update the individual flags if the P register is updated"
+        self.nz_result = None
+        data = register.get()
+        if self.store[self.index] != data:
+            self.set_data(data)
 
-        # Update the individual flags
         for flag in self.flags:
-            bfp = flag.bit_field_pos
-            bit = 2**bfp
-            if (self.data & bit) != 0:
-                flag.set(False)
-            else:
-                flag.clear(False)
+            flag.status = (data & flag.mask) != 0
+
+
+# The status of a lazy flag can be computed from a pending result, see Register
+LazyFlag.status = property(LazyFlag.get_status, LazyFlag.set_status)
+
+# The flags byte is kept in the store instead of the instance, see Register
+Flags.data = property(Flags.get_data, Flags.set_data)
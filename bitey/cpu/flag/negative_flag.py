@@ -1,9 +1,9 @@
 from dataclasses import dataclass
-from bitey.cpu.flag.flag import Flag
+from bitey.cpu.flag.flag import LazyFlag
 
 
 @dataclass
-class NegativeFlag(Flag):
+class NegativeFlag(LazyFlag):
     """
     The Negative Flag, also called the N Flag
     Set if the result of an instructions sets bit seven
@@ -29,3 +29,7 @@ class NegativeFlag(Flag):
         """
 
         return self.test_result(register.get())
+
+    def test_pending(self, result):
+        "Compute the status from a pending result byte"
+        return (result & 0x80) != 0
@@ -1,9 +1,9 @@
 from dataclasses import dataclass
-from bitey.cpu.flag.flag import Flag
+from bitey.cpu.flag.flag import LazyFlag
 
 
 @dataclass
-class ZeroFlag(Flag):
+class ZeroFlag(LazyFlag):
     """
     The Zero Flag, also called the Zero Result Flag
     """
@@ -28,3 +28,7 @@ class ZeroFlag(Flag):
         """
 
         return self.test_result(register.get())
+
+    def test_pending(self, result):
+        "Compute the status from a pending result byte"
+        return (result & 0xFF) == 0
@@ -1,9 +1,102 @@
 from dataclasses import dataclass
+from typing import ClassVar
 from bitey.cpu.instruction.instruction import Instruction
 from bitey.cpu.instruction.incomplete_instruction import IncompleteInstruction
+from bitey.cpu.instruction.decimal_table import DecimalTable
 from bitey.cpu.arch import EightBitArch
 
 
+def decimal_add(accumulator, value, carry):
+    """
+    Add two BCD values the way the chips do
+    Returns the final result and the result before the high nibble is
+    adjusted, which the NMOS chips set some flags from.
+    """
+    # Add the nibbles one at a time
+    # First add the low nibbles
+    result = (
+        EightBitArch.low_nibble(accumulator) + EightBitArch.low_nibble(value) + carry
+    )
+
+    # Decimal addition doesn't allow values greater than 9 in either nibble
+    if result >= 10:
+        # "Bump" the extra result over to the next nibble
+        # ((result + 0x06) & 0x0F) masks out the tens
+        # ((result + 0x06) & 0x0F) + 0x10 masks out the tens and adds
+        # the decimal carry from the low nibble
+        result = ((result + 0x06) & 0x0F) + 0x10
+
+    # Add the high nibbles
+    result += (accumulator & 0xF0) + (value & 0xF0)
+
+    # The chips set the sign bit based on the result up to here
+    sign_bit_result = result
+
+    # If the value in the high nibble is greater than 9, bump the result
+    # 0xA0 -> 0b1010 0000, 0b1010 is 10
+    if result >= 0xA0:
+        result += 0x60
+
+    return (result, sign_bit_result)
+
+
+def nmos_decimal_add(accumulator, value, carry):
+    "Decimal mode ADC on NMOS chips, returns the accumulator and flags byte"
+    (result, sign_bit_result) = decimal_add(accumulator, value, carry)
+    binary_addition_result = accumulator + value + carry
+
+    flags = 0
+    # Set the carry flag
+    if result > 0x99:
+        flags |= DecimalTable.carry
+
+    # Set the sign flag
+    # For NMOS chips, this is based on the binary addition result
+    if (sign_bit_result & 0x80) != 0:
+        flags |= DecimalTable.negative
+
+    # Set the zero flag
+    # For NMOS chips, this is based on the binary addition result
+    if (binary_addition_result & 0xFF) == 0:
+        flags |= DecimalTable.zero
+
+    # Set the overflow flag if bit seven changed
+    # For NMOS chips, this is based on the binary addition result
+    if ((accumulator ^ sign_bit_result) & 0x80) and (
+        not ((accumulator ^ value) & 0x80)
+    ):
+        flags |= DecimalTable.overflow
+
+    return (result & 0xFF, flags)
+
+
+def cmos_decimal_add(accumulator, value, carry):
+    "Decimal mode ADC on CMOS chips, returns the accumulator and flags byte"
+    (result, sign_bit_result) = decimal_add(accumulator, value, carry)
+
+    flags = 0
+    # Set the carry flag
+    if result > 0x99:
+        flags |= DecimalTable.carry
+
+    # Set the sign flag
+    if (result & 0x80) != 0:
+        flags |= DecimalTable.negative
+
+    # These flags are set differently on CMOS
+    # Set the zero flag
+    # For CMOS chips, this is based on the final addition result
+    if (result & 0xFF) == 0:
+        flags |= DecimalTable.zero
+
+    # Overflow flag is set if result is greater than what a signed
+    # representation can hold
+    if result >= 0x80:
+        flags |= DecimalTable.overflow
+
+    return (result & 0xFF, flags)
+
+
 @dataclass
 class ADCNMOS(Instruction):
     """
@@ -46,6 +139,9 @@ class ADCNMOS(Instruction):
 
     """
 
+    decimal_table: ClassVar[DecimalTable] = DecimalTable(nmos_decimal_add)
+    "Decimal mode results, built the first time decimal mode is used"
+
     def instruction_execute(self, cpu, memory, value, address):
         """
         ADC: Add Memory to Accumulator with Carry
@@ -56,136 +152,65 @@ class ADCNMOS(Instruction):
         if cpu.flags["D"].status is False:
             # Normal binary addition
             if value is not None:
-                self.value = value
-                self.carry_value = 1 if cpu.flags["C"].status else 0
-                self.accumulator_value = cpu.registers["A"].get()
-                self.result = self.accumulator_value + self.value + self.carry_value
-                cpu.registers["A"].set(self.result & 0xFF)
-                self.set_flags(cpu.flags, cpu.registers)
+                carry = 1 if cpu.flags["C"].status else 0
+                accumulator = cpu.registers["A"].get()
+                result = accumulator + value + carry
+                cpu.registers["A"].set(result & 0xFF)
+                self.set_flags(cpu.flags, cpu.registers, accumulator, value, result)
+                return result
             else:
-                self.value = None
-                self.result = None
                 raise IncompleteInstruction
         else:
-            # Decimal mode addition
+            # Decimal mode addition, see nmos_decimal_add
             if value is not None:
-                self.value = value
-                self.carry_value = 1 if cpu.flags["C"].status else 0
-                self.accumulator_value = cpu.registers["A"].get()
-                self.binary_addition_result = (
-                    self.accumulator_value + self.value + self.carry_value
+                entry = self.decimal_table.lookup(
+                    cpu.registers["A"].get(), value, cpu.flags["C"].status
                 )
-
-                # Add the nibbles one at a time
-                # First add the low nibbles
-                self.result = (
-                    EightBitArch.low_nibble(self.accumulator_value)
-                    + EightBitArch.low_nibble(self.value)
-                    + self.carry_value
-                )
-
-                # Decimal addition doesn't allow values greater than 9 in either nibble
-                if self.result >= 10:
-                    # "Bump" the extra result over to the next nibble
-                    # ((self.result + 0x06) & 0x0F) masks out the tens
-                    # ((self.result + 0x06) & 0x0F) + 0x10 masks out the tens and adds
-                    # the decimal carry from the low nibble
-                    self.result = ((self.result + 0x06) & 0x0F) + 0x10
-
-                # Add the high nibbles
-                self.result += (self.accumulator_value & 0xF0) + (self.value & 0xF0)
-
-                # The chips set the sign bit based on the result up to here
-                self.sign_bit_result = self.result
-
-                # If the value in the high nibble is greater than 9, bump the result
-                # 0xA0 -> 0b1010 0000, 0b1010 is 10
-                if self.result >= 0xA0:
-                    self.result += 0x60
-
-                cpu.registers["A"].set(self.result & 0xFF)
-
-                self.set_flags(cpu.flags, cpu.registers)
+                cpu.registers["A"].set(entry & 0xFF)
+                cpu.flags.set_bits(DecimalTable.flags_mask, entry >> 8)
+                return entry & 0xFF
             else:
-                self.value = None
-                self.result = None
                 raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):  # noqa: C901
-        if flags["D"].status is False:
-            # binary mode addition
-            if self.result is not None:
-                # Set the carry flag
-                if self.result > 0xFF:
-                    flags["C"].set()
-                else:
-                    flags["C"].clear()
-
-                # Set the zero flag if the accumlator is zero
-                if registers["A"].get() == 0x00:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
-
-                # Set the sign flag
-                if (self.result & 0x80) != 0:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-
-                # Set the overflow flag if bit seven changed
-                # The rule is, set the overflow if:
-                # Both the operands are < 0x80 and the result is > 0x80, or
-                # Both the operands are > 0x80 and the result is < 0x80
-                # Inefficient, could be optimized
-                # fmt: off
-                if (
-                        (((self.accumulator_value >= 0x80)
-                          and (self.value >= 0x80))
-                         and (registers["A"].get() < 0x80))
-                        or
-                        (((self.accumulator_value < 0x80)
-                          and (self.value < 0x80))
-                         and (registers["A"].get() >= 0x80))
-                ):
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
-                # fmt: on
+    def set_flags(self, flags, registers, accumulator, value, result):
+        "Set the flags after a binary mode addition"
+        # Set the carry flag
+        if result > 0xFF:
+            flags["C"].set()
+        else:
+            flags["C"].clear()
+
+        # Set the zero flag if the accumlator is zero
+        if registers["A"].get() == 0x00:
+            flags["Z"].set()
+        else:
+            flags["Z"].clear()
+
+        # Set the sign flag
+        if (result & 0x80) != 0:
+            flags["N"].set()
+        else:
+            flags["N"].clear()
+
+        # Set the overflow flag if bit seven changed
+        # The rule is, set the overflow if:
+        # Both the operands are < 0x80 and the result is > 0x80, or
+        # Both the operands are > 0x80 and the result is < 0x80
+        # Inefficient, could be optimized
+        # fmt: off
+        if (
+                (((accumulator >= 0x80)
+                  and (value >= 0x80))
+                 and (registers["A"].get() < 0x80))
+                or
+                (((accumulator < 0x80)
+                  and (value < 0x80))
+                 and (registers["A"].get() >= 0x80))
+        ):
+            flags["V"].set()
         else:
-            # decimal mode addition
-            if self.result is not None:
-                # Set the carry flag
-                if self.result > 0x99:
-                    flags["C"].set()
-                else:
-                    flags["C"].clear()
-
-                # Set the sign flag
-                # For NMOS chips, this is based on the binary addition result
-                if (self.sign_bit_result & 0x80) != 0:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-
-                # Set the zero flag
-                # For NMOS chips, this is based on the binary addition result
-                if (self.binary_addition_result & 0xFF) == 0:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
-
-                # Set the overflow flag if bit seven changed
-                # For NMOS chips, this is based on the binary addition result
-                # fmt: off
-                if (
-                        ((self.accumulator_value ^ self.sign_bit_result) & 0x80)
-                        and (not ((self.accumulator_value ^ self.value) & 0x80))
-                ):
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
-                # fmt: on
+            flags["V"].clear()
+        # fmt: on
 
 
 @dataclass
@@ -230,6 +255,9 @@ class ADCCMOS(Instruction):
 
     """
 
+    decimal_table: ClassVar[DecimalTable] = DecimalTable(cmos_decimal_add)
+    "Decimal mode results, built the first time decimal mode is used"
+
     def instruction_execute(self, cpu, memory, value, address):
         """
         ADC: Add Memory to Accumulator with Carry
@@ -240,173 +268,110 @@ class ADCCMOS(Instruction):
         if cpu.flags["D"].status is False:
             # Normal binary addition
             if value is not None:
-                self.value = value
-                self.carry_value = 1 if cpu.flags["C"].status else 0
-                self.accumulator_value = cpu.registers["A"].get()
-                self.result = self.accumulator_value + self.value + self.carry_value
-                cpu.registers["A"].set(self.result & 0xFF)
-                self.set_flags(cpu.flags, cpu.registers)
+                carry = 1 if cpu.flags["C"].status else 0
+                accumulator = cpu.registers["A"].get()
+                result = accumulator + value + carry
+                cpu.registers["A"].set(result & 0xFF)
+                self.set_flags(cpu.flags, cpu.registers, accumulator, value, result)
+                return result
             else:
-                self.value = None
-                self.result = None
                 raise IncompleteInstruction
         else:
-            # Decimal mode addition
+            # Decimal mode addition, see cmos_decimal_add
             if value is not None:
-                self.value = value
-                self.carry_value = 1 if cpu.flags["C"].status else 0
-                self.accumulator_value = cpu.registers["A"].get()
-
-                # Add the nibbles one at a time
-                # First add the low nibbles
-                self.result = (
-                    EightBitArch.low_nibble(self.accumulator_value)
-                    + EightBitArch.low_nibble(self.value)
-                    + self.carry_value
+                entry = self.decimal_table.lookup(
+                    cpu.registers["A"].get(), value, cpu.flags["C"].status
                 )
-
-                # Decimal addition doesn't allow values greater than 9 in either nibble
-                if self.result >= 10:
-                    # "Bump" the extra result over to the next nibble
-                    # ((self.result + 0x06) & 0x0F) masks out the tens
-                    # ((self.result + 0x06) & 0x0F) + 0x10 masks out the tens and adds
-                    # the decimal carry from the low nibble
-                    self.result = ((self.result + 0x06) & 0x0F) + 0x10
-
-                # Add the high nibbles
-                self.result += (self.accumulator_value & 0xF0) + (self.value & 0xF0)
-
-                # The chips set the sign bit based on the result up to here
-                self.sign_bit_result = self.result
-
-                # If the value in the high nibble is greater than 9, bump the result
-                # 0xA0 -> 0b1010 0000, 0b1010 is 10
-                if self.result >= 0xA0:
-                    self.result += 0x60
-
-                cpu.registers["A"].set(self.result & 0xFF)
-
-                self.set_flags(cpu.flags, cpu.registers)
+                cpu.registers["A"].set(entry & 0xFF)
+                cpu.flags.set_bits(DecimalTable.flags_mask, entry >> 8)
+                return entry & 0xFF
             else:
-                self.value = None
-                self.result = None
                 raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):  # noqa: C901
-        if flags["D"].status is False:
-            # binary mode addition
-            if self.result is not None:
-                # Set the carry flag
-                if self.result > 0xFF:
-                    flags["C"].set()
-                else:
-                    flags["C"].clear()
-
-                # Set the zero flag if the accumlator is zero
-                if registers["A"].get() == 0x00:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
-
-                # Set the negative flag
-                if (registers["A"].get() & 0x80) != 0:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-                # Set the overflow flag
-
-                # This behavior was modified several times
-                # The current behavior is described right above the conditional
-                # It's based on simulations with the visual6502.org
-                # transistor-level simulator
-
-                # The previous, possibly incorrect behavior is described below
-
-                # This interpretation of the V flag should be compared against
-                # actual hardware
-                # This comparison is made in the SBC instruction too
-                # This is based on logic from apple2emu and AppleWin
-                # The last 0x80 mask indicates we're only indicated in bit seven
-                # Here's a simple addition table of several two two-bit signed numbers
-                # to show how this comparison works, using 0x02 (0b10) as the mask:
-                # A:    00    01    00    10    11    01
-                # M:  + 00  + 00  + 01  + 00  + 01  + 11
-                #       --    --    --    --    --    --
-                #       00    01    01    10   100   100
-                #
-                # V:     0     0     0     0     1     0
-                # In particular, note it's not symmetric,
-                # the accumlator bit change is what is checked.
-                # If the accumulator is 0b01 and the memory is 0b11,
-                # V is 0, but if the accumulator is 0b11 and the memory is 0b01,
-                # V is 1
-
-                # The current behavior uses transistor-level models from
-                # visual6502.org
-                # These simulations may be inaccurate or have bugs, they haven't
-                # been verified against hardware runs.
-                #
-                # An assembly language program to run all possible combinations of
-                # adds is included in the examples directory
-                # Simply change CLD, SEC and ADC to try other combinations
-                #
-                # The behavior of the V flag in ADC decimal mode isn't a simple
-                # "triangular" reflection, but a triangular reflection with a
-                # series of spikes or "plates" on one edge and a series of
-                # indentations on the other edge.
-
-                # The rule is, set the overflow if:
-                # Both the operands are < 0x80 and the result is > 0x80, or
-                # Both the operands are > 0x80 and the result is < 0x80
-                # Inefficient, could be optimized
-
-                # This uses the following rule:
-                # The rule is, set the overflow if:
-                # Both the operands are < 0x80 and the result is > 0x80, or
-                # Both the operands are > 0x80 and the result is < 0x80
-                # fmt: off
-                if (
-                        (((self.accumulator_value >= 0x80)
-                          and (self.value >= 0x80))
-                         and (registers["A"].get() < 0x80))
-                        or
-                        (((self.accumulator_value < 0x80)
-                          and (self.value < 0x80))
-                         and (registers["A"].get() >= 0x80))
-                ):
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
-                # fmt: on
+    def set_flags(self, flags, registers, accumulator, value, result):
+        "Set the flags after a binary mode addition"
+        # Set the carry flag
+        if result > 0xFF:
+            flags["C"].set()
+        else:
+            flags["C"].clear()
+
+        # Set the zero flag if the accumlator is zero
+        if registers["A"].get() == 0x00:
+            flags["Z"].set()
+        else:
+            flags["Z"].clear()
+
+        # Set the negative flag
+        if (registers["A"].get() & 0x80) != 0:
+            flags["N"].set()
+        else:
+            flags["N"].clear()
+        # Set the overflow flag
+
+        # This behavior was modified several times
+        # The current behavior is described right above the conditional
+        # It's based on simulations with the visual6502.org
+        # transistor-level simulator
+
+        # The previous, possibly incorrect behavior is described below
+
+        # This interpretation of the V flag should be compared against
+        # actual hardware
+        # This comparison is made in the SBC instruction too
+        # This is based on logic from apple2emu and AppleWin
+        # The last 0x80 mask indicates we're only indicated in bit seven
+        # Here's a simple addition table of several two two-bit signed numbers
+        # to show how this comparison works, using 0x02 (0b10) as the mask:
+        # A:    00    01    00    10    11    01
+        # M:  + 00  + 00  + 01  + 00  + 01  + 11
+        #       --    --    --    --    --    --
+        #       00    01    01    10   100   100
+        #
+        # V:     0     0     0     0     1     0
+        # In particular, note it's not symmetric,
+        # the accumlator bit change is what is checked.
+        # If the accumulator is 0b01 and the memory is 0b11,
+        # V is 0, but if the accumulator is 0b11 and the memory is 0b01,
+        # V is 1
+
+        # The current behavior uses transistor-level models from
+        # visual6502.org
+        # These simulations may be inaccurate or have bugs, they haven't
+        # been verified against hardware runs.
+        #
+        # An assembly language program to run all possible combinations of
+        # adds is included in the examples directory
+        # Simply change CLD, SEC and ADC to try other combinations
+        #
+        # The behavior of the V flag in ADC decimal mode isn't a simple
+        # "triangular" reflection, but a triangular reflection with a
+        # series of spikes or "plates" on one edge and a series of
+        # indentations on the other edge.
+
+        # The rule is, set the overflow if:
+        # Both the operands are < 0x80 and the result is > 0x80, or
+        # Both the operands are > 0x80 and the result is < 0x80
+        # Inefficient, could be optimized
+
+        # This uses the following rule:
+        # The rule is, set the overflow if:
+        # Both the operands are < 0x80 and the result is > 0x80, or
+        # Both the operands are > 0x80 and the result is < 0x80
+        # fmt: off
+        if (
+                (((accumulator >= 0x80)
+                  and (value >= 0x80))
+                 and (registers["A"].get() < 0x80))
+                or
+                (((accumulator < 0x80)
+                  and (value < 0x80))
+                 and (registers["A"].get() >= 0x80))
+        ):
+            flags["V"].set()
         else:
-            # decimal mode addition
-            if self.result is not None:
-                # Set the carry flag
-                if self.result > 0x99:
-                    flags["C"].set()
-                else:
-                    flags["C"].clear()
-
-                # Set the sign flag
-                if (self.result & 0x80) != 0:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-
-                # These flags are set differently on CMOS
-                # Set the zero flag
-                # For CMOS chips, this is based on the final addition result
-                if (self.result & 0xFF) == 0:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
-
-                # Overflow flag is set if result is greater than what a signed
-                # representation can hold
-                if self.result >= 0x80:
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
+            flags["V"].clear()
+        # fmt: on
 
 
 class ADC(ADCNMOS):
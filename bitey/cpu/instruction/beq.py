@@ -12,4 +12,4 @@ class BEQ(Instruction):
 
     def instruction_execute(self, cpu, memory, value, address=None):
         if (address is not None) and (cpu.flags["Z"].status is True):
-            cpu.registers["PC"].set(address)
+            cpu.branch(address)
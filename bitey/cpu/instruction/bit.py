@@ -23,33 +23,27 @@ class BIT(Instruction):
     def instruction_execute(self, cpu, memory, value, address):
         "Execute the instruction"
         if value is not None:
-            self.value = value
-            self.result = cpu.registers["A"].get() & value
-            self.set_flags(cpu.flags, cpu.registers)
+            result = cpu.registers["A"].get() & value
+            self.set_flags(cpu.flags, cpu.registers, value, result)
+            return result
         else:
-            self.value = None
-            self.result = None
             raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):
-        if self.value is not None:
-            # The Negative flag is set based on the value in the
-            # memory location, not the final result of the AND
-            if (self.value & 0x80) != 0x00:
-                flags["N"].set()
-            else:
-                flags["N"].clear()
-            # The Overflow flag is set based on the value in the
-            # memory location, not the final result of the AND
-            if (self.value & 0x40) != 0x00:
-                flags["V"].set()
-            else:
-                flags["V"].clear()
-
-        if self.result is not None:
-            if self.result == 0x00:
-                flags["Z"].set()
-            else:
-                flags["Z"].clear()
-
-        return
+    def set_flags(self, flags, registers, value, result):
+        # The Negative flag is set based on the value in the
+        # memory location, not the final result of the AND
+        if (value & 0x80) != 0x00:
+            flags["N"].set()
+        else:
+            flags["N"].clear()
+        # The Overflow flag is set based on the value in the
+        # memory location, not the final result of the AND
+        if (value & 0x40) != 0x00:
+            flags["V"].set()
+        else:
+            flags["V"].clear()
+
+        if result == 0x00:
+            flags["Z"].set()
+        else:
+            flags["Z"].clear()
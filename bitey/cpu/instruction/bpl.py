@@ -12,4 +12,4 @@ class BPL(Instruction):
 
     def instruction_execute(self, cpu, memory, value, address=None):
         if (address is not None) and (cpu.flags["N"].status is not True):
-            cpu.registers["PC"].set(address)
+            cpu.branch(address)
@@ -20,13 +20,11 @@ class CP(Instruction):
         "Initialize with the register"
         super().__init__(name, opcode, description, options)
         self.register = register
-        # result is the intermediate result of the subtraction
-        self.result = None
 
     def instruction_execute(self, cpu, memory, value, address=None):
         """
         Subtract the contents of memory from the contents of the index
-        Store the intermediate result, then test flags.
+        Return the intermediate result, after testing flags.
 
         From the MCS6500 Family Programming Manual,
         the results of a compare are:
@@ -37,31 +35,30 @@ class CP(Instruction):
         Accumulator > Memory    Either      Set     Reset    Unchanged
         """
         if value is not None:
-            self.value = value
-            self.register_value = cpu.registers[self.register].get()
+            register_value = cpu.registers[self.register].get()
 
             # Using simple subtraction
-            self.result = self.register_value - self.value
+            result = register_value - value
 
             # Using proper two's complement addition for subtraction
-            # self.complemented_value = 0xFF - self.value
-            # self.result = 0xFF - (self.register_value + self.complemented_value)
-            # # self.result = EightBitArch.signed_int_to_twos_complement(result)
+            # complemented_value = 0xFF - value
+            # result = 0xFF - (register_value + complemented_value)
+            # # result = EightBitArch.signed_int_to_twos_complement(result)
 
-            self.set_flags(cpu.flags, cpu.registers)
+            self.set_flags(cpu.flags, cpu.registers, register_value, value, result)
+            return result
         else:
             raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):
+    def set_flags(self, flags, registers, register_value, value, result):
         """
         Sets flags based on the result of the subtract operation
         """
-        if self.register_value < self.value:
+        if register_value < value:
             flags["C"].clear()
         else:
             flags["C"].set()
-        flags["N"].test_result(self.result)
-        flags["Z"].test_result(self.result)
+        flags.set_nz(result)
 
 
 class CMP(CP):
@@ -18,8 +18,7 @@ class DE(Instruction):
         self.set_flags(cpu.flags, cpu.registers)
 
     def set_flags(self, flags, registers):
-        flags["N"].test_register_result(registers[self.register])
-        flags["Z"].test_register_result(registers[self.register])
+        flags.set_nz(registers[self.register].get())
 
 
 class DEX(DE):
@@ -53,7 +52,6 @@ class DEC(Instruction):
             raise IncompleteInstruction
 
     def set_flags(self, flags, registers, value):
-        flags["N"].test_result(value)
         # The zero flag is set when the value is zero, not necessarily
         # on a wrap
-        flags["Z"].test_result(value)
+        flags.set_nz(value)
@@ -0,0 +1,63 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, ClassVar
+
+
+@dataclass
+class DecimalTable:
+    """
+    Lookup table of decimal mode ADC or SBC results
+
+    The table has an entry for every accumulator, operand and carry
+    flag combination.  The low byte of an entry is the new accumulator
+    value and the high byte has the N, V, Z and C flags in their
+    status register bit positions, the rest of the bits are zero.
+
+    The table is built the first time it is used by calling operation
+    for every combination.  operation is called with the accumulator,
+    the operand and the carry flag status as an int, and returns the
+    new accumulator value and flags byte.
+    """
+
+    operation: Callable
+    "The function that computes a decimal mode result"
+
+    entries: array = field(default=None, repr=False, compare=False)
+    "The table entries, indexed by carry, accumulator and operand"
+
+    negative: ClassVar[int] = 0x80
+    "The N flag bit in an entry's flags byte"
+
+    overflow: ClassVar[int] = 0x40
+    "The V flag bit in an entry's flags byte"
+
+    zero: ClassVar[int] = 0x02
+    "The Z flag bit in an entry's flags byte"
+
+    carry: ClassVar[int] = 0x01
+    "The C flag bit in an entry's flags byte"
+
+    flags_mask: ClassVar[int] = 0xC3
+    "The flags set by a decimal mode operation"
+
+    def build(self):
+        "Build the table entries"
+        operation = self.operation
+        entries = array("H", bytes(2 * 0x20000))
+        index = 0
+        for carry in (0, 1):
+            for accumulator in range(0x100):
+                for value in range(0x100):
+                    (result, flags) = operation(accumulator, value, carry)
+                    entries[index] = (flags << 8) | result
+                    index += 1
+        self.entries = entries
+
+    def lookup(self, accumulator, value, carry):
+        """
+        Get the entry for an accumulator value, operand and carry flag
+        status
+        """
+        if self.entries is None:
+            self.build()
+        return self.entries[(carry << 16) | (accumulator << 8) | value]
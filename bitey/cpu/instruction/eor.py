@@ -36,5 +36,4 @@ class EOR(Instruction):
         Resets the zero flag if the accumulator is not zero as the result of the EOR.
         Sets the negative (N) flag if bit 7 is one.
         """
-        flags["N"].test_register_result(registers["A"])
-        flags["Z"].test_register_result(registers["A"])
+        flags.set_nz(registers["A"].get())
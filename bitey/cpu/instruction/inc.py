@@ -18,8 +18,7 @@ class IN(Instruction):
         self.set_flags(cpu.flags, cpu.registers)
 
     def set_flags(self, flags, registers):
-        flags["N"].test_register_result(registers[self.register])
-        flags["Z"].test_register_result(registers[self.register])
+        flags.set_nz(registers[self.register].get())
 
 
 class INX(IN):
@@ -51,5 +50,4 @@ class INC(Instruction):
             raise IncompleteInstruction
 
     def set_flags(self, flags, registers, value):
-        flags["N"].test_result(value)
-        flags["Z"].test_result(value)
+        flags.set_nz(value)
@@ -1,8 +1,10 @@
+import copy
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import ClassVar, Dict
 import logging
 
 # from bitey.cpu.instruction.instruction_factory import InstructionFactory
+from bitey.cpu.addressing_mode import ImpliedAddressingMode
 from bitey.cpu.instruction.opcode import Opcode, Opcodes
 from bitey.memory.memory import MemoryOutOfRange
 
@@ -59,6 +61,8 @@ class Instruction:
         execute Gets the addressing mode and loads the value to operate on.
 
         Subclasses should implement instruction_execute for custom instruction code."
+
+        Returns the result of instruction_execute.
         """
         # TODO: There needs to be some refactoring around
         # Instruction and Opcode.
@@ -78,17 +82,38 @@ class Instruction:
         # addressing mode
         # Then the subclass instruction_execute is called if it exists
         if self.opcode is not None:
-            self.logger.debug("addressing mode: {}".format(self.opcode.addressing_mode))
             (address, value) = self.opcode.addressing_mode.get_value(
                 cpu.flags, cpu.registers, memory
             )
 
-            self.logger.debug("address: {}, value: {}".format(address, value))
-
-            self.instruction_execute(cpu, memory, value, address)
+            return self.instruction_execute(cpu, memory, value, address)
         else:
             raise UnimplementedInstruction
 
+    def execute_decoded(self, cpu, memory, operand):
+        """
+        Execute the instruction with operand bytes that were read when
+        the instruction was decoded
+        The PC must already point to the next instruction.
+        """
+        (address, value) = self.opcode.addressing_mode.get_operand_value(
+            cpu.flags, cpu.registers, memory, operand
+        )
+        return self.instruction_execute(cpu, memory, value, address)
+
+    def execute_without_operand(self, cpu, memory, operand):
+        "Call execute for instructions that override it and take no operand"
+        return self.execute(cpu, memory)
+
+    def decoded_handler(self):
+        """
+        Return the method the decoded instruction cache calls to
+        execute this instruction, with the cpu, memory and operand
+        """
+        if type(self).execute is not Instruction.execute:
+            return self.execute_without_operand
+        return self.execute_decoded
+
     def instruction_execute(self, cpu, memory, value, address=None):
         """
         Specific instruction subclasses should implement this
@@ -125,6 +150,23 @@ class Instruction:
             return "{}".format(self.short_str())
 
 
+class UndocumentedOpcode(Instruction):
+    """
+    Placeholder for an undocumented or invalid opcode
+
+    The CPU opcode table is filled with these for every opcode the
+    instruction set doesn't define.  Decoding one is cheap and never
+    fails, executing one raises UndocumentedInstruction.
+    """
+
+    def __init__(self, opcode):
+        super().__init__("INV", Opcode(opcode, ImpliedAddressingMode()))
+
+    def execute(self, cpu, memory):
+        "Raise UndocumentedInstruction with the opcode as the argument"
+        raise UndocumentedInstruction(self.opcode.opcode)
+
+
 @dataclass
 class InstructionClass:
     """
@@ -165,14 +207,15 @@ class InstructionClass:
         )
         # Build the instruction database
         self.instructions = {}
+        if self.instruction:
+            self.instruction.options = self.options
         for opcode in self.opcodes:
             if self.instruction:
                 # If self.instruction is set, then this is a subclassed instruction
-                # We modify the already existing instruction
-                # This is wrong
-                self.instruction.opcode = opcode
-                self.instruction.options = self.options
-                self.instructions[opcode.opcode] = self.instruction
+                # Each opcode gets its own copy bound to that opcode
+                instruction = copy.copy(self.instruction)
+                instruction.opcode = opcode
+                self.instructions[opcode.opcode] = instruction
             else:
                 # If self.instruction is not set, build a generic one
                 self.instructions[opcode.opcode] = Instruction(
@@ -240,6 +283,9 @@ class InstructionSet:
 
     instructions: list[InstructionClass]
 
+    opcode_table_size: ClassVar[int] = 256
+    "The number of entries in an opcode dispatch table"
+
     def __post_init__(self):
         "Create a dictionary so we can access instructions by opcode"
         self.logger = logging.getLogger("bitey.cpu.instruction.instruction")
@@ -247,6 +293,7 @@ class InstructionSet:
         for instruction in self.instructions:
             for opcode in instruction.opcodes:
                 self.opcode_dict[opcode.opcode] = instruction
+        self.opcode_table = self.build_opcode_table()
 
     def __iter__(self):
         return iter(self.instructions)
@@ -262,16 +309,30 @@ class InstructionSet:
         Get an instruction by its opcode
         """
         if opcode in self.opcode_dict:
-            # This isn't good
-            # More fail
-            # TODO: Rebuild it
-            instruction_class = self.opcode_dict[opcode]
-            instruction = instruction_class.instruction
-            if instruction is None:
-                instruction = instruction_class.get_instruction_by_opcode(opcode)
-            else:
-                instruction.opcode = instruction_class.opcodes[opcode]
-
-            return instruction
+            return self.opcode_table[opcode]
         else:
             raise UndocumentedInstruction
+
+    def build_opcode_table(self):
+        """
+        Build a flat opcode dispatch table
+
+        Returns a list with one entry per possible opcode.  Each entry
+        is an Instruction bound to its own Opcode, so decoding is a
+        single list index.  Opcodes that aren't in the instruction set
+        get an UndocumentedOpcode entry.
+
+        Instructions keep no state between executions, so the table
+        built when the instruction set is created is shared by every
+        CPU using the instruction set, see opcode_table.
+        """
+        table = []
+        for opcode in range(InstructionSet.opcode_table_size):
+            if opcode not in self.opcode_dict:
+                table.append(UndocumentedOpcode(opcode))
+                continue
+
+            instruction_class = self.opcode_dict[opcode]
+            table.append(instruction_class.get_instruction_by_opcode(opcode))
+
+        return table
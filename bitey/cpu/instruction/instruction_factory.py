@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import importlib
 import logging
 from typing import ClassVar
 
@@ -7,220 +8,204 @@ from bitey.cpu.instruction.instruction import (
     InstructionClass,
     UnimplementedInstruction,
 )
-from bitey.cpu.instruction.adc import ADC, ADCCMOS, ADCNMOS
-from bitey.cpu.instruction.an import AND
-from bitey.cpu.instruction.asl import ASL
-from bitey.cpu.instruction.bcc import BCC
-from bitey.cpu.instruction.bcs import BCS
-from bitey.cpu.instruction.beq import BEQ
-from bitey.cpu.instruction.bit import BIT
-from bitey.cpu.instruction.bmi import BMI
-from bitey.cpu.instruction.bne import BNE
-from bitey.cpu.instruction.bpl import BPL
-from bitey.cpu.instruction.brk import BRK
-from bitey.cpu.instruction.bvc import BVC
-from bitey.cpu.instruction.bvs import BVS
-from bitey.cpu.instruction.clc import CLC
-from bitey.cpu.instruction.cld import CLD
-from bitey.cpu.instruction.cli import CLI
-from bitey.cpu.instruction.clv import CLV
-from bitey.cpu.instruction.cp import CMP
-from bitey.cpu.instruction.cp import CPX
-from bitey.cpu.instruction.cp import CPY
-from bitey.cpu.instruction.dec import DEC
-from bitey.cpu.instruction.dec import DEX
-from bitey.cpu.instruction.dec import DEY
-from bitey.cpu.instruction.eor import EOR
-from bitey.cpu.instruction.inc import INC
-from bitey.cpu.instruction.inc import INX
-from bitey.cpu.instruction.inc import INY
-from bitey.cpu.instruction.jmp import JMP
-from bitey.cpu.instruction.jsr import JSR
-from bitey.cpu.instruction.ld import LDA
-from bitey.cpu.instruction.ld import LDX
-from bitey.cpu.instruction.ld import LDY
-from bitey.cpu.instruction.lsr import LSR
-from bitey.cpu.instruction.nop import NOP
-from bitey.cpu.instruction.ora import ORA
-from bitey.cpu.instruction.pha import PHA
-from bitey.cpu.instruction.php import PHP
-from bitey.cpu.instruction.pla import PLA
-from bitey.cpu.instruction.plp import PLP
-from bitey.cpu.instruction.rol import ROL
-from bitey.cpu.instruction.ror import ROR
-from bitey.cpu.instruction.ror import RORNoCarryBug
-from bitey.cpu.instruction.rti import RTI
-from bitey.cpu.instruction.rts import RTS
-from bitey.cpu.instruction.sbc import SBC, SBCCMOS, SBCNMOS
-from bitey.cpu.instruction.sec import SEC
-from bitey.cpu.instruction.sed import SED
-from bitey.cpu.instruction.sei import SEI
-from bitey.cpu.instruction.st import STA
-from bitey.cpu.instruction.st import STX
-from bitey.cpu.instruction.st import STY
-from bitey.cpu.instruction.ta import TAX
-from bitey.cpu.instruction.ta import TAY
-from bitey.cpu.instruction.ta import TXA
-from bitey.cpu.instruction.ta import TYA
-from bitey.cpu.instruction.tsx import TSX
-from bitey.cpu.instruction.txs import TXS
+
+
+class InstructionRegistry:
+    """
+    Map of opcodes to instruction classes, imported on demand
+
+    Each class is named by its module in bitey.cpu.instruction and its
+    class name.  A module is only imported the first time an opcode
+    implemented in it is looked up, so importing the factories doesn't
+    import every instruction implementation.
+    """
+
+    package: ClassVar[str] = "bitey.cpu.instruction"
+    "The package the instruction modules are in"
+
+    def __init__(self, names):
+        self.names = names
+        "The module and class name of each opcode's instruction class"
+
+        self.classes = {}
+        "The instruction classes looked up so far, by opcode"
+
+    def __contains__(self, opcode):
+        return opcode in self.names
+
+    def __getitem__(self, opcode):
+        instruction_class = self.classes.get(opcode)
+        if instruction_class is None:
+            (module_name, class_name) = self.names[opcode]
+            module = importlib.import_module(
+                "{}.{}".format(InstructionRegistry.package, module_name)
+            )
+            instruction_class = getattr(module, class_name)
+            self.classes[opcode] = instruction_class
+        return instruction_class
+
+
+# The instruction class implementing each opcode
+instruction_classes = InstructionRegistry(
+    {
+        0: ("brk", "BRK"),
+        1: ("ora", "ORA"),
+        5: ("ora", "ORA"),
+        6: ("asl", "ASL"),
+        8: ("php", "PHP"),
+        9: ("ora", "ORA"),
+        10: ("asl", "ASL"),
+        13: ("ora", "ORA"),
+        14: ("asl", "ASL"),
+        16: ("bpl", "BPL"),
+        17: ("ora", "ORA"),
+        21: ("ora", "ORA"),
+        22: ("asl", "ASL"),
+        24: ("clc", "CLC"),
+        25: ("ora", "ORA"),
+        29: ("ora", "ORA"),
+        30: ("asl", "ASL"),
+        32: ("jsr", "JSR"),
+        33: ("an", "AND"),
+        36: ("bit", "BIT"),
+        37: ("an", "AND"),
+        38: ("rol", "ROL"),
+        40: ("plp", "PLP"),
+        41: ("an", "AND"),
+        42: ("rol", "ROL"),
+        44: ("bit", "BIT"),
+        45: ("an", "AND"),
+        46: ("rol", "ROL"),
+        48: ("bmi", "BMI"),
+        49: ("an", "AND"),
+        53: ("an", "AND"),
+        54: ("rol", "ROL"),
+        56: ("sec", "SEC"),
+        57: ("an", "AND"),
+        61: ("an", "AND"),
+        62: ("rol", "ROL"),
+        64: ("rti", "RTI"),
+        65: ("eor", "EOR"),
+        69: ("eor", "EOR"),
+        70: ("lsr", "LSR"),
+        72: ("pha", "PHA"),
+        73: ("eor", "EOR"),
+        74: ("lsr", "LSR"),
+        76: ("jmp", "JMP"),
+        77: ("eor", "EOR"),
+        78: ("lsr", "LSR"),
+        80: ("bvc", "BVC"),
+        81: ("eor", "EOR"),
+        85: ("eor", "EOR"),
+        86: ("lsr", "LSR"),
+        88: ("cli", "CLI"),
+        89: ("eor", "EOR"),
+        93: ("eor", "EOR"),
+        94: ("lsr", "LSR"),
+        96: ("rts", "RTS"),
+        97: ("adc", "ADC"),
+        101: ("adc", "ADC"),
+        102: ("ror", "ROR"),
+        104: ("pla", "PLA"),
+        105: ("adc", "ADC"),
+        106: ("ror", "ROR"),
+        108: ("jmp", "JMP"),
+        109: ("adc", "ADC"),
+        110: ("ror", "ROR"),
+        112: ("bvs", "BVS"),
+        113: ("adc", "ADC"),
+        117: ("adc", "ADC"),
+        118: ("ror", "ROR"),
+        120: ("sei", "SEI"),
+        121: ("adc", "ADC"),
+        125: ("adc", "ADC"),
+        126: ("ror", "ROR"),
+        129: ("st", "STA"),
+        132: ("st", "STY"),
+        133: ("st", "STA"),
+        134: ("st", "STX"),
+        136: ("dec", "DEY"),
+        138: ("ta", "TXA"),
+        140: ("st", "STY"),
+        141: ("st", "STA"),
+        142: ("st", "STX"),
+        144: ("bcc", "BCC"),
+        145: ("st", "STA"),
+        148: ("st", "STY"),
+        149: ("st", "STA"),
+        150: ("st", "STX"),
+        152: ("ta", "TYA"),
+        153: ("st", "STA"),
+        154: ("txs", "TXS"),
+        157: ("st", "STA"),
+        160: ("ld", "LDY"),
+        161: ("ld", "LDA"),
+        162: ("ld", "LDX"),
+        164: ("ld", "LDY"),
+        165: ("ld", "LDA"),
+        166: ("ld", "LDX"),
+        168: ("ta", "TAY"),
+        169: ("ld", "LDA"),
+        170: ("ta", "TAX"),
+        172: ("ld", "LDY"),
+        173: ("ld", "LDA"),
+        174: ("ld", "LDX"),
+        176: ("bcs", "BCS"),
+        177: ("ld", "LDA"),
+        180: ("ld", "LDY"),
+        181: ("ld", "LDA"),
+        182: ("ld", "LDX"),
+        184: ("clv", "CLV"),
+        185: ("ld", "LDA"),
+        186: ("tsx", "TSX"),
+        188: ("ld", "LDY"),
+        189: ("ld", "LDA"),
+        190: ("ld", "LDX"),
+        192: ("cp", "CPY"),
+        193: ("cp", "CMP"),
+        196: ("cp", "CPY"),
+        197: ("cp", "CMP"),
+        198: ("dec", "DEC"),
+        200: ("inc", "INY"),
+        201: ("cp", "CMP"),
+        202: ("dec", "DEX"),
+        204: ("cp", "CPY"),
+        205: ("cp", "CMP"),
+        206: ("dec", "DEC"),
+        208: ("bne", "BNE"),
+        209: ("cp", "CMP"),
+        213: ("cp", "CMP"),
+        214: ("dec", "DEC"),
+        216: ("cld", "CLD"),
+        217: ("cp", "CMP"),
+        221: ("cp", "CMP"),
+        222: ("dec", "DEC"),
+        224: ("cp", "CPX"),
+        225: ("sbc", "SBC"),
+        228: ("cp", "CPX"),
+        229: ("sbc", "SBC"),
+        230: ("inc", "INC"),
+        232: ("inc", "INX"),
+        233: ("sbc", "SBC"),
+        234: ("nop", "NOP"),
+        236: ("cp", "CPX"),
+        237: ("sbc", "SBC"),
+        238: ("inc", "INC"),
+        240: ("beq", "BEQ"),
+        241: ("sbc", "SBC"),
+        245: ("sbc", "SBC"),
+        246: ("inc", "INC"),
+        248: ("sed", "SED"),
+        249: ("sbc", "SBC"),
+        253: ("sbc", "SBC"),
+        254: ("inc", "INC"),
+    }
+)
 
 
 @dataclass
 class InstructionFactory:
-    instruction_map: ClassVar[dict[int, Instruction]] = {
-        0: BRK,
-        1: ORA,
-        5: ORA,
-        6: ASL,
-        8: PHP,
-        9: ORA,
-        10: ASL,
-        13: ORA,
-        14: ASL,
-        16: BPL,
-        17: ORA,
-        21: ORA,
-        22: ASL,
-        24: CLC,
-        25: ORA,
-        29: ORA,
-        30: ASL,
-        32: JSR,
-        33: AND,
-        36: BIT,
-        37: AND,
-        38: ROL,
-        40: PLP,
-        41: AND,
-        42: ROL,
-        44: BIT,
-        45: AND,
-        46: ROL,
-        48: BMI,
-        49: AND,
-        53: AND,
-        54: ROL,
-        56: SEC,
-        57: AND,
-        61: AND,
-        62: ROL,
-        64: RTI,
-        65: EOR,
-        69: EOR,
-        70: LSR,
-        72: PHA,
-        73: EOR,
-        74: LSR,
-        76: JMP,
-        77: EOR,
-        78: LSR,
-        80: BVC,
-        81: EOR,
-        85: EOR,
-        86: LSR,
-        88: CLI,
-        89: EOR,
-        93: EOR,
-        94: LSR,
-        96: RTS,
-        97: ADC,
-        101: ADC,
-        102: ROR,
-        104: PLA,
-        105: ADC,
-        106: ROR,
-        108: JMP,
-        109: ADC,
-        110: ROR,
-        112: BVS,
-        113: ADC,
-        117: ADC,
-        118: ROR,
-        120: SEI,
-        121: ADC,
-        125: ADC,
-        126: ROR,
-        129: STA,
-        132: STY,
-        133: STA,
-        134: STX,
-        136: DEY,
-        138: TXA,
-        140: STY,
-        141: STA,
-        142: STX,
-        144: BCC,
-        145: STA,
-        148: STY,
-        149: STA,
-        150: STX,
-        152: TYA,
-        153: STA,
-        154: TXS,
-        157: STA,
-        160: LDY,
-        161: LDA,
-        162: LDX,
-        164: LDY,
-        165: LDA,
-        166: LDX,
-        168: TAY,
-        169: LDA,
-        170: TAX,
-        172: LDY,
-        173: LDA,
-        174: LDX,
-        176: BCS,
-        177: LDA,
-        180: LDY,
-        181: LDA,
-        182: LDX,
-        184: CLV,
-        185: LDA,
-        186: TSX,
-        188: LDY,
-        189: LDA,
-        190: LDX,
-        192: CPY,
-        193: CMP,
-        196: CPY,
-        197: CMP,
-        198: DEC,
-        200: INY,
-        201: CMP,
-        202: DEX,
-        204: CPY,
-        205: CMP,
-        206: DEC,
-        208: BNE,
-        209: CMP,
-        213: CMP,
-        214: DEC,
-        216: CLD,
-        217: CMP,
-        221: CMP,
-        222: DEC,
-        224: CPX,
-        225: SBC,
-        228: CPX,
-        229: SBC,
-        230: INC,
-        232: INX,
-        233: SBC,
-        234: NOP,
-        236: CPX,
-        237: SBC,
-        238: INC,
-        240: BEQ,
-        241: SBC,
-        245: SBC,
-        246: INC,
-        248: SED,
-        249: SBC,
-        253: SBC,
-        254: INC,
-    }
+    instruction_map: ClassVar[InstructionRegistry] = instruction_classes
 
     def __post_init__(self):
         "Initialize the InstructionFactory"
@@ -258,205 +243,58 @@ class InstructionFactory:
 
 @dataclass
 class InstructionClassFactory:
-    instruction_map: ClassVar[dict[int, (InstructionClass, Instruction)]] = {
-        0: BRK,
-        1: ORA,
-        5: ORA,
-        6: ASL,
-        8: PHP,
-        9: ORA,
-        10: ASL,
-        13: ORA,
-        14: ASL,
-        16: BPL,
-        17: ORA,
-        21: ORA,
-        22: ASL,
-        24: CLC,
-        25: ORA,
-        29: ORA,
-        30: ASL,
-        32: JSR,
-        33: AND,
-        36: BIT,
-        37: AND,
-        38: ROL,
-        40: PLP,
-        41: AND,
-        42: ROL,
-        44: BIT,
-        45: AND,
-        46: ROL,
-        48: BMI,
-        49: AND,
-        53: AND,
-        54: ROL,
-        56: SEC,
-        57: AND,
-        61: AND,
-        62: ROL,
-        64: RTI,
-        65: EOR,
-        69: EOR,
-        70: LSR,
-        72: PHA,
-        73: EOR,
-        74: LSR,
-        76: JMP,
-        77: EOR,
-        78: LSR,
-        80: BVC,
-        81: EOR,
-        85: EOR,
-        86: LSR,
-        88: CLI,
-        89: EOR,
-        93: EOR,
-        94: LSR,
-        96: RTS,
-        97: ADC,
-        101: ADC,
-        102: ROR,
-        104: PLA,
-        105: ADC,
-        106: ROR,
-        108: JMP,
-        109: ADC,
-        110: ROR,
-        112: BVS,
-        113: ADC,
-        117: ADC,
-        118: ROR,
-        120: SEI,
-        121: ADC,
-        125: ADC,
-        126: ROR,
-        129: STA,
-        132: STY,
-        133: STA,
-        134: STX,
-        136: DEY,
-        138: TXA,
-        140: STY,
-        141: STA,
-        142: STX,
-        144: BCC,
-        145: STA,
-        148: STY,
-        149: STA,
-        150: STX,
-        152: TYA,
-        153: STA,
-        154: TXS,
-        157: STA,
-        160: LDY,
-        161: LDA,
-        162: LDX,
-        164: LDY,
-        165: LDA,
-        166: LDX,
-        168: TAY,
-        169: LDA,
-        170: TAX,
-        172: LDY,
-        173: LDA,
-        174: LDX,
-        176: BCS,
-        177: LDA,
-        180: LDY,
-        181: LDA,
-        182: LDX,
-        184: CLV,
-        185: LDA,
-        186: TSX,
-        188: LDY,
-        189: LDA,
-        190: LDX,
-        192: CPY,
-        193: CMP,
-        196: CPY,
-        197: CMP,
-        198: DEC,
-        200: INY,
-        201: CMP,
-        202: DEX,
-        204: CPY,
-        205: CMP,
-        206: DEC,
-        208: BNE,
-        209: CMP,
-        213: CMP,
-        214: DEC,
-        216: CLD,
-        217: CMP,
-        221: CMP,
-        222: DEC,
-        224: CPX,
-        225: SBC,
-        228: CPX,
-        229: SBC,
-        230: INC,
-        232: INX,
-        233: SBC,
-        234: NOP,
-        236: CPX,
-        237: SBC,
-        238: INC,
-        240: BEQ,
-        241: SBC,
-        245: SBC,
-        246: INC,
-        248: SED,
-        249: SBC,
-        253: SBC,
-        254: INC,
-    }
+    instruction_map: ClassVar[InstructionRegistry] = instruction_classes
+
     # A custom instruction class map to hold buggy or quirky instructions
-    instruction_map_options: ClassVar[
-        dict[str, dict[int, (InstructionClass, Instruction)]]
-    ] = {
-        "no_carry_bug": {
-            102: RORNoCarryBug,
-            106: RORNoCarryBug,
-            110: RORNoCarryBug,
-            126: RORNoCarryBug,
-        },
-        "large_lower_nibble_behavior_1": {
-            97: ADCNMOS,
-            101: ADCNMOS,
-            105: ADCNMOS,
-            109: ADCNMOS,
-            113: ADCNMOS,
-            117: ADCNMOS,
-            121: ADCNMOS,
-            125: ADCNMOS,
-            225: SBCNMOS,
-            229: SBCNMOS,
-            233: SBCNMOS,
-            237: SBCNMOS,
-            241: SBCNMOS,
-            245: SBCNMOS,
-            249: SBCNMOS,
-            253: SBCNMOS,
-        },
-        "large_lower_nibble_behavior_2": {
-            97: ADCCMOS,
-            101: ADCCMOS,
-            105: ADCCMOS,
-            109: ADCCMOS,
-            113: ADCCMOS,
-            117: ADCCMOS,
-            121: ADCCMOS,
-            125: ADCCMOS,
-            225: SBCCMOS,
-            229: SBCCMOS,
-            233: SBCCMOS,
-            237: SBCCMOS,
-            241: SBCCMOS,
-            245: SBCCMOS,
-            249: SBCCMOS,
-            253: SBCCMOS,
-        },
+    instruction_map_options: ClassVar[dict[str, InstructionRegistry]] = {
+        "no_carry_bug": InstructionRegistry(
+            {
+                102: ("ror", "RORNoCarryBug"),
+                106: ("ror", "RORNoCarryBug"),
+                110: ("ror", "RORNoCarryBug"),
+                126: ("ror", "RORNoCarryBug"),
+            }
+        ),
+        "large_lower_nibble_behavior_1": InstructionRegistry(
+            {
+                97: ("adc", "ADCNMOS"),
+                101: ("adc", "ADCNMOS"),
+                105: ("adc", "ADCNMOS"),
+                109: ("adc", "ADCNMOS"),
+                113: ("adc", "ADCNMOS"),
+                117: ("adc", "ADCNMOS"),
+                121: ("adc", "ADCNMOS"),
+                125: ("adc", "ADCNMOS"),
+                225: ("sbc", "SBCNMOS"),
+                229: ("sbc", "SBCNMOS"),
+                233: ("sbc", "SBCNMOS"),
+                237: ("sbc", "SBCNMOS"),
+                241: ("sbc", "SBCNMOS"),
+                245: ("sbc", "SBCNMOS"),
+                249: ("sbc", "SBCNMOS"),
+                253: ("sbc", "SBCNMOS"),
+            }
+        ),
+        "large_lower_nibble_behavior_2": InstructionRegistry(
+            {
+                97: ("adc", "ADCCMOS"),
+                101: ("adc", "ADCCMOS"),
+                105: ("adc", "ADCCMOS"),
+                109: ("adc", "ADCCMOS"),
+                113: ("adc", "ADCCMOS"),
+                117: ("adc", "ADCCMOS"),
+                121: ("adc", "ADCCMOS"),
+                125: ("adc", "ADCCMOS"),
+                225: ("sbc", "SBCCMOS"),
+                229: ("sbc", "SBCCMOS"),
+                233: ("sbc", "SBCCMOS"),
+                237: ("sbc", "SBCCMOS"),
+                241: ("sbc", "SBCCMOS"),
+                245: ("sbc", "SBCCMOS"),
+                249: ("sbc", "SBCCMOS"),
+                253: ("sbc", "SBCCMOS"),
+            }
+        ),
     }
 
     logger: ClassVar = logging.getLogger("bitey.cpu.instruction.instruction_factory")
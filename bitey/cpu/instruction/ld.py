@@ -24,8 +24,7 @@ class LD(Instruction):
         Resets the zero flag if the accumulator is not zero as the result of the LD.
         Sets the negative (N) flag if bit 7 is one.
         """
-        flags["N"].test_register_result(registers[self.register])
-        flags["Z"].test_register_result(registers[self.register])
+        flags.set_nz(registers[self.register].get())
 
 
 class LDA(LD):
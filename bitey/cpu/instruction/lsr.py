@@ -37,19 +37,19 @@ class LSR(Instruction):
             else:
                 cpu.flags["C"].clear()
 
-            self.result = (value >> 1) & 0xFF
+            result = (value >> 1) & 0xFF
 
             self.opcode.addressing_mode.write(
-                cpu.flags, cpu.registers, memory, address, self.result
+                cpu.flags, cpu.registers, memory, address, result
             )
 
-            self.set_flags(cpu.flags, cpu.registers)
+            self.set_flags(cpu.flags, cpu.registers, result)
+            return result
         else:
             raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):
+    def set_flags(self, flags, registers, result):
         """
-        Sets flags based on the result of the subtract operation
+        Sets flags based on the result of the shift operation
         """
-        flags["N"].test_result(self.result)
-        flags["Z"].test_result(self.result)
+        flags.set_nz(result)
@@ -20,6 +20,28 @@ class Opcode:
     addressing_mode: AddressingMode
     "The instruction addressing mode"
 
+    cycles: int = 0
+    "The number of clock cycles the instruction takes"
+
+    page_cross_cycles: int = 0
+    """
+    The number of extra cycles the instruction takes when indexing
+    crosses a page boundary
+    """
+
+    def get_cycles(self, registers, memory, operand):
+        """
+        Return the number of cycles the instruction takes with an
+        operand, including any page crossing penalty
+
+        Taken branches add their own penalty, see CPU.branch
+        """
+        if self.page_cross_cycles and self.addressing_mode.crosses_page(
+            registers, memory, operand
+        ):
+            return self.cycles + self.page_cross_cycles
+        return self.cycles
+
     def execute(self, flags, registers, memory):
         "Execute the opcode"
         self.set_flags(flags, registers)
@@ -80,7 +102,12 @@ class OpcodeJSONDecoder(JSONDecoder):
             addressing_mode = AddressingModeFactory.build(
                 parsed_json["addressing_mode"]
             )
-            return Opcode(parsed_json["opcode"], addressing_mode)
+            return Opcode(
+                parsed_json["opcode"],
+                addressing_mode,
+                parsed_json.get("cycles", 0),
+                parsed_json.get("page_cross_cycles", 0),
+            )
         else:
             # Return None if the opcode JSON object is missing fields or invalid
             return None
@@ -29,5 +29,4 @@ class ORA(Instruction):
         Resets the zero flag if the accumulator is not zero as the result of the ORA.
         Sets the negative (N) flag if bit 7 is one.
         """
-        flags["N"].test_register_result(registers["A"])
-        flags["Z"].test_register_result(registers["A"])
+        flags.set_nz(registers["A"].get())
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from bitey.cpu.instruction.instruction import Instruction
+from bitey.cpu.instruction.incomplete_instruction import IncompleteInstruction
 
 
 @dataclass
@@ -31,7 +32,7 @@ class ROR(Instruction):
         Execute the instruction, bit-wise eoring the accumulator and memory
         """
         if value is not None:
-            self.result = value
+            result = value
             carry = cpu.flags["C"].status
 
             # Set the carry flag based on the highest bit
@@ -41,27 +42,27 @@ class ROR(Instruction):
                 cpu.flags["C"].clear()
 
             # rotate right one bit
-            self.result >>= 1
+            result >>= 1
 
             # set the highest bit if the old status of the carry flag was set
-            self.result |= 0x80 if carry else 0x00
+            result |= 0x80 if carry else 0x00
 
-            self.set_flags(cpu.flags, cpu.registers)
+            self.set_flags(cpu.flags, cpu.registers, result)
 
-        # TODO: Some of the instructions have this inside the "value is not None" check, some
-        # don't.  Fix it and make it consistent.
-        self.opcode.addressing_mode.write(
-            cpu.flags, cpu.registers, memory, address, self.result
-        )
+            self.opcode.addressing_mode.write(
+                cpu.flags, cpu.registers, memory, address, result
+            )
+            return result
+        else:
+            raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):
+    def set_flags(self, flags, registers, result):
         """
-        Set the zero flag if the accumulator is zero as the result of the EOR.
-        Resets the zero flag if the accumulator is not zero as the result of the EOR.
+        Set the zero flag if the result is zero.
+        Resets the zero flag if the result is not zero.
         Sets the negative (N) flag if bit 7 is one.
         """
-        flags["N"].test_result(self.result)
-        flags["Z"].test_result(self.result)
+        flags.set_nz(result)
 
 
 class RORNoCarryBug(Instruction):
@@ -86,26 +87,28 @@ class RORNoCarryBug(Instruction):
         Execute the instruction, bit-wise eoring the accumulator and memory
         """
         if value is not None:
-            self.result = value
+            result = value
             carry = cpu.flags["C"].status
 
             # rotate right one bit
-            self.result >>= 1
+            result >>= 1
 
             # set the highest bit if the old status of the carry flag was set
-            self.result |= 0x80 if carry else 0x00
+            result |= 0x80 if carry else 0x00
 
-            self.set_flags(cpu.flags, cpu.registers)
+            self.set_flags(cpu.flags, cpu.registers, result)
 
-        self.opcode.addressing_mode.write(
-            cpu.flags, cpu.registers, memory, address, self.result
-        )
+            self.opcode.addressing_mode.write(
+                cpu.flags, cpu.registers, memory, address, result
+            )
+            return result
+        else:
+            raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):
+    def set_flags(self, flags, registers, result):
         """
-        Set the zero flag if the accumulator is zero as the result of the EOR.
-        Resets the zero flag if the accumulator is not zero as the result of the EOR.
+        Set the zero flag if the result is zero.
+        Resets the zero flag if the result is not zero.
         Sets the negative (N) flag if bit 7 is one.
         """
-        flags["N"].test_result(self.result)
-        flags["Z"].test_result(self.result)
+        flags.set_nz(result)
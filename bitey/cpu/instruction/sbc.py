@@ -1,9 +1,120 @@
 from dataclasses import dataclass
+from typing import ClassVar
 from bitey.cpu.instruction.instruction import Instruction
 from bitey.cpu.instruction.incomplete_instruction import IncompleteInstruction
+from bitey.cpu.instruction.decimal_table import DecimalTable
 from bitey.cpu.arch import EightBitArch
 
 
+def nmos_decimal_subtract(accumulator, value, carry):
+    "Decimal mode SBC on NMOS chips, returns the accumulator and flags byte"
+    borrow = 0 if carry else 1
+    binary_result = accumulator - value - borrow
+
+    # Subtract the nibbles one at a time
+    # First subtract the low nibbles
+    result = (
+        EightBitArch.low_nibble(accumulator) - EightBitArch.low_nibble(value) - borrow
+    )
+
+    if (result & 0x10) != 0:
+        result = ((result - 0x06) & 0x0F) - 0x10
+    result += (accumulator & 0xF0) - (value & 0xF0)
+
+    if result & 0x100:
+        result -= 0x60
+
+    # The behavior of the V flag is "undocumented", but the behavior here
+    # should follow the behavior of NMOS 6502 chips
+    # The values below follows the values in the
+    # transistor-level simulation found in visual6502.org
+    # thse flags (C, Z, V, N) follow the same rules as for binary mode
+    # It uses the binary addition result in calculating them too
+    # "Verified" with the visual6502.org simulator
+    #
+    # Also documented in https://http://www.6502.org/tutorials/decimal_mode.html
+    #
+    # Although this document has an error:
+    # the V flag is clear when the result is in the range -128
+    # to 127 inclusive and set when the result is outside that
+    # range.
+    flags = 0
+    # Set the carry flag
+    if binary_result >= 0x00:
+        flags |= DecimalTable.carry
+
+    # Set the zero flag if the binary result is zero
+    if binary_result == 0x00:
+        flags |= DecimalTable.zero
+
+    # Set the negative flag
+    if (binary_result & 0x80) != 0:
+        flags |= DecimalTable.negative
+
+    # The overflow is calculated with bit seven in the accumulator,
+    # memory and binary result, the same as in binary mode
+    # fmt: off
+    if (
+            (((accumulator & 0x80) == 0x80)
+             and ((value & 0x80) != 0x80)
+             and ((binary_result & 0x80) != 0x80))
+            or
+            (((accumulator & 0x80) != 0x80)
+             and ((value & 0x80) == 0x80)
+             and ((binary_result & 0x80) == 0x80))
+    ):
+        flags |= DecimalTable.overflow
+    # fmt: on
+
+    return (result & 0xFF, flags)
+
+
+def cmos_decimal_subtract(accumulator, value, carry):
+    "Decimal mode SBC on CMOS chips, returns the accumulator and flags byte"
+    # The carry and overflow bits are set based on the full subtraction
+    full_result = accumulator + ((0xFF - value) & 0xFF) + carry
+
+    # Subtract the nibbles one at a time
+    # First subtract the low nibbles
+    al = (
+        EightBitArch.low_nibble(accumulator)
+        - EightBitArch.low_nibble(value)
+        + carry
+        - 1
+    )
+
+    result = accumulator - value + carry - 1
+    if result < 0:
+        result = result - 0x60
+
+    if al < 0:
+        result = result - 0x06
+
+    # TODO: Verify C flag and others in emulator and manual
+    # The C and V flags are based on the result of the "full" subtraction
+    # This may not be the case for real hardware, but in some emulators such
+    # such as apple2emu, this is the case.
+    flags = 0
+    if (accumulator & 0x80) != (value & 0x80) and (accumulator & 0x80) != (
+        full_result & 0x80
+    ):
+        flags |= DecimalTable.overflow
+
+    # From the MCS6500 Family Programming Manual:
+    # The carry flag is set if the result is greater than or equal to zero
+    # Otherwise it is reset
+    if result >= 0:
+        flags |= DecimalTable.carry
+
+    if result & 0x80:
+        flags |= DecimalTable.negative
+
+    if (result & 0xFF) == 0x00:
+        flags |= DecimalTable.zero
+
+    return (result & 0xFF, flags)
+
+
 @dataclass
 class SBCNMOS(Instruction):
     """
@@ -51,6 +162,9 @@ class SBCNMOS(Instruction):
 
     """
 
+    decimal_table: ClassVar[DecimalTable] = DecimalTable(nmos_decimal_subtract)
+    "Decimal mode results, built the first time decimal mode is used"
+
     def instruction_execute(self, cpu, memory, value, address):
         """
         SBC: Subtract Memory from Accumulator with Borrow
@@ -61,180 +175,84 @@ class SBCNMOS(Instruction):
         if cpu.flags["D"].status is False:
             # Normal binary addition
             if value is not None:
-                self.value = value
-                self.carry_value = 0 if cpu.flags["C"].status else 1
-                self.accumulator_value = cpu.registers["A"].get()
+                borrow = 0 if cpu.flags["C"].status else 1
+                accumulator = cpu.registers["A"].get()
                 # One's complement for following two's complement subtraction
-                # self.complemented_value = 0xFF - self.value
+                # complemented_value = 0xFF - value
 
                 # # Two's complement value
-                # self.twos_complement = self.complemented_value + self.carry_value
+                # twos_complement = complemented_value + borrow
 
                 # # Subtraction using addition and two's complement representation
-                # self.result = self.accumulator_value + self.twos_complement
-
-                self.result = self.accumulator_value - self.value - self.carry_value
+                # result = accumulator + twos_complement
 
-                self.binary_result = self.result
+                result = accumulator - value - borrow
 
-                cpu.registers["A"].set(self.result & 0xFF)
+                cpu.registers["A"].set(result & 0xFF)
 
-                self.set_flags(cpu.flags, cpu.registers)
+                self.set_flags(cpu.flags, cpu.registers, accumulator, value, result)
+                return result
             else:
-                self.value = None
-                self.result = None
                 raise IncompleteInstruction
         else:
-            # Decimal mode addition
-            # TODO: Simplify
+            # Decimal mode subtraction, see nmos_decimal_subtract
             if value is not None:
-                self.value = value
-                self.carry_value = 0 if cpu.flags["C"].status else 1
-                self.accumulator_value = cpu.registers["A"].get()
-                self.result = self.accumulator_value - self.value - self.carry_value
-
-                self.binary_result = self.result
-
-                # The carry and overflow bits are set based on the full subtraction
-                self.full_result = (
-                    self.accumulator_value
-                    + ((0xFF - self.value) & 0xFF)
-                    + self.carry_value
+                entry = self.decimal_table.lookup(
+                    cpu.registers["A"].get(), value, cpu.flags["C"].status
                 )
-
-                # Subtract the nibbles one at a time
-                # First subtract the low nibbles
-                self.result = (
-                    EightBitArch.low_nibble(self.accumulator_value)
-                    - EightBitArch.low_nibble(self.value)
-                    - self.carry_value
-                )
-
-                if (self.result & 0x10) != 0:
-                    self.result = ((self.result - 0x06) & 0x0F) - 0x10
-                self.result += (self.accumulator_value & 0xF0) - (self.value & 0xF0)
-
-                if self.result & 0x100:
-                    self.result -= 0x60
-
-                cpu.registers["A"].set(self.result & 0xFF)
-
-                self.set_flags(cpu.flags, cpu.registers)
+                cpu.registers["A"].set(entry & 0xFF)
+                cpu.flags.set_bits(DecimalTable.flags_mask, entry >> 8)
+                return entry & 0xFF
             else:
-                self.value = None
-                self.result = None
                 raise IncompleteInstruction
 
-    def set_flags(self, flags, registers):  # noqa: C901
-        if flags["D"].status is False:
-            # binary mode subtraction
-            if self.result is not None:
-                # Set the carry flag
-                if self.result < 0x00:
-                    flags["C"].clear()
-                else:
-                    flags["C"].set()
-
-                # Set the zero flag if the accumlator is zero
-                if registers["A"].get() == 0x00:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
-
-                # Set the negative flag
-                if (registers["A"].get() & 0x80) != 0:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-
-                # Can be calculated from accumulator and memory, forms a
-                # "triangular" distribution, e.g. with CLC set
-                # 1 0xFE, 1 0x00, 2 0x01, 2 0xFD, ... 127 0x80
-                # 1 0xFE, 1 0x00, 2 0x01, 2 0xFD, ... 127 0x80
-                # To find number available, something like: 0x80 - abs(0x80 - NUM)
-                # Then the numbers from 0x7F (or 0x80) down to 0x7F minus the number available
-                # verify something like this, add tests around carry and edge cases
-                # 0x00 endpoint is 0x80, 0xFE endpoint is 0x7F,
-                # simple addition or "shift" should fix it
-                # if abs(0x80 - self.value) < (0x80 - abs(0x80 - self.accumulator_value))
-                #
-                # Another way of calculating this is with bit seven in the
-                # accumulator, memory and binary result.
-                # fmt: off
-                if (
-                        (((self.accumulator_value & 0x80) == 0x80)
-                         and ((self.value & 0x80) != 0x80)
-                         and ((self.binary_result & 0x80) != 0x80))
-                        or
-                        (((self.accumulator_value & 0x80) != 0x80)
-                         and ((self.value & 0x80) == 0x80)
-                         and ((self.binary_result & 0x80) == 0x80))
-                ):
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
-                # fmt: on
+    def set_flags(self, flags, registers, accumulator, value, result):
+        "Set the flags after a binary mode subtraction"
+        # Set the carry flag
+        if result < 0x00:
+            flags["C"].clear()
         else:
-            # decimal mode subtraction flags
-            # The behavior of the V flag is "undocumented", but the behavior here
-            # should follow the behavior of NMOS 6502 chips
-            # The values below follows the values in the
-            # transistor-level simulation found in visual6502.org
-            # thse flags (C, Z, V, N) follow the same rules as for binary mode
-            # It uses the binary addition result in calculating them too
-            # "Verified" with the visual6502.org simulator
-            #
-            # Also documented in https://http://www.6502.org/tutorials/decimal_mode.html
-            #
-            # Although this document has an error:
-            # the V flag is clear when the result is in the range -128
-            # to 127 inclusive and set when the result is outside that
-            # range.
-            if self.result is not None:
-                # Set the carry flag
-                if self.binary_result < 0x00:
-                    flags["C"].clear()
-                else:
-                    flags["C"].set()
-
-                # Set the zero flag if the accumlator is zero
-                if self.binary_result == 0x00:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
-
-                # Set the negative flag
-                if (self.binary_result & 0x80) != 0:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-
-                # Can be calculated from accumulator and memory, forms a
-                # "triangular" distribution , e.g. with CLC set
-                # 1 0xFE, 1 0x00, 2 0x01, 2 0xFD, ... 127 0x80
-                # To find number available, something like: 0x80 - abs(0x80 - NUM)
-                # Then the numbers from 0x7F (or 0x80) down to 0x7F minus the number available
-                # verify something like this, add tests around carry and edge cases
-                # 0x00 endpoint is 0x80, 0xFE endpoint is 0x7F,
-                # simple addition or "shift" should fix it
-                # if abs(0x80 - self.value) < (0x80 - abs(0x80 - self.accumulator_value))
-                #
-                # Another way of calculating this is with bit seven in the
-                # accumulator, memory and binary result.
-                # fmt: off
-                if (
-                        (((self.accumulator_value & 0x80) == 0x80)
-                         and ((self.value & 0x80) != 0x80)
-                         and ((self.binary_result & 0x80) != 0x80))
-                        or
-                        (((self.accumulator_value & 0x80) != 0x80)
-                         and ((self.value & 0x80) == 0x80)
-                         and ((self.binary_result & 0x80) == 0x80))
-                ):
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
-                # fmt: on
+            flags["C"].set()
+
+        # Set the zero flag if the accumlator is zero
+        if registers["A"].get() == 0x00:
+            flags["Z"].set()
+        else:
+            flags["Z"].clear()
+
+        # Set the negative flag
+        if (registers["A"].get() & 0x80) != 0:
+            flags["N"].set()
+        else:
+            flags["N"].clear()
+
+        # Can be calculated from accumulator and memory, forms a
+        # "triangular" distribution, e.g. with CLC set
+        # 1 0xFE, 1 0x00, 2 0x01, 2 0xFD, ... 127 0x80
+        # 1 0xFE, 1 0x00, 2 0x01, 2 0xFD, ... 127 0x80
+        # To find number available, something like: 0x80 - abs(0x80 - NUM)
+        # Then the numbers from 0x7F (or 0x80) down to 0x7F minus the number available
+        # verify something like this, add tests around carry and edge cases
+        # 0x00 endpoint is 0x80, 0xFE endpoint is 0x7F,
+        # simple addition or "shift" should fix it
+        # if abs(0x80 - value) < (0x80 - abs(0x80 - accumulator))
+        #
+        # Another way of calculating this is with bit seven in the
+        # accumulator, memory and binary result.
+        # fmt: off
+        if (
+                (((accumulator & 0x80) == 0x80)
+                 and ((value & 0x80) != 0x80)
+                 and ((result & 0x80) != 0x80))
+                or
+                (((accumulator & 0x80) != 0x80)
+                 and ((value & 0x80) == 0x80)
+                 and ((result & 0x80) == 0x80))
+        ):
+            flags["V"].set()
+        else:
+            flags["V"].clear()
+        # fmt: on
 
 
 @dataclass
@@ -277,6 +295,9 @@ class SBCCMOS(Instruction):
 
     """
 
+    decimal_table: ClassVar[DecimalTable] = DecimalTable(cmos_decimal_subtract)
+    "Decimal mode results, built the first time decimal mode is used"
+
     def instruction_execute(self, cpu, memory, value, address):
         """
         SBC: Subtract Memory from Accumulator with Borrow
@@ -287,130 +308,59 @@ class SBCCMOS(Instruction):
         if cpu.flags["D"].status is False:
             # Normal binary addition
             if value is not None:
-                self.value = value
-                self.carry_value = 1 if cpu.flags["C"].status else 0
-                self.accumulator_value = cpu.registers["A"].get()
+                carry = 1 if cpu.flags["C"].status else 0
+                accumulator = cpu.registers["A"].get()
                 # One's complement for following two's complement subtraction
-                self.complemented_value = 0xFF - self.value
-                self.twos_complement = self.complemented_value + self.carry_value
+                complemented_value = 0xFF - value
+                twos_complement = complemented_value + carry
 
-                self.result = self.accumulator_value + self.twos_complement
+                result = accumulator + twos_complement
 
-                cpu.registers["A"].set(self.result & 0xFF)
+                cpu.registers["A"].set(result & 0xFF)
 
-                self.set_flags(cpu.flags, cpu.registers)
+                self.set_flags(cpu.flags, cpu.registers, accumulator, value, result)
+                return result
             else:
-                self.value = None
-                self.result = None
                 raise IncompleteInstruction
         else:
-            # Decimal mode addition
+            # Decimal mode subtraction, see cmos_decimal_subtract
             if value is not None:
-                self.value = value
-                self.carry_value = 1 if cpu.flags["C"].status else 0
-                self.accumulator_value = cpu.registers["A"].get()
-
-                # The carry and overflow bits are set based on the full subtraction
-                self.full_result = (
-                    self.accumulator_value
-                    + ((0xFF - self.value) & 0xFF)
-                    + self.carry_value
+                entry = self.decimal_table.lookup(
+                    cpu.registers["A"].get(), value, cpu.flags["C"].status
                 )
-                self.result = (
-                    self.accumulator_value
-                    + ((0xFF - self.value) & 0xFF)
-                    + self.carry_value
-                )
-
-                # Subtract the nibbles one at a time
-                # First subtract the low nibbles
-                self.al = (
-                    EightBitArch.low_nibble(self.accumulator_value)
-                    - EightBitArch.low_nibble(self.value)
-                    + self.carry_value
-                    - 1
-                )
-
-                self.result = self.accumulator_value - self.value + self.carry_value - 1
-                if self.result < 0:
-                    self.result = self.result - 0x60
+                cpu.registers["A"].set(entry & 0xFF)
+                cpu.flags.set_bits(DecimalTable.flags_mask, entry >> 8)
+                return entry & 0xFF
+            else:
+                raise IncompleteInstruction
 
-                if self.al < 0:
-                    self.result = self.result - 0x06
+    def set_flags(self, flags, registers, accumulator, value, result):
+        "Set the flags after a binary mode subtraction"
+        # Set the carry flag
+        if result < 0x100:
+            flags["C"].clear()
+        else:
+            flags["C"].set()
 
-                cpu.registers["A"].set(self.result & 0xFF)
+        # Set the zero flag if the accumlator is zero
+        if registers["A"].get() == 0x00:
+            flags["Z"].set()
+        else:
+            flags["Z"].clear()
 
-                self.set_flags(cpu.flags, cpu.registers)
-            else:
-                self.value = None
-                self.result = None
-                raise IncompleteInstruction
+        # Set the negative flag
+        if (registers["A"].get() & 0x80) != 0:
+            flags["N"].set()
+        else:
+            flags["N"].clear()
 
-    def set_flags(self, flags, registers):  # noqa: C901
-        if flags["D"].status is False:
-            # binary mode subtraction
-            if self.result is not None:
-                # Set the carry flag
-                if self.result < 0x100:
-                    flags["C"].clear()
-                else:
-                    flags["C"].set()
-
-                # Set the zero flag if the accumlator is zero
-                if registers["A"].get() == 0x00:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
-
-                # Set the negative flag
-                if (registers["A"].get() & 0x80) != 0:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-
-                # if (self.accumulator_value & 0x80) != (self.value & 0x80) and (
-                #     self.accumulator_value & 0x80
-                # ) != (registers["A"].get() & 0x80):
-                if (
-                    (self.accumulator_value ^ self.value)
-                    & (self.accumulator_value ^ self.result)
-                    & 0x80
-                ):
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
+        # if (accumulator & 0x80) != (value & 0x80) and (
+        #     accumulator & 0x80
+        # ) != (registers["A"].get() & 0x80):
+        if (accumulator ^ value) & (accumulator ^ result) & 0x80:
+            flags["V"].set()
         else:
-            # decimal mode subtraction
-            # TODO: Verify C flag and others in emulator and manual
-            # The C and V flags are based on the result of the "full" subtraction
-            # This may not be the case for real hardware, but in some emulators such
-            # such as apple2emu, this is the case.
-            if self.full_result is not None:
-                if (self.accumulator_value & 0x80) != (self.value & 0x80) and (
-                    self.accumulator_value & 0x80
-                ) != (self.full_result & 0x80):
-                    flags["V"].set()
-                else:
-                    flags["V"].clear()
-
-            if self.result is not None:
-                # From the MCS6500 Family Programming Manual:
-                # The carry flag is set if the result is greater than or equal to zero
-                # Otherwise it is reset
-                if self.result >= 0:
-                    flags["C"].set()
-                else:
-                    flags["C"].clear()
-
-                if registers["A"].get() & 0x80:
-                    flags["N"].set()
-                else:
-                    flags["N"].clear()
-
-                if registers["A"].get() == 0x00:
-                    flags["Z"].set()
-                else:
-                    flags["Z"].clear()
+            flags["V"].clear()
 
 
 class SBC(SBCNMOS):
@@ -11,16 +11,16 @@ class TAU(Instruction):
 
     def instruction_execute(self, cpu, memory, value, address=None):
         "Execute the instruction, storing the accumulator value into the register"
-        self.result = cpu.registers["A"].get()
-        cpu.registers[self.register].set(self.result)
-        self.set_flags(cpu.flags, cpu.registers)
+        result = cpu.registers["A"].get()
+        cpu.registers[self.register].set(result)
+        self.set_flags(cpu.flags, cpu.registers, result)
+        return result
 
-    def set_flags(self, flags, registers):
+    def set_flags(self, flags, registers, result):
         """
-        Sets flags based on the result of the subtract operation
+        Sets flags based on the transferred value
         """
-        flags["N"].test_result(self.result)
-        flags["Z"].test_result(self.result)
+        flags.set_nz(result)
 
 
 class TAX(TAU):
@@ -47,16 +47,16 @@ class TUA(Instruction):
 
     def instruction_execute(self, cpu, memory, value, address=None):
         "Execute the instruction, storing the register value into the accumulator"
-        self.result = cpu.registers[self.register].get()
-        cpu.registers["A"].set(self.result)
-        self.set_flags(cpu.flags, cpu.registers)
+        result = cpu.registers[self.register].get()
+        cpu.registers["A"].set(result)
+        self.set_flags(cpu.flags, cpu.registers, result)
+        return result
 
-    def set_flags(self, flags, registers):
+    def set_flags(self, flags, registers, result):
         """
-        Sets flags based on the result of the subtract operation
+        Sets flags based on the transferred value
         """
-        flags["N"].test_result(self.result)
-        flags["Z"].test_result(self.result)
+        flags.set_nz(result)
 
 
 class TXA(TUA):
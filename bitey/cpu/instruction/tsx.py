@@ -31,5 +31,4 @@ class TSX(Instruction):
 
         Sets the negative (N) flag if bit 7 is one.
         """
-        flags["N"].test_register_result(registers["X"])
-        flags["Z"].test_register_result(registers["X"])
+        flags.set_nz(registers["X"].get())
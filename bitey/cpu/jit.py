@@ -0,0 +1,1182 @@
+from dataclasses import dataclass, field
+import logging
+from typing import ClassVar
+
+from bitey.cpu.addressing_mode import (
+    AbsoluteAddressingMode,
+    AbsoluteXAddressingMode,
+    AbsoluteYAddressingMode,
+    AccumulatorAddressingMode,
+    ImmediateAddressingMode,
+    ImpliedAddressingMode,
+    IndexedIndirectAddressingMode,
+    IndirectIndexedAddressingMode,
+    IndirectXAddressingMode,
+    IndirectYAddressingMode,
+    RelativeAddressingMode,
+    ZeroPageAddressingMode,
+    ZeroPageXAddressingMode,
+    ZeroPageYAddressingMode,
+)
+from bitey.cpu.arch import EightBitArch
+from bitey.cpu.cpu import CPU, CPUState, RunResult, StopReason
+from bitey.cpu.instruction.adc import ADCCMOS, ADCNMOS
+from bitey.cpu.instruction.an import AND
+from bitey.cpu.instruction.asl import ASL
+from bitey.cpu.instruction.bcc import BCC
+from bitey.cpu.instruction.bcs import BCS
+from bitey.cpu.instruction.beq import BEQ
+from bitey.cpu.instruction.bit import BIT
+from bitey.cpu.instruction.bmi import BMI
+from bitey.cpu.instruction.bne import BNE
+from bitey.cpu.instruction.bpl import BPL
+from bitey.cpu.instruction.brk import BRK
+from bitey.cpu.instruction.bvc import BVC
+from bitey.cpu.instruction.bvs import BVS
+from bitey.cpu.instruction.clc import CLC
+from bitey.cpu.instruction.cld import CLD
+from bitey.cpu.instruction.cli import CLI
+from bitey.cpu.instruction.clv import CLV
+from bitey.cpu.instruction.cp import CP
+from bitey.cpu.instruction.dec import DE, DEC
+from bitey.cpu.instruction.eor import EOR
+from bitey.cpu.instruction.inc import IN, INC
+from bitey.cpu.instruction.instruction import (
+    Instruction,
+    UndocumentedInstruction,
+    UndocumentedOpcode,
+)
+from bitey.cpu.instruction.jmp import JMP, JMPPageBoundaryBug
+from bitey.cpu.instruction.jsr import JSR
+from bitey.cpu.instruction.ld import LD
+from bitey.cpu.instruction.lsr import LSR
+from bitey.cpu.instruction.nop import NOP
+from bitey.cpu.instruction.ora import ORA
+from bitey.cpu.instruction.pha import PHA
+from bitey.cpu.instruction.pla import PLA
+from bitey.cpu.instruction.rol import ROL
+from bitey.cpu.instruction.ror import ROR
+from bitey.cpu.instruction.rti import RTI
+from bitey.cpu.instruction.rts import RTS
+from bitey.cpu.instruction.sbc import SBCCMOS, SBCNMOS
+from bitey.cpu.instruction.sec import SEC
+from bitey.cpu.instruction.sed import SED
+from bitey.cpu.instruction.sei import SEI
+from bitey.cpu.instruction.st import ST
+from bitey.cpu.instruction.ta import TAU, TUA
+from bitey.cpu.instruction.tsx import TSX
+from bitey.cpu.instruction.txs import TXS
+from bitey.memory.memory import Memory
+
+
+class LockstepMismatch(Exception):
+    """
+    A compiled block and the reference interpreter disagree
+    Raised in lockstep mode with the address of the block and a list
+    of the differences between the two machine states
+    """
+
+    def __init__(self, address, differences):
+        super().__init__(
+            "Block at 0x{:04x} differs from the interpreter: {}".format(
+                address, "; ".join(differences)
+            )
+        )
+        self.address = address
+        self.differences = differences
+
+
+@dataclass
+class DecodedInstruction:
+    """
+    An instruction decoded at an address
+    The operand bytes are read once when the block is compiled and are
+    folded into the generated code as constants.
+    """
+
+    index: int
+    "The position of the instruction in its block"
+
+    address: int
+    "The address of the opcode"
+
+    instruction: Instruction
+    "The instruction from the CPU opcode table"
+
+    operand: bytes
+    "The operand bytes following the opcode"
+
+    @property
+    def next_address(self):
+        "The address of the following instruction"
+        return self.address + 1 + len(self.operand)
+
+    @property
+    def word(self):
+        "The operand as a 16-bit little-endian word"
+        return self.operand[0] | (self.operand[1] << 8)
+
+
+@dataclass(eq=False)
+class Block:
+    """
+    A compiled basic block
+
+    A block is a straight-line run of instructions ending in a branch,
+    jump, subroutine call or return, or any instruction that isn't
+    compiled inline.  Calling the function executes the whole block
+    and returns the number of instructions executed.
+    """
+
+    start: int
+    "The address of the first instruction"
+
+    end: int
+    "The address after the last byte of the block"
+
+    count: int
+    "The number of instructions in the block"
+
+    cycles: int = 0
+    "The most clock cycles running the block can take"
+
+    source: str = ""
+    "The generated Python source, useful when debugging the compiler"
+
+    function: object = None
+    "The compiled block function"
+
+    brk: bool = False
+    "True if the block is a single BRK instruction"
+
+    valid: bool = True
+    "Cleared when the code the block was compiled from changes"
+
+    def pages(self):
+        "The memory pages the block was compiled from"
+        return range(
+            self.start // Memory.page_size, (self.end - 1) // Memory.page_size + 1
+        )
+
+
+class BlockGenerator:
+    """
+    Generate the Python source for a basic block
+
+    The A, X, Y and S registers and the P register are kept in local
+    variables for the whole block and are written back to the register
+    file when the block exits.  The N and Z flags are tracked lazily
+    in the local nz, the same way Flags.set_nz does.
+
+    Instructions the generator doesn't handle are executed by calling
+    the reference implementation, with the local state written back
+    before and loaded again after the call.
+
+    The base cycle counts of the instructions are added up when the
+    block is generated.  Only page crossing penalties are counted at
+    run time, in the local cycles, and the total is added to the CPU
+    cycle counter when the block exits.
+    """
+
+    emitters: ClassVar[dict] = {
+        LD: "emit_load",
+        ST: "emit_store",
+        TAU: "emit_transfer",
+        TUA: "emit_transfer",
+        TSX: "emit_transfer",
+        TXS: "emit_transfer",
+        IN: "emit_increment_register",
+        DE: "emit_decrement_register",
+        INC: "emit_increment_memory",
+        DEC: "emit_decrement_memory",
+        AND: "emit_logical",
+        ORA: "emit_logical",
+        EOR: "emit_logical",
+        CP: "emit_compare",
+        ASL: "emit_shift",
+        LSR: "emit_shift",
+        ROL: "emit_shift",
+        ROR: "emit_shift",
+        BIT: "emit_bit",
+        ADCNMOS: "emit_add",
+        ADCCMOS: "emit_add",
+        SBCNMOS: "emit_subtract",
+        SBCCMOS: "emit_subtract",
+        CLC: "emit_flag",
+        CLD: "emit_flag",
+        CLI: "emit_flag",
+        CLV: "emit_flag",
+        SEC: "emit_flag",
+        SED: "emit_flag",
+        SEI: "emit_flag",
+        NOP: "emit_nop",
+        PHA: "emit_push_accumulator",
+        PLA: "emit_pull_accumulator",
+        BCC: "emit_branch",
+        BCS: "emit_branch",
+        BEQ: "emit_branch",
+        BMI: "emit_branch",
+        BNE: "emit_branch",
+        BPL: "emit_branch",
+        BVC: "emit_branch",
+        BVS: "emit_branch",
+        JMP: "emit_jump",
+        JSR: "emit_jump_subroutine",
+        RTS: "emit_return_subroutine",
+    }
+    "Map from instruction classes to the methods that generate them"
+
+    terminators: ClassVar[tuple] = (
+        BRK,
+        JMP,
+        JMPPageBoundaryBug,
+        JSR,
+        RTI,
+        RTS,
+        UndocumentedOpcode,
+    )
+    "Instructions that end a block, along with the branches"
+
+    flag_operations: ClassVar[dict] = {
+        CLC: ("C", False),
+        CLD: ("D", False),
+        CLI: ("I", False),
+        CLV: ("V", False),
+        SEC: ("C", True),
+        SED: ("D", True),
+        SEI: ("I", True),
+    }
+    "The flag set or cleared by each flag instruction"
+
+    branch_conditions: ClassVar[dict] = {
+        BCC: ("C", False),
+        BCS: ("C", True),
+        BEQ: ("Z", True),
+        BMI: ("N", True),
+        BNE: ("Z", False),
+        BPL: ("N", False),
+        BVC: ("V", False),
+        BVS: ("V", True),
+    }
+    "The flag and flag status each branch is taken on"
+
+    logical_operators: ClassVar[dict] = {AND: "&", ORA: "|", EOR: "^"}
+
+    transfers: ClassVar[dict] = {TSX: ("x", "s", True), TXS: ("s", "x", False)}
+    "The destination, source and whether N and Z are set for S transfers"
+
+    def __init__(self, cpu, entries):
+        self.cpu = cpu
+        self.entries = entries
+        self.start = entries[0].address
+        self.end = entries[-1].next_address
+        self.masks = {name: flag.mask for (name, flag) in cpu.flags.flag_dict.items()}
+
+        # The base cycles taken by the first n instructions, by n
+        self.base_cycles = [0]
+        for entry in entries:
+            opcode = entry.instruction.opcode
+            self.base_cycles.append(self.base_cycles[-1] + opcode.cycles)
+
+    @property
+    def max_cycles(self):
+        "The most cycles the block can take, with every penalty"
+        cycles = self.base_cycles[-1]
+        for entry in self.entries:
+            cycles += entry.instruction.opcode.page_cross_cycles
+        if isinstance(
+            self.entries[-1].instruction.opcode.addressing_mode, RelativeAddressingMode
+        ):
+            cycles += 2
+        return cycles
+
+    @classmethod
+    def emitter_for(cls, instruction):
+        """
+        Find the generator method for an instruction, or None
+        Subclasses that override the execution methods of a supported
+        instruction class are not generated inline.
+        """
+        for klass in type(instruction).__mro__:
+            if klass in cls.emitters:
+                if (
+                    type(instruction).execute is klass.execute
+                    and type(instruction).instruction_execute
+                    is klass.instruction_execute
+                ):
+                    return cls.emitters[klass]
+                return None
+        return None
+
+    @classmethod
+    def is_terminator(cls, instruction):
+        "Return True if the instruction ends a block"
+        return isinstance(instruction, cls.terminators) or isinstance(
+            instruction.opcode.addressing_mode, RelativeAddressingMode
+        )
+
+    def generate(self):
+        "Return the Python source for the block"
+        cpu = self.cpu
+        lines = [
+            "def make_block(compiler, block, instructions):",
+            "    cpu = compiler.cpu",
+            "    memory = compiler.memory",
+            "    read = memory.read",
+            "    peek = memory.peek",
+            "    write = memory.write",
+            "    regs = cpu.register_data",
+            "    flags = cpu.flags",
+            "    store_flags = compiler.store_flags",
+            "    next_pcs = {}".format(
+                tuple(entry.next_address for entry in self.entries)
+            ),
+            "    base_cycles = {}".format(tuple(self.base_cycles)),
+            "",
+            "    def block_{:04x}():".format(self.start),
+        ]
+        body = self.load_state() + ["cycles = 0", "i = 0", "live = True", "try:"]
+        for entry in self.entries:
+            instruction_lines = [
+                "# 0x{:04x} {} {}".format(
+                    entry.address,
+                    entry.instruction.name,
+                    type(entry.instruction.opcode.addressing_mode).__name__,
+                )
+            ]
+            if entry.index > 0:
+                instruction_lines.append("i = {}".format(entry.index))
+            body.extend(self.indent(instruction_lines + self.emit(entry)))
+        if not self.is_terminator(self.entries[-1].instruction):
+            body.extend(self.indent(self.exit_block(self.end, len(self.entries))))
+        body.extend(self.exception_handler())
+        lines.extend("        " + line for line in body)
+        lines.append("")
+        lines.append("    return block_{:04x}".format(self.start))
+        lines.append("")
+
+        return "\n".join(lines)
+
+    def emit(self, entry):
+        "Generate an instruction inline or fall back to the interpreter"
+        penalty = self.page_cross(entry)
+        method = self.emitter_for(entry.instruction)
+        if method is not None:
+            lines = getattr(self, method)(entry)
+            if lines is not None:
+                return penalty + lines
+        return penalty + self.fallback(entry)
+
+    # State handling
+
+    def load_state(self):
+        "Load the registers and flags into locals"
+        cpu = self.cpu
+        return [
+            "a = regs[{}]".format(cpu.a_index),
+            "x = regs[{}]".format(cpu.x_index),
+            "y = regs[{}]".format(cpu.y_index),
+            "s = regs[{}]".format(cpu.s_index),
+            "p = p0 = regs[{}]".format(cpu.p_index),
+            "nz = nz0 = flags.nz_result",
+        ]
+
+    def store_state(self, pc):
+        "Write the locals back to the registers and flags"
+        cpu = self.cpu
+        return [
+            "regs[{}] = a".format(cpu.a_index),
+            "regs[{}] = x".format(cpu.x_index),
+            "regs[{}] = y".format(cpu.y_index),
+            "regs[{}] = s".format(cpu.s_index),
+            "regs[{}] = {}".format(cpu.pc_index, pc),
+            "store_flags(p, p0, nz, nz0)",
+        ]
+
+    def count_cycles(self, count, extra_cycles=0):
+        "Add the cycles taken by the first count instructions to the CPU"
+        return "cpu.cycles += cycles + {}".format(
+            self.base_cycles[count] + extra_cycles
+        )
+
+    def exit_block(self, pc, count, extra_cycles=0):
+        "Write back the state and leave the block"
+        if isinstance(pc, int):
+            pc = "0x{:04x}".format(pc)
+        return self.store_state(pc) + [
+            self.count_cycles(count, extra_cycles),
+            "return {}".format(count),
+        ]
+
+    def exception_handler(self):
+        """
+        Return the lines writing back the state if an instruction raises
+
+        The registers are left as they were when the instruction
+        raised, with the PC pointing past it and the cycles of the
+        instructions before it counted, the same as the interpreter.
+        The number of instructions run is stored in the compiler's
+        partial_count for BlockCompiler.run.  While the interpreter
+        runs a fallback instruction the registers are already written
+        back and the locals are stale, see fallback.
+        """
+        return (
+            [
+                "except BaseException:",
+                "    if live:",
+            ]
+            + self.indent(self.indent(self.store_state("next_pcs[i]")))
+            + [
+                "    cpu.cycles += cycles + base_cycles[i]",
+                "    compiler.partial_count = i",
+                "    raise",
+            ]
+        )
+
+    def fallback(self, entry):
+        "Execute an instruction with the reference interpreter"
+        count = entry.index + 1
+        lines = self.store_state("0x{:04x}".format(entry.address + 1))
+        lines.append("live = False")
+        lines.append("instructions[{}].execute(cpu, memory)".format(entry.index))
+        if self.is_terminator(entry.instruction):
+            lines.extend([self.count_cycles(count), "return {}".format(count)])
+        else:
+            lines.append("live = True")
+            lines.extend(self.load_state())
+            lines.extend(
+                [
+                    "if not block.valid:",
+                    "    " + self.count_cycles(count),
+                    "    return {}".format(count),
+                ]
+            )
+        return lines
+
+    def page_cross(self, entry):
+        """
+        Return the lines counting the page crossing penalty of an
+        instruction, see AddressingMode.crosses_page
+        """
+        opcode = entry.instruction.opcode
+        if not opcode.page_cross_cycles:
+            return []
+        penalty = "    cycles += {}".format(opcode.page_cross_cycles)
+        mode = type(opcode.addressing_mode)
+        low = entry.operand[0]
+        if mode in (AbsoluteXAddressingMode, AbsoluteYAddressingMode):
+            if low == 0x00:
+                return []
+            index = "x" if mode is AbsoluteXAddressingMode else "y"
+            return ["if {} > 0x{:02x}:".format(index, 0xFF - low), penalty]
+        if mode in (IndirectIndexedAddressingMode, IndirectYAddressingMode):
+            # The pointer is read by the instruction, peeking it here
+            # doesn't call I/O handlers or check watchpoints twice
+            return ["if peek(0x{:02x}) + y > 0xFF:".format(low), penalty]
+        return []
+
+    def flag_test(self, name):
+        "Return an expression that is true if a flag is set"
+        mask = self.masks[name]
+        if name == "Z":
+            return "((nz & 0xFF) == 0 if nz is not None else p & 0x{:02x})".format(mask)
+        if name == "N":
+            return "(nz & 0x80 if nz is not None else p & 0x{:02x})".format(mask)
+        return "p & 0x{:02x}".format(mask)
+
+    def set_flag_if(self, name, condition):
+        "Return a statement setting a flag to the truth of a condition"
+        mask = self.masks[name]
+        return "p = (p | 0x{:02x}) if {} else (p & 0x{:02x})".format(
+            mask, condition, 0xFF ^ mask
+        )
+
+    @staticmethod
+    def indent(lines):
+        return ["    " + line for line in lines]
+
+    # Operands
+
+    def address(self, entry):
+        """
+        Return the lines computing the effective address, an
+        expression for it and the lowest and highest address it can
+        have, or None if the addressing mode isn't supported
+        """
+        mode = type(entry.instruction.opcode.addressing_mode)
+        operand = entry.operand
+        if mode is ZeroPageAddressingMode:
+            return ([], "0x{:02x}".format(operand[0]), operand[0], operand[0])
+        if mode in (ZeroPageXAddressingMode, ZeroPageYAddressingMode):
+            index = "x" if mode is ZeroPageXAddressingMode else "y"
+            lines = ["address = (0x{:02x} + {}) & 0xFF".format(operand[0], index)]
+            return (lines, "address", 0x00, 0xFF)
+        if mode is AbsoluteAddressingMode:
+            word = entry.word
+            return ([], "0x{:04x}".format(word), word, word)
+        if mode in (AbsoluteXAddressingMode, AbsoluteYAddressingMode):
+            word = entry.word
+            index = "x" if mode is AbsoluteXAddressingMode else "y"
+            (low, high) = (word, word + 0xFF)
+            if high > 0xFFFF:
+                (low, high) = (0x0000, 0xFFFF)
+            lines = ["address = (0x{:04x} + {}) & 0xFFFF".format(word, index)]
+            return (lines, "address", low, high)
+        if mode in (IndexedIndirectAddressingMode, IndirectXAddressingMode):
+            lines = [
+                "pointer = (0x{:02x} + x) & 0xFF".format(operand[0]),
+                "address = read(pointer) | (read((pointer + 1) & 0xFF) << 8)",
+            ]
+            return (lines, "address", 0x0000, 0xFFFF)
+        if mode in (IndirectIndexedAddressingMode, IndirectYAddressingMode):
+            # The high byte of the pointer doesn't wrap in the zero
+            # page, the same as IndirectIndexedAddressingMode
+            lines = [
+                "pointer = read(0x{:02x}) | (read(0x{:02x}) << 8)".format(
+                    operand[0], operand[0] + 1
+                ),
+                "address = (pointer + y) & 0xFFFF",
+            ]
+            return (lines, "address", 0x0000, 0xFFFF)
+        return None
+
+    def value(self, entry):
+        """
+        Return the lines loading the operand value and an expression
+        for it, or None if the addressing mode isn't supported
+        """
+        mode = type(entry.instruction.opcode.addressing_mode)
+        if mode is ImmediateAddressingMode:
+            return ([], "0x{:02x}".format(entry.operand[0]))
+        if mode is AccumulatorAddressingMode:
+            return ([], "a")
+        address = self.address(entry)
+        if address is None:
+            return None
+        (lines, expression, low, high) = address
+        return (lines, "read({})".format(expression))
+
+    def write(self, entry, address, value):
+        """
+        Write a value to memory
+
+        If the write can hit the block itself, the block is left right
+        after the write so the changed code is compiled again.
+        """
+        (lines, expression, low, high) = address
+        lines = lines + ["write({}, {})".format(expression, value)]
+        if self.start <= high and low < self.end:
+            check = "if 0x{:04x} <= {} < 0x{:04x}:".format(
+                self.start, expression, self.end
+            )
+            lines.append(check)
+            lines.extend(
+                self.indent(self.exit_block(entry.next_address, entry.index + 1))
+            )
+        return lines
+
+    def push(self, entry, value, check=True):
+        "Push a value on the stack, the same way CPU.stack_push does"
+        # The stack pointer is updated before the write, the block may
+        # be left right after it
+        lines = [
+            "if s < 0:",
+            "    s = 0xFF",
+            "stack = 0x{:04x} + s".format(CPU.stack_base),
+            "s -= 1",
+        ]
+        if not check:
+            return lines + ["write(stack, {})".format(value)]
+        stack = ([], "stack", CPU.stack_base, CPU.stack_base + 0xFF)
+        return lines + self.write(entry, stack, value)
+
+    @staticmethod
+    def pull(name):
+        "Pull a value off the stack, the same way CPU.stack_pop does"
+        return [
+            "if s >= 0xFF:",
+            "    s = 0",
+            "s += 1",
+            "{} = read(0x{:04x} + s)".format(name, CPU.stack_base),
+        ]
+
+    # Instructions
+
+    def emit_load(self, entry):
+        value = self.value(entry)
+        if value is None:
+            return None
+        register = entry.instruction.register.lower()
+        return value[0] + [
+            "{} = {}".format(register, value[1]),
+            "nz = {}".format(register),
+        ]
+
+    def emit_store(self, entry):
+        address = self.address(entry)
+        if address is None:
+            return None
+        return self.write(entry, address, entry.instruction.register.lower())
+
+    def emit_transfer(self, entry):
+        instruction = entry.instruction
+        if isinstance(instruction, TAU):
+            (destination, source, nz) = (instruction.register.lower(), "a", True)
+        elif isinstance(instruction, TUA):
+            (destination, source, nz) = ("a", instruction.register.lower(), True)
+        else:
+            (destination, source, nz) = self.transfers[type(instruction)]
+        lines = ["{} = {}".format(destination, source)]
+        if nz:
+            lines.append("nz = {}".format(destination))
+        return lines
+
+    def emit_increment_register(self, entry):
+        register = entry.instruction.register.lower()
+        return [
+            "{0} = ({0} + 1) & 0xFF".format(register),
+            "nz = {}".format(register),
+        ]
+
+    def emit_decrement_register(self, entry):
+        register = entry.instruction.register.lower()
+        return [
+            "{0} = ({0} - 1) & 0xFF".format(register),
+            "nz = {}".format(register),
+        ]
+
+    def emit_read_modify_write(self, entry, operation):
+        "Generate a read-modify-write instruction on memory"
+        address = self.address(entry)
+        if address is None:
+            return None
+        (lines, expression, low, high) = address
+        lines = lines + ["value = read({})".format(expression)] + operation
+        lines.append("nz = value")
+        return lines + self.write(entry, ([], expression, low, high), "value")
+
+    def emit_increment_memory(self, entry):
+        return self.emit_read_modify_write(entry, ["value = (value + 1) & 0xFF"])
+
+    def emit_decrement_memory(self, entry):
+        return self.emit_read_modify_write(entry, ["value = (value - 1) & 0xFF"])
+
+    def emit_logical(self, entry):
+        value = self.value(entry)
+        if value is None:
+            return None
+        operator = self.logical_operators[type(entry.instruction)]
+        return value[0] + ["a {}= {}".format(operator, value[1]), "nz = a"]
+
+    def emit_compare(self, entry):
+        value = self.value(entry)
+        if value is None:
+            return None
+        register = entry.instruction.register.lower()
+        return value[0] + [
+            "value = {}".format(value[1]),
+            self.set_flag_if("C", "{} >= value".format(register)),
+            "nz = ({} - value) & 0xFF".format(register),
+        ]
+
+    def emit_shift(self, entry):
+        instruction = entry.instruction
+        carry = self.flag_test("C")
+        if isinstance(instruction, ASL):
+            operation = [
+                self.set_flag_if("C", "value & 0x80"),
+                "value = (value << 1) & 0xFF",
+            ]
+        elif isinstance(instruction, LSR):
+            operation = [self.set_flag_if("C", "value & 0x01"), "value >>= 1"]
+        elif isinstance(instruction, ROL):
+            operation = [
+                "carry = 1 if {} else 0".format(carry),
+                self.set_flag_if("C", "value & 0x80"),
+                "value = ((value << 1) & 0xFF) | carry",
+            ]
+        else:
+            operation = [
+                "carry = 0x80 if {} else 0".format(carry),
+                self.set_flag_if("C", "value & 0x01"),
+                "value = (value >> 1) | carry",
+            ]
+
+        if isinstance(instruction.opcode.addressing_mode, AccumulatorAddressingMode):
+            return ["value = a"] + operation + ["a = value", "nz = a"]
+        return self.emit_read_modify_write(entry, operation)
+
+    def emit_bit(self, entry):
+        value = self.value(entry)
+        if value is None:
+            return None
+        masks = self.masks
+        keep = 0xFF ^ (masks["N"] | masks["V"] | masks["Z"])
+        # N and Z don't come from the same byte, so they are set in p
+        return value[0] + [
+            "value = {}".format(value[1]),
+            "p = ((p & 0x{:02x}) | (0x{:02x} if value & 0x80 else 0)".format(
+                keep, masks["N"]
+            ),
+            "     | (0x{:02x} if value & 0x40 else 0)".format(masks["V"]),
+            "     | (0x{:02x} if not a & value else 0))".format(masks["Z"]),
+            "nz = None",
+        ]
+
+    def emit_arithmetic(self, entry, operation):
+        "Generate binary mode ADC or SBC, decimal mode uses the interpreter"
+        value = self.value(entry)
+        if value is None:
+            return None
+        lines = ["if p & 0x{:02x}:".format(self.masks["D"])]
+        lines.extend(self.indent(self.fallback(entry)))
+        lines.append("else:")
+        lines.extend(
+            self.indent(value[0] + ["value = {}".format(value[1])] + operation)
+        )
+        return lines
+
+    def emit_add(self, entry):
+        return self.emit_arithmetic(
+            entry,
+            [
+                "result = a + value + (1 if {} else 0)".format(self.flag_test("C")),
+                self.set_flag_if("C", "result > 0xFF"),
+                self.set_flag_if("V", "~(a ^ value) & (a ^ result) & 0x80"),
+                "a = result & 0xFF",
+                "nz = a",
+            ],
+        )
+
+    def emit_subtract(self, entry):
+        return self.emit_arithmetic(
+            entry,
+            [
+                "result = a - value - (0 if {} else 1)".format(self.flag_test("C")),
+                self.set_flag_if("C", "result >= 0"),
+                self.set_flag_if("V", "(a ^ value) & (a ^ result) & 0x80"),
+                "a = result & 0xFF",
+                "nz = a",
+            ],
+        )
+
+    def emit_flag(self, entry):
+        (name, status) = self.flag_operations[type(entry.instruction)]
+        mask = self.masks[name]
+        if status:
+            return ["p |= 0x{:02x}".format(mask)]
+        return ["p &= 0x{:02x}".format(0xFF ^ mask)]
+
+    def emit_nop(self, entry):
+        mode = entry.instruction.opcode.addressing_mode
+        if not isinstance(mode, ImpliedAddressingMode):
+            return None
+        return []
+
+    def emit_push_accumulator(self, entry):
+        return self.push(entry, "a")
+
+    def emit_pull_accumulator(self, entry):
+        return self.pull("a") + ["nz = a"]
+
+    def emit_branch(self, entry):
+        (name, status) = self.branch_conditions[type(entry.instruction)]
+        condition = self.flag_test(name)
+        if not status:
+            condition = "not ({})".format(condition)
+        offset = EightBitArch.twos_complement_to_signed_int(entry.operand[0])
+        target = (entry.next_address + offset) % 0x10000
+        count = entry.index + 1
+        # A taken branch takes an extra cycle, two if it crosses a page
+        extra_cycles = 2 if (target ^ entry.next_address) & 0xFF00 else 1
+        lines = ["if {}:".format(condition)]
+        lines.extend(self.indent(self.exit_block(target, count, extra_cycles)))
+        return lines + self.exit_block(entry.next_address, count)
+
+    def emit_jump(self, entry):
+        mode = entry.instruction.opcode.addressing_mode
+        if not isinstance(mode, AbsoluteAddressingMode):
+            return None
+        return self.exit_block(entry.word, entry.index + 1)
+
+    def emit_jump_subroutine(self, entry):
+        # The return address pushed is the last byte of the JSR
+        return_address = entry.next_address - 1
+        lines = self.push(entry, "0x{:02x}".format(return_address >> 8), False)
+        lines += self.push(entry, "0x{:02x}".format(return_address & 0xFF), False)
+        return lines + self.exit_block(entry.word, entry.index + 1)
+
+    def emit_return_subroutine(self, entry):
+        lines = self.pull("low") + self.pull("high")
+        return lines + self.exit_block("((high << 8) | low) + 1", entry.index + 1)
+
+
+@dataclass
+class BlockCompiler:
+    """
+    Basic-block compiler
+
+    Translates straight-line runs of 6502 code into Python functions
+    and caches them by start address.  Operand bytes are folded into
+    the generated code as constants and registers are kept in local
+    variables for the length of a block, so the per-instruction
+    decode and dispatch work of the interpreter is only done once.
+
+    Blocks are dropped when memory they were compiled from is written
+    to, through the Memory code page listeners.  Memory changed
+    without Memory.write, for example by assigning to Memory.memory
+    directly, needs a call to flush().
+
+    In lockstep mode each block is also run with the reference
+    interpreter and the machine states are compared, raising
+    LockstepMismatch on the first difference.
+    """
+
+    cpu: CPU
+    "The CPU to run"
+
+    memory: Memory
+    "The memory the code is compiled from"
+
+    max_block_instructions: ClassVar[int] = 64
+    "The maximum number of instructions in one block"
+
+    blocks: dict = field(default_factory=dict)
+    "The compiled blocks, by start address"
+
+    def __post_init__(self):
+        self.logger = logging.getLogger("bitey.cpu.jit.BlockCompiler")
+        self.p_register = self.cpu.registers["P"]
+        self.page_blocks = {}
+        self.breakpoints = set()
+        self.partial_count = 0
+        self.memory.add_code_listener(self.invalidate)
+
+    def store_flags(self, p, p0, nz, nz0):
+        """
+        Store the flags of a block back into the P register
+        p and nz are the P register and pending N and Z result at the
+        end of the block, p0 and nz0 the values at the start of it
+        """
+        if p != p0:
+            self.p_register.set(p)
+            if nz is not None:
+                self.cpu.flags.set_nz(nz)
+        elif nz != nz0:
+            if nz is None:
+                self.p_register.set(p)
+            else:
+                self.cpu.flags.set_nz(nz)
+
+    def decode(self, start):
+        "Decode the instructions of the block starting at start"
+        cpu = self.cpu
+        memory = self.memory
+        size = len(memory)
+        entries = []
+        address = start
+        while len(entries) < BlockCompiler.max_block_instructions:
+            if (address >= size) or (entries and address in self.breakpoints):
+                break
+            instruction = cpu.opcode_table[memory.read(address)]
+            length = instruction.opcode.addressing_mode.bytes
+            if address + length > size:
+                break
+            if entries and isinstance(instruction, (BRK, UndocumentedOpcode)):
+                # BRK and invalid opcodes get a block of their own so
+                # they can be trapped and counted like the interpreter
+                break
+            operand = bytes(memory.read_range(address + 1, address + length))
+            entries.append(
+                DecodedInstruction(len(entries), address, instruction, operand)
+            )
+            address += length
+            if BlockGenerator.is_terminator(instruction):
+                break
+        return entries
+
+    def compile_block(self, start):
+        "Compile the block at an address, or return None if it can't be decoded"
+        entries = self.decode(start)
+        if not entries:
+            return None
+
+        generator = BlockGenerator(self.cpu, entries)
+        block = Block(
+            start,
+            generator.end,
+            len(entries),
+            generator.max_cycles,
+            generator.generate(),
+            brk=isinstance(entries[0].instruction, BRK),
+        )
+        namespace = {}
+        code = compile(block.source, "<block 0x{:04x}>".format(start), "exec")
+        exec(code, namespace)
+        block.function = namespace["make_block"](
+            self, block, tuple(entry.instruction for entry in entries)
+        )
+
+        self.blocks[start] = block
+        for page in block.pages():
+            self.page_blocks.setdefault(page, set()).add(block)
+        self.memory.mark_code(block.start, block.end)
+        self.logger.debug(
+            "Compiled block 0x{:04x}-0x{:04x}, {} instructions".format(
+                block.start, block.end, block.count
+            )
+        )
+        return block
+
+    def precompile(self, addresses):
+        """
+        Compile the blocks at a list of addresses ahead of time
+        The addresses can be the block starts of a ControlFlowGraph,
+        so blocks are compiled before the code first runs.  Returns
+        the number of blocks compiled.
+        """
+        count = 0
+        for address in addresses:
+            if address not in self.blocks and self.compile_block(address) is not None:
+                count += 1
+        return count
+
+    def invalidate(self, start, end):
+        "Drop the blocks compiled from a range of memory"
+        first_page = start // Memory.page_size
+        last_page = (end - 1) // Memory.page_size
+        for page in range(first_page, last_page + 1):
+            blocks = self.page_blocks.get(page)
+            if blocks:
+                for block in [b for b in blocks if b.start < end and start < b.end]:
+                    self.discard(block)
+
+    def discard(self, block):
+        "Drop a compiled block"
+        block.valid = False
+        if self.blocks.get(block.start) is block:
+            del self.blocks[block.start]
+        for page in block.pages():
+            self.page_blocks[page].discard(block)
+
+    def flush(self):
+        "Drop all compiled blocks"
+        for block in self.blocks.values():
+            block.valid = False
+        self.blocks.clear()
+        self.page_blocks.clear()
+
+    def step(self):
+        "Execute one instruction with the reference interpreter"
+        cpu = self.cpu
+        registers = cpu.register_data
+        pc = registers[cpu.pc_index]
+        instruction = cpu.opcode_table[self.memory.read(pc)]
+        if cpu.trace_hook is not None:
+            cpu.trace_hook(cpu, pc, instruction)
+        opcode = instruction.opcode
+        operand = None
+        if opcode.page_cross_cycles:
+            operand = opcode.addressing_mode.read_operand(self.memory, pc)
+        registers[cpu.pc_index] = (pc + 1) & 0xFFFF
+        instruction.execute(cpu, self.memory)
+        if operand is not None:
+            cpu.cycles += opcode.get_cycles(cpu.registers, self.memory, operand)
+        else:
+            cpu.cycles += opcode.cycles
+
+    def run(
+        self, max_instructions=None, trap_brk=False, lockstep=False, max_cycles=None
+    ):
+        """
+        Run compiled code
+
+        This behaves like Computer.run_fast and returns a RunResult.
+        Blocks end before CPU breakpoints, so breakpoints are checked
+        at the same instructions as in the interpreter.  If a block is
+        longer than the remaining instruction budget, or can take more
+        cycles than are left in the cycle budget, the rest of the
+        budget is interpreted one instruction at a time.
+
+        Compiled blocks can't be traced or stopped in the middle, if
+        the CPU has a trace hook or watchpoints on the memory all the
+        instructions are interpreted.  A watchpoint hit stops
+        execution after the instruction that hit it.
+        """
+        cpu = self.cpu
+        registers = cpu.register_data
+        pc_index = cpu.pc_index
+        breakpoints = cpu.cpu_breakpoints
+        if self.breakpoints != set(breakpoints):
+            self.flush()
+            self.breakpoints = set(breakpoints)
+        # The breakpoint bitmap is only tested if there are breakpoints
+        breakpoint_map = cpu.breakpoint_map if breakpoints else None
+        blocks = self.blocks
+        run_block = self.run_lockstep if lockstep else None
+
+        limit = -1 if max_instructions is None else max_instructions
+        executed = 0
+        start_cycles = cpu.cycles
+        cycles_limit = None if max_cycles is None else start_cycles + max_cycles
+        stepping = (cpu.trace_hook is not None) or (
+            (cpu.watched_memory is self.memory) and bool(self.memory.watchpoints)
+        )
+        reason = StopReason.LIMIT
+        ignore_breakpoint = cpu.ignore_breakpoints_until_next_instruction
+        cpu.state = CPUState.RUNNING
+        pc = registers[pc_index]
+        # Watchpoint hits are appended to the list by CPU.watchpoint_hit
+        watchpoint_hits = cpu.watchpoint_hits = []
+
+        try:
+            while executed != limit:
+                pc = registers[pc_index]
+                if watchpoint_hits:
+                    break
+                if cycles_limit is not None and cpu.cycles >= cycles_limit:
+                    break
+                if breakpoint_map is not None:
+                    if (
+                        breakpoint_map[pc]
+                        and not ignore_breakpoint
+                        and cpu.breakpoint_hit(pc, self.memory)
+                    ):
+                        reason = StopReason.BREAKPOINT
+                        break
+                    ignore_breakpoint = False
+
+                if stepping:
+                    if trap_brk and self.memory.peek(pc) == 0x00:
+                        reason = StopReason.BRK
+                        break
+                    self.step()
+                    executed += 1
+                    continue
+                block = blocks.get(pc)
+                if block is None:
+                    block = self.compile_block(pc)
+                if (
+                    (block is None)
+                    or (limit != -1 and executed + block.count > limit)
+                    or (
+                        cycles_limit is not None
+                        and cpu.cycles + block.cycles > cycles_limit
+                    )
+                ):
+                    # The rest of the budget is interpreted, so blocks
+                    # aren't compiled from the middle of other blocks
+                    stepping = block is not None
+                    self.step()
+                    executed += 1
+                    continue
+                if block.brk and trap_brk:
+                    reason = StopReason.BRK
+                    break
+
+                if run_block is None:
+                    executed += block.function()
+                else:
+                    executed += run_block(block)
+            else:
+                pc = registers[pc_index]
+        except UndocumentedInstruction:
+            reason = StopReason.ILLEGAL_OPCODE
+            cpu.num_instructions_loaded += 1
+        except BaseException:
+            # The registers and cycles are written back by the block,
+            # count the instructions it ran before the exception
+            executed += self.partial_count
+            self.partial_count = 0
+            cpu.watchpoint_hits = []
+            cpu.state = CPUState.STOPPED
+            cpu.num_instructions_loaded += executed
+            cpu.num_instructions_executed += executed
+            raise
+
+        if watchpoint_hits and (reason == StopReason.LIMIT):
+            reason = StopReason.WATCHPOINT
+        cpu.watchpoint_hits = []
+        cpu.state = CPUState.STOPPED
+        cpu.ignore_breakpoints_until_next_instruction = reason == StopReason.BREAKPOINT
+        cpu.num_instructions_loaded += executed
+        cpu.num_instructions_executed += executed
+
+        return RunResult(
+            reason, pc, executed, cpu.cycles - start_cycles, watchpoint_hits
+        )
+
+    # Lockstep verification
+
+    def capture(self):
+        """
+        Capture the registers, with the flags materialized, memory and
+        the cycle counter
+
+        The memory is read with peek_range, so mapped pages are read
+        from their backing without calling I/O handlers, and a
+        snapshot is taken to restore it from, see restore.
+        """
+        self.p_register.get()
+        return (
+            list(self.cpu.register_data),
+            self.memory.peek_range(0, len(self.memory)),
+            self.cpu.cycles,
+            self.memory.snapshot(),
+        )
+
+    def restore(self, state):
+        """
+        Restore a state returned by capture
+        The memory is restored from the snapshot, so only the pages
+        that changed are copied and code listeners are notified.
+        """
+        (registers, memory, cycles, snapshot) = state
+        self.cpu.register_data[:] = registers
+        self.p_register.set(registers[self.cpu.p_index])
+        self.memory.restore(snapshot)
+        self.cpu.cycles = cycles
+
+    def run_lockstep(self, block):
+        """
+        Run a block and check it against the reference interpreter
+        The interpreter runs as many instructions as the block did,
+        which is fewer than the block length if the block modified
+        itself.
+        """
+        before = self.capture()
+        count = block.function()
+        compiled = self.capture()
+        self.restore(before)
+        for _ in range(count):
+            self.step()
+        interpreted = self.capture()
+
+        differences = self.differences(interpreted, compiled)
+        if differences:
+            raise LockstepMismatch(block.start, differences)
+        return count
+
+    def differences(self, expected, actual):
+        "Describe the differences between two captured states"
+        differences = []
+        names = [register.short_name for register in self.cpu.registers.registers]
+        for name, wanted, got in zip(names, expected[0], actual[0]):
+            if wanted != got:
+                differences.append(
+                    "{}: expected 0x{:02x}, got 0x{:02x}".format(name, wanted, got)
+                )
+        if expected[2] != actual[2]:
+            differences.append(
+                "cycles: expected {}, got {}".format(expected[2], actual[2])
+            )
+        if expected[1] == actual[1]:
+            return differences
+        for address in range(len(expected[1])):
+            if expected[1][address] != actual[1][address]:
+                differences.append(
+                    "0x{:04x}: expected 0x{:02x}, got 0x{:02x}".format(
+                        address, expected[1][address], actual[1][address]
+                    )
+                )
+        return differences
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 import json
 from json import JSONDecoder
+from typing import ClassVar
 
-from bitey.listener import Listener
 from bitey.watcher import Watcher
 
 
@@ -18,6 +18,14 @@ class Register(Watcher):
     """
     Class to represent a register
     Register's subclass the Watcher class and send updates when their value changes
+
+    The register value is stored in a slot of a register file.  When
+    the register is added to a Registers set, the slot is in the
+    Registers data list, which is shared by all the registers in the
+    set.  A standalone register has its own one-slot store.
+
+    Listeners are only called if any are registered, registers nobody
+    watches don't pay for the notification.
     """
 
     short_name: str
@@ -39,13 +47,34 @@ class Register(Watcher):
         # don't need to know about Watcher's data
         super().__init__()
 
-        self.flags_listener = Listener()
-        self.flags_listener.register_callback(self.update_register_data)
+        # The largest value the register can hold plus one
+        self.limit = 2**self.size
 
     def __str__(self):
         "Return a string representation of the register"
         return "{}: 0x{:>02X}".format(self.short_name, self.value)
 
+    def get_value(self):
+        "Get the value from the register file slot"
+        return self.store[self.index]
+
+    def set_value(self, value):
+        "Set the value in the register file slot"
+        try:
+            self.store[self.index] = value
+        except AttributeError:
+            # The generated __init__ sets the value before there is a store
+            self.attach([value], 0)
+
+    def attach(self, store, index):
+        """
+        Attach the register to a slot in a register file
+        store is the list holding the register values
+        index is the index of this register's slot in the store
+        """
+        self.store = store
+        self.index = index
+
     def name(self):
         "The name of the register"
         return self.name
@@ -61,12 +90,13 @@ class Register(Watcher):
         """
         # TODO: Maybe wrap the flag with bounds checking too, read expected
         # behavior
-        if (self.value + 1) >= (2**self.size):
-            self.value = 0x00
+        value = self.store[self.index] + 1
+        if value >= self.limit:
+            value = 0x00
             # raise RegisterOverflowException
-        else:
-            self.value += 1
-        self.update()
+        self.store[self.index] = value
+        if self.listeners:
+            self.update()
 
     def dec(self):
         """
@@ -75,36 +105,39 @@ class Register(Watcher):
         """
         # TODO: Maybe wrap the flag with bounds checking too, read expected
         # behavior
-        if (self.value - 1) < 0:
-            self.value = (2**self.size) - 1
+        value = self.store[self.index] - 1
+        if value < 0:
+            value = self.limit - 1
             # raise RegisterOverflowException
-        else:
-            self.value -= 1
-        self.update()
+        self.store[self.index] = value
+        if self.listeners:
+            self.update()
 
     def get(self):
         """
         Get the register's value
         This getter should be used as the only way to get a register's value
         """
-        return self.value
+        return self.store[self.index]
 
     def set(self, value, update=True):
         """
         Set the register's value
         This setter should be used as the only way to change the register's value
         """
-        self.value = value
-        if update:
+        self.store[self.index] = value
+        if update and self.listeners:
             self.update()
 
     def add(self, amt):
         "Add an amount to the register's value"
-        if (self.value + amt) >= (2**self.size):
+        value = self.store[self.index] + amt
+        if value >= self.limit:
             raise Exception
 
-        self.value += amt
-        self.update()
+        self.store[self.index] = value
+        if self.listeners:
+            self.update()
 
     def __eq__(self, value):
         """
@@ -113,19 +146,69 @@ class Register(Watcher):
         """
         return self.value == value
 
-    def update_register_data(self, flag):
+
+# The value is kept in the register file slot instead of the instance.
+# This is done after the dataclass decorator, so the generated __init__
+# still accepts a value argument, and sets it through the property.
+Register.value = property(Register.get_value, Register.set_value)
+
+
+class StatusRegister(Register):
+    """
+    The Processor Status Register
+
+    The flags byte is stored in this register's slot.  If the flags
+    are in lazy mode and there is a pending N and Z result, it is
+    materialized before the register is read.  Setting the register
+    replaces any pending result.
+    """
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.flags = None
+        "The Flags stored in this register, set by Flags.attach_register"
+
+    def get(self):
+        """
+        Get the register's value
+        This getter should be used as the only way to get a register's value
+        """
+        if self.flags is not None and self.flags.nz_result is not None:
+            self.flags.materialize()
+        return self.store[self.index]
+
+    def get_value(self):
+        "Get the value from the register file slot"
+        return self.get()
+
+    def set(self, value, update=True):
         """
-        Update register data when the Flags data is updated
-        This is used to keep the P register and flags in sync
+        Set the register's value
+        This setter should be used as the only way to change the register's value
         """
-        if self.short_name == "P":
-            self.set(flag.data, False)
+        if self.flags is not None:
+            self.flags.nz_result = None
+        super().set(value, update)
+
+    def set_value(self, value):
+        "Set the value in the register file slot"
+        if getattr(self, "flags", None) is not None:
+            self.flags.nz_result = None
+        super().set_value(value)
+
+
+StatusRegister.value = property(StatusRegister.get_value, StatusRegister.set_value)
 
 
 @dataclass
 class Registers:
     """
     Define a set of registers
+
+    The register values are kept in a single list, the register file.
+    Each Register is a view on one slot of the list.  Code that needs
+    fast access can index data directly using the index() of a
+    register, for example the CPU register properties.
     """
 
     registers: list[Register]
@@ -133,8 +216,11 @@ class Registers:
     def __post_init__(self):
         "Create a dictionary so we can access registers by name"
         self.regs = {}
+        self.data = []
         for r in self.registers:
             self.regs[r.short_name] = r
+            self.data.append(r.value)
+            r.attach(self.data, len(self.data) - 1)
 
     def __str__(self):
         "Return a string representation of the registers"
@@ -143,6 +229,13 @@ class Registers:
     def __getitem__(self, i):
         return self.regs[i]
 
+    def __contains__(self, i):
+        return i in self.regs
+
+    def index(self, i):
+        "Get the index of a register's slot in the data list"
+        return self.regs[i].index
+
     def set_logger(self, logger):
         self.logger = logger
         for register in self.registers:
@@ -154,6 +247,10 @@ class RegisterJSONDecoder(JSONDecoder):
     Decode a register definition in JSON format
     """
 
+    register_map: ClassVar[dict[str, Register]] = {
+        "P": StatusRegister,
+    }
+
     def decode(self, json_doc):
         if (
             ("short_name" in json_doc)
@@ -161,8 +258,11 @@ class RegisterJSONDecoder(JSONDecoder):
             and ("size" in json_doc)
             and ("value" in json_doc)
         ):
+            register_class = RegisterJSONDecoder.register_map.get(
+                json_doc["short_name"], Register
+            )
             return (
-                Register(
+                register_class(
                     json_doc["short_name"],
                     json_doc["name"],
                     json_doc["size"],
@@ -172,7 +272,10 @@ class RegisterJSONDecoder(JSONDecoder):
         elif (
             ("short_name" in json_doc) and ("name" in json_doc) and ("size" in json_doc)
         ):
-            return Register(
+            register_class = RegisterJSONDecoder.register_map.get(
+                json_doc["short_name"], Register
+            )
+            return register_class(
                 json_doc["short_name"], json_doc["name"], json_doc["size"], 0
             )
         else:
@@ -15,11 +15,9 @@ class Command:
     command called eval that will evaluate a Python expression.
 
     This is a security risk and is disabled by default.  Be careful
-    about enabling this and allowing scripted debugger sessions.  The
-    current version doesn't allow attaching eval statements to
-    breakpoints or watchpoints, but that's a potential useful feature
-    that could lead to security issues.  So the feature is disabled by
-    default.
+    about enabling this and allowing scripted debugger sessions.
+    Breakpoint conditions don't use eval, they are compiled from a
+    restricted expression language, see ConditionCompiler.
     """
 
     commands: ClassVar[dict] = {
@@ -98,6 +96,14 @@ class Command:
                 start = int(self.parsed[1], base=0)
                 memory_dump = debugger.computer.memory.memory_dump(start)
                 debugger.output_handler("memory:\n{}".format(memory_dump))
+            elif len(self.parsed) == 3:
+                start = int(self.parsed[1], base=0)
+                end = int(self.parsed[2], base=0)
+                debugger.output_handler("memory:")
+                for line in debugger.computer.memory.memory_dump_lines(
+                    range(start, end), ascii=True
+                ):
+                    debugger.output_handler(line)
             else:
                 memory_dump = debugger.computer.memory.memory_dump()
                 debugger.output_handler("memory:\n{}".format(memory_dump))
@@ -109,7 +115,7 @@ class Command:
             debugger.set_state(DebuggerState.EXIT)
         elif self.command == "help":
             debugger.output_handler(
-                "[c]: continue, [s]: step, [m,x] [start]: dump memory, [f]: dump flags, [r]: dump registers, [e]: eval Python string, [q]: quit, [h,?]: help\n"  # noqa: E501
+                "[c]: continue, [s]: step, [m,x] [start] [end]: dump memory, [f]: dump flags, [r]: dump registers, [e]: eval Python string, [q]: quit, [h,?]: help\n"  # noqa: E501
             )
         elif self.command == "null":
             return
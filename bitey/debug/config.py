@@ -21,12 +21,21 @@ class Config:
             for bp in self.breakpoints:
                 res += "    description: {}\n".format(bp["description"])
                 res += "    address: 0x{:04X}\n".format(bp["address"])
+                if "condition" in bp:
+                    res += "    condition: {}\n".format(bp["condition"])
+                if "hit_count" in bp:
+                    res += "    hit_count: {}\n".format(bp["hit_count"])
+                if bp.get("one_shot"):
+                    res += "    one_shot: true\n"
 
         if len(self.watchpoints) > 0:
             res += "  Watchpoints:\n"
-            for wp in self.breakpoints:
+            for wp in self.watchpoints:
                 res += "    description: {}\n".format(wp["description"])
                 res += "    address: 0x{:04X}\n".format(wp["address"])
+                if "end" in wp:
+                    res += "    end: 0x{:04X}\n".format(wp["end"])
+                res += "    type: {}\n".format(wp.get("type", "write"))
 
         return res
 
@@ -36,9 +45,19 @@ class Config:
         """
         for bp in self.breakpoints:
             if "address" in bp:
-                debugger.computer.cpu.set_breakpoint(bp["address"])
+                debugger.computer.cpu.set_breakpoint(
+                    bp["address"],
+                    bp.get("condition"),
+                    bp.get("hit_count", 0),
+                    bp.get("one_shot", False),
+                )
         for wp in self.watchpoints:
             if "address" in wp:
+                watch_type = wp.get("type", "write")
                 debugger.computer.cpu.set_watchpoint(
-                    wp["address"], debugger.computer.memory
+                    wp["address"],
+                    debugger.computer.memory,
+                    wp.get("end"),
+                    read=watch_type in ("read", "access"),
+                    write=watch_type in ("write", "access"),
                 )
@@ -18,11 +18,20 @@ class ConfigDecoder(JSONDecoder):
             for bp in config_data["breakpoints"]:
                 new_bp = {}
                 new_bp["description"] = bp["description"]
-                if "address" in bp:
-                    if isinstance(bp["address"], str):
-                        new_bp["address"] = int(bp["address"], 0)
-                    elif isinstance(bp["address"], int):
-                        new_bp["address"] = bp["address"]
+                # A condition expression, see ConditionCompiler, the
+                # hit to start stopping at, and whether to clear the
+                # breakpoint when it stops
+                if "condition" in bp:
+                    new_bp["condition"] = bp["condition"]
+                if "one_shot" in bp:
+                    new_bp["one_shot"] = bool(bp["one_shot"])
+                for key in ["address", "hit_count"]:
+                    if key in bp:
+                        if isinstance(bp[key], str):
+                            new_bp[key] = int(bp[key], 0)
+                        elif isinstance(bp[key], int):
+                            new_bp[key] = bp[key]
+                if "address" in new_bp:
                     breakpoints.append(new_bp)
         return breakpoints
 
@@ -32,11 +41,16 @@ class ConfigDecoder(JSONDecoder):
             for wp in config_data["watchpoints"]:
                 new_wp = {}
                 new_wp["description"] = wp["description"]
-                if "address" in wp:
-                    if isinstance(wp["address"], str):
-                        new_wp["address"] = int(wp["address"], 0)
-                    elif isinstance(wp["address"], int):
-                        new_wp["address"] = wp["address"]
+                # The type is read, write or access, for reads and writes
+                if "type" in wp:
+                    new_wp["type"] = wp["type"]
+                for key in ["address", "end"]:
+                    if key in wp:
+                        if isinstance(wp[key], str):
+                            new_wp[key] = int(wp[key], 0)
+                        elif isinstance(wp[key], int):
+                            new_wp[key] = wp[key]
+                if "address" in new_wp:
                     watchpoints.append(new_wp)
         return watchpoints
 
@@ -6,7 +6,7 @@ from bitey.debug.debugger_state import DebuggerState, DebuggerStateChange
 from bitey.logger import setup_logger
 from bitey.computer.computer import Computer
 
-from bitey.cpu.cpu import CPUBreakpoint, CPUState, CPUStateChange
+from bitey.cpu.cpu import CPUBreakpoint, CPUState, CPUStateChange, CPUWatchpoint
 
 module_logger = logging.getLogger("bitey.debug")
 
@@ -86,6 +86,12 @@ class Debugger:
                 self.state = DebuggerState.BREAKPOINT
                 self.output_handler("Breakpoint")
                 self.print_next_instruction()
+            except CPUWatchpoint as wp:
+                self.logger.debug("Watchpoint hit: {}".format(wp.hits[0]))
+                self.state = DebuggerState.BREAKPOINT
+                for hit in wp.hits:
+                    self.output_handler(str(hit))
+                self.print_next_instruction()
             except DebuggerStateChange as dsc:
                 raise dsc
             except Exception as e:
@@ -0,0 +1,181 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import logging
+import os
+from typing import ClassVar
+
+from bitey.cpu.chip_cache import default_cache_directory
+
+
+def disassemble_chunk(disassembler, data, start):
+    "Disassemble one chunk of an image in a worker process"
+    return "\n".join(disassembler.lines(data, start))
+
+
+class DisassemblyCache:
+    """
+    Cache of disassembly listings, keyed by a hash of the image
+
+    The key covers the image bytes, the start address and the
+    disassembler tables, so an unchanged image disassembled the same
+    way is found again on the next run.  Listings are stored as text
+    files in the directory, which defaults to default_cache_directory().
+    """
+
+    format_version: ClassVar[int] = 1
+    "The version of the listing format, part of every key"
+
+    def __init__(self, directory=None):
+        self.logger = logging.getLogger("bitey.disasm.batch.DisassemblyCache")
+        if directory is None:
+            directory = default_cache_directory()
+        self.directory = directory
+        "The directory listings are stored in"
+
+    def key(self, disassembler, data, start):
+        "Get the cache key of an image"
+        key_hash = hashlib.sha256()
+        key_hash.update(
+            "{} {} {} {} {}\n".format(
+                DisassemblyCache.format_version,
+                start,
+                disassembler.lengths,
+                disassembler.mnemonics,
+                disassembler.modes,
+            ).encode()
+        )
+        key_hash.update(data)
+        return key_hash.hexdigest()
+
+    def path(self, key):
+        "Get the path of the listing file for a key"
+        return os.path.join(self.directory, "disasm-{}.txt".format(key))
+
+    def read(self, key):
+        "Read a listing, returns None if it isn't cached"
+        try:
+            with open(self.path(key)) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write(self, key, listing):
+        """
+        Write a listing to the cache directory
+        The file is written under a temporary name and renamed, so
+        other processes never read a partial file.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(key)
+            temp_path = "{}.{}.tmp".format(path, os.getpid())
+            try:
+                with open(temp_path, "w") as f:
+                    f.write(listing)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except Exception as e:
+            self.logger.debug("Can't write the disassembly cache: {}".format(e))
+
+
+class BatchDisassembler:
+    """
+    Disassemble many images, or large images, on a process pool
+
+    Each image is split into chunks of about chunk_size bytes.  The
+    chunks are split at instruction boundaries of a linear sweep from
+    the start of the image, found with the length table alone, so
+    every chunk starts where the serial disassembly would and the
+    output is the same as Disassembler.disassemble.  The chunks are
+    formatted in parallel and joined in order.
+
+    If a DisassemblyCache is given, cached images aren't disassembled
+    again, and new listings are added to the cache.
+    """
+
+    chunk_size: ClassVar[int] = 0x10000
+    "The default number of bytes disassembled by each task"
+
+    def __init__(self, disassembler, cache=None, max_workers=None, chunk_size=None):
+        self.disassembler = disassembler
+        self.cache = cache
+        self.max_workers = max_workers
+        "The number of worker processes, None for the number of CPUs"
+
+        if chunk_size is None:
+            chunk_size = BatchDisassembler.chunk_size
+        self.chunk_size = chunk_size
+
+    def split_points(self, data):
+        """
+        Return the offsets to split an image at
+        Each offset is the first instruction boundary at or after a
+        multiple of chunk_size, the last one is the end of the data.
+        """
+        lengths = self.disassembler.lengths
+        end = len(data)
+        points = []
+        offset = 0
+        boundary = self.chunk_size
+        while offset < end:
+            if offset >= boundary:
+                points.append(offset)
+                boundary = offset + self.chunk_size
+            offset += lengths[data[offset]]
+        points.append(end)
+        return points
+
+    def disassemble_images(self, images):
+        """
+        Disassemble a list of images, given as (data, start) tuples
+        Returns the listings in the same order as the images.
+        """
+        listings = [None] * len(images)
+        keys = [None] * len(images)
+        tasks = []
+        for index, (data, start) in enumerate(images):
+            if self.cache is not None:
+                keys[index] = self.cache.key(self.disassembler, data, start)
+                listings[index] = self.cache.read(keys[index])
+                if listings[index] is not None:
+                    continue
+            first = 0
+            for last in self.split_points(data):
+                tasks.append((index, data[first:last], start + first))
+                first = last
+
+        if tasks:
+            with ProcessPoolExecutor(self.max_workers) as executor:
+                chunks = executor.map(
+                    disassemble_chunk,
+                    [self.disassembler] * len(tasks),
+                    [data for (_, data, _) in tasks],
+                    [start for (_, _, start) in tasks],
+                )
+                parts = {}
+                for (index, _, _), chunk in zip(tasks, chunks):
+                    parts.setdefault(index, []).append(chunk)
+
+            for index, chunks in parts.items():
+                listings[index] = "\n".join(c for c in chunks if c != "")
+                if self.cache is not None:
+                    self.cache.write(keys[index], listings[index])
+
+        return listings
+
+    def disassemble_image(self, data, start=0):
+        "Disassemble one image, split across the process pool"
+        return self.disassemble_images([(data, start)])[0]
+
+    def disassemble_files(self, filenames, start=0):
+        """
+        Disassemble a list of files, each loaded at the start address
+        Returns the listings in the same order as the files.
+        """
+        images = []
+        for filename in filenames:
+            with open(filename, "rb") as f:
+                images.append((f.read(), start))
+        return self.disassemble_images(images)
@@ -0,0 +1,291 @@
+from dataclasses import dataclass, field
+from typing import ClassVar
+
+
+@dataclass(eq=False)
+class BasicBlock:
+    """
+    A basic block found by the recursive disassembler
+
+    A block is a straight-line run of instructions that is only
+    entered at its first instruction.  It ends at a branch, jump,
+    subroutine call or return, or before an instruction that is the
+    target of other code.
+    """
+
+    start: int
+    "The address of the first instruction"
+
+    end: int
+    "The address after the last byte of the block"
+
+    instructions: list[int] = field(default_factory=list)
+    "The addresses of the instructions in the block"
+
+    successors: list[int] = field(default_factory=list)
+    "The start addresses of the blocks control can flow to from this block"
+
+    calls: list[int] = field(default_factory=list)
+    "The addresses of the subroutines called by the block"
+
+
+@dataclass
+class ControlFlowGraph:
+    """
+    The basic-block graph of a program, see RecursiveDisassembler
+
+    The graph can be used as a precomputed code map, for example with
+    BlockCompiler.precompile to compile every block ahead of time.
+    """
+
+    start: int
+    "The address of the first byte of the analyzed data"
+
+    size: int
+    "The size of the analyzed data"
+
+    blocks: dict[int, BasicBlock] = field(default_factory=dict)
+    "The basic blocks, by start address"
+
+    labels: dict[int, str] = field(default_factory=dict)
+    "The generated labels, by address"
+
+    instructions: dict[int, tuple] = field(default_factory=dict)
+    """
+    The reachable instructions by address, as tuples of the opcode,
+    length and operand, see Disassembler.decode
+    """
+
+    def __post_init__(self):
+        self.code_map = bytearray(self.size)
+        "One byte per byte of data, set if the byte is part of an instruction"
+
+    def is_code(self, address):
+        "Return True if an address holds part of a reachable instruction"
+        offset = address - self.start
+        return 0 <= offset < self.size and self.code_map[offset] != 0
+
+    def block_at(self, address):
+        "Return the block containing an address, or None"
+        for block in self.blocks.values():
+            if block.start <= address < block.end:
+                return block
+        return None
+
+    def coverage(self):
+        "Return a tuple of the number of code bytes and data bytes"
+        code = self.size - self.code_map.count(0)
+        return (code, self.size - code)
+
+
+class RecursiveDisassembler:
+    """
+    Recursive-descent disassembler
+
+    Code is found by following control flow from a set of entry
+    points, by default the reset, NMI and IRQ vectors.  Branches,
+    jumps and subroutine calls are followed, anything that isn't
+    reached is treated as data.  This keeps data from being read as
+    code, which a linear sweep like Disassembler.lines can't do.
+
+    Indirect jumps can't be followed without running the code, their
+    targets need to be given as extra entry points.
+    """
+
+    vectors: ClassVar[dict[int, str]] = {
+        0xFFFA: "nmi",
+        0xFFFC: "reset",
+        0xFFFE: "irq",
+    }
+    "The interrupt vector addresses and the labels of their handlers"
+
+    jumps: ClassVar[set[str]] = {"JMP"}
+    "Mnemonics that jump to their operand and don't continue"
+
+    calls: ClassVar[set[str]] = {"JSR"}
+    "Mnemonics that call their operand and continue after it returns"
+
+    returns: ClassVar[set[str]] = {"BRK", "RTI", "RTS"}
+    "Mnemonics that don't continue to the next instruction"
+
+    data_bytes_per_line: ClassVar[int] = 3
+    "The number of data bytes shown on each line of a listing"
+
+    def __init__(self, disassembler):
+        "Create a recursive disassembler using a Disassembler's tables"
+        self.disassembler = disassembler
+
+    def entry_points(self, data, start=0):
+        """
+        Return the handler addresses in the interrupt vectors, by label
+        Vectors outside the data are skipped.
+        """
+        entries = {}
+        for vector, label in RecursiveDisassembler.vectors.items():
+            offset = vector - start
+            if 0 <= offset and offset + 2 <= len(data):
+                entries.setdefault(data[offset] | (data[offset + 1] << 8), label)
+        return entries
+
+    def analyze(self, data, start=0, entry_points=None):
+        """
+        Build the control flow graph of a bytes-like object
+        start is the address of the first byte of data.  entry_points
+        is an iterable of addresses to start from, the interrupt
+        vectors are used if it's None.  If there are neither, analysis
+        starts at the first byte.
+        """
+        data = memoryview(data)
+        graph = ControlFlowGraph(start, len(data))
+        if entry_points is None:
+            entry_points = self.entry_points(data, start)
+            if not entry_points:
+                entry_points = [start]
+        for address in entry_points:
+            graph.labels[address] = "loc_{:04x}".format(address)
+        if isinstance(entry_points, dict):
+            graph.labels.update(entry_points)
+
+        leaders = self.trace(graph, data, entry_points)
+        self.build_blocks(graph, leaders)
+        return graph
+
+    def trace(self, graph, data, entry_points):
+        """
+        Decode every instruction reachable from the entry points
+        The instructions and labels are added to the graph.  Returns
+        the set of addresses that start a basic block.
+        """
+        decode = self.disassembler.decode
+        mnemonics = self.disassembler.mnemonics
+        modes = self.disassembler.modes
+        start = graph.start
+        instructions = graph.instructions
+        leaders = set(entry_points)
+        work = list(entry_points)
+
+        while work:
+            address = work.pop()
+            while address not in instructions:
+                offset = address - start
+                if not (0 <= offset < len(data)):
+                    break
+                decoded = decode(data, offset, start)
+                if decoded is None or modes[decoded[0]] is None:
+                    break
+                (opcode, length, operand) = decoded
+                instructions[address] = decoded
+                graph.code_map[offset : offset + length] = b"\x01" * length
+                address += length
+
+                mnemonic = mnemonics[opcode]
+                if mnemonic in RecursiveDisassembler.returns:
+                    break
+                if mnemonic in RecursiveDisassembler.calls:
+                    self.add_target(graph, leaders, work, operand, "sub_{:04x}")
+                    leaders.add(address)
+                elif modes[opcode] == "relative":
+                    self.add_target(graph, leaders, work, operand, "loc_{:04x}")
+                    leaders.add(address)
+                elif mnemonic in RecursiveDisassembler.jumps:
+                    if modes[opcode] == "absolute":
+                        self.add_target(graph, leaders, work, operand, "loc_{:04x}")
+                    break
+
+        return leaders
+
+    def add_target(self, graph, leaders, work, address, label):
+        "Add the target of a branch, jump or call to the work list"
+        leaders.add(address)
+        if address not in graph.labels:
+            graph.labels[address] = label.format(address)
+        work.append(address)
+
+    def build_blocks(self, graph, leaders):
+        "Split the decoded instructions into basic blocks"
+        mnemonics = self.disassembler.mnemonics
+        modes = self.disassembler.modes
+        instructions = graph.instructions
+        for leader in sorted(leaders):
+            if leader not in instructions:
+                continue
+            block = BasicBlock(leader, leader)
+            address = leader
+            while True:
+                (opcode, length, operand) = instructions[address]
+                block.instructions.append(address)
+                address += length
+                block.end = address
+
+                mnemonic = mnemonics[opcode]
+                if mnemonic in RecursiveDisassembler.returns:
+                    break
+                if mnemonic in RecursiveDisassembler.calls:
+                    block.calls.append(operand)
+                    block.successors.append(address)
+                    break
+                if modes[opcode] == "relative":
+                    block.successors.extend([operand, address])
+                    break
+                if mnemonic in RecursiveDisassembler.jumps:
+                    if modes[opcode] == "absolute":
+                        block.successors.append(operand)
+                    break
+                if address in leaders or address not in instructions:
+                    block.successors.append(address)
+                    break
+
+            block.successors = [a for a in block.successors if a in instructions]
+            graph.blocks[leader] = block
+
+    def lines(self, graph, data):
+        """
+        Generate a listing of analyzed data, yielding one line at a time
+        Code is shown with labels on branch, jump and call targets,
+        bytes that aren't code are shown as .byte lines.
+        """
+        data = memoryview(data)
+        disassembler = self.disassembler
+        start = graph.start
+        offset = 0
+        while offset < graph.size:
+            address = start + offset
+            label = graph.labels.get(address)
+            if label is not None:
+                yield "{}:".format(label)
+
+            decoded = graph.instructions.get(address)
+            if decoded is None:
+                end = offset + 1
+                while (
+                    end < graph.size
+                    and end - offset < RecursiveDisassembler.data_bytes_per_line
+                    and not graph.code_map[end]
+                    and (start + end) not in graph.labels
+                ):
+                    end += 1
+                yield "{:04x}  {:<8}  .byte  {}".format(
+                    address,
+                    data[offset:end].hex(" "),
+                    ",".join("${:02x}".format(b) for b in data[offset:end]),
+                )
+                offset = end
+                continue
+
+            (opcode, length, operand) = decoded
+            line = disassembler.templates[opcode].format(
+                address, data[offset : offset + length].hex(" "), operand
+            )
+            target = graph.labels.get(operand)
+            if target is not None and disassembler.modes[opcode] in (
+                "absolute",
+                "relative",
+            ):
+                line = "{:04x}  {:<8}  {}  {}".format(
+                    address,
+                    data[offset : offset + length].hex(" "),
+                    disassembler.mnemonics[opcode],
+                    target,
+                )
+            yield line
+            offset += length
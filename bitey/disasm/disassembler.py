@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+import json
+from typing import ClassVar
+
+from bitey.cpu.addressing_mode_factory import AddressingModeFactory
+
+
+@dataclass
+class Disassembler:
+    """
+    A table-driven 6502 disassembler
+
+    Instructions are decoded with tables indexed by opcode, built from
+    a chip JSON file with build_from_json.  The disassembler works on
+    any bytes-like object and never touches a CPU or Memory, so it
+    doesn't change the program counter, instruction counters or
+    breakpoints of a running Computer.
+
+    The lines method is a generator, a large dump is disassembled one
+    line at a time in constant memory.  Lines have the same layout as
+    Computer.disassemble: the address, the instruction bytes, the
+    mnemonic and the operand.  Invalid opcodes are shown as INV.
+    """
+
+    operand_formats: ClassVar[dict[str, str]] = {
+        "absolute": "${0:04x}",
+        "absolute_indirect": "(${0:04x})",
+        "absolute_x": "${0:04x},X",
+        "absolute_y": "${0:04x},Y",
+        "accumulator": "",
+        "immediate": "#${0:02x}",
+        "implied": "",
+        "indirect_x": "(${0:02x},X)",
+        "indirect_y": "(${0:02x}),Y",
+        "relative": "${0:04x}",
+        "zeropage": "${0:02x}",
+        "zeropage_x": "${0:02x},X",
+        "zeropage_y": "${0:02x},Y",
+    }
+    """
+    The operand format of each addressing mode
+    Relative operands are shown as the branch target address.
+    """
+
+    invalid_mnemonic: ClassVar[str] = "INV"
+    "The mnemonic shown for invalid and undocumented opcodes"
+
+    lengths: list[int]
+    "The instruction length in bytes of each opcode, one for invalid opcodes"
+
+    mnemonics: list[str]
+    "The mnemonic of each opcode"
+
+    modes: list[str]
+    "The addressing mode name of each opcode, None for invalid opcodes"
+
+    def __post_init__(self):
+        # The line format of each opcode, formatted with the address,
+        # the instruction bytes and the operand
+        self.templates = []
+        for mnemonic, mode in zip(self.mnemonics, self.modes):
+            template = "{0:04x}  {1:<8}  " + mnemonic
+            operand_format = Disassembler.operand_formats.get(mode, "")
+            if operand_format != "":
+                template += "  " + operand_format.replace("{0", "{2")
+            self.templates.append(template)
+
+    @classmethod
+    def build_from_json(cls, json_data):
+        "Build the disassembler tables from a chip JSON document"
+        return cls.build_from_parsed_json(json.loads(json_data))
+
+    @classmethod
+    def build_from_parsed_json(cls, parsed_json):
+        """
+        Build the disassembler tables from a parsed chip JSON document
+        Instruction lengths are taken from the addressing modes, so
+        instructions are decoded the same way the CPU decodes them.
+        """
+        lengths = [1] * 256
+        mnemonics = [Disassembler.invalid_mnemonic] * 256
+        modes = [None] * 256
+        for instruction in parsed_json["instructions"]:
+            for opcode in instruction["opcodes"]:
+                value = opcode["opcode"]
+                mode = opcode["addressing_mode"]
+                lengths[value] = AddressingModeFactory.get_mode_from_str(mode).bytes
+                mnemonics[value] = instruction["name"]
+                modes[value] = mode
+        return cls(lengths, mnemonics, modes)
+
+    def decode(self, data, offset, start=0):
+        """
+        Decode the instruction at an offset in a bytes-like object
+        start is the address of the first byte of data.  Returns a
+        tuple of the opcode, the instruction length and the operand,
+        or None if the instruction is cut off by the end of the data.
+        The operand is None for one-byte instructions, and the target
+        address for relative branches.
+        """
+        opcode = data[offset]
+        length = self.lengths[opcode]
+        if offset + length > len(data):
+            return None
+        operand = None
+        if length == 2:
+            operand = data[offset + 1]
+            if self.modes[opcode] == "relative":
+                if operand & 0x80:
+                    operand -= 0x100
+                operand = (start + offset + 2 + operand) & 0xFFFF
+        elif length == 3:
+            operand = data[offset + 1] | (data[offset + 2] << 8)
+        return (opcode, length, operand)
+
+    def lines(self, data, start=0):
+        """
+        Disassemble a bytes-like object, yielding one line per instruction
+        start is the address of the first byte of data.  An instruction
+        cut off by the end of the data is shown as INV.
+        """
+        data = memoryview(data)
+        lengths = self.lengths
+        modes = self.modes
+        templates = self.templates
+        end = len(data)
+        offset = 0
+
+        # This is decode inlined, calling decode for every instruction
+        # makes large dumps about 50% slower
+        while offset < end:
+            opcode = data[offset]
+            length = lengths[opcode]
+            address = start + offset
+            if offset + length > end:
+                yield "{:04x}  {:<8}  {}".format(
+                    address, data[offset:end].hex(" "), Disassembler.invalid_mnemonic
+                )
+                return
+
+            operand = None
+            if length == 2:
+                operand = data[offset + 1]
+                if modes[opcode] == "relative":
+                    if operand & 0x80:
+                        operand -= 0x100
+                    operand = (address + 2 + operand) & 0xFFFF
+            elif length == 3:
+                operand = data[offset + 1] | (data[offset + 2] << 8)
+
+            yield templates[opcode].format(
+                address, data[offset : offset + length].hex(" "), operand
+            )
+            offset += length
+
+    def disassemble(self, data, start=0):
+        "Disassemble a bytes-like object and return the lines as one string"
+        return "\n".join(self.lines(data, start))
@@ -0,0 +1,621 @@
+from dataclasses import dataclass, field, replace
+
+from bitey.memory.memory import Memory, MemoryOutOfRange
+
+
+class MemoryMapError(Exception):
+    "Attempt to map a range that isn't inside the memory or isn't page aligned"
+
+
+class ROMWriteError(Exception):
+    """
+    ROM write exception
+    Raised on a write to ROM if the memory traps ROM writes
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+
+@dataclass
+class ReadOnlyPage:
+    """
+    The write page table entry for a page of ROM
+    Writes to ROM are ignored, or raise ROMWriteError if the memory
+    traps ROM writes.
+    """
+
+    base: int
+    "The address of the start of the page"
+
+    memory: "MappedMemory" = field(repr=False)
+    "The memory the page belongs to"
+
+    def __setitem__(self, offset, value):
+        if self.memory.trap_rom_writes:
+            if isinstance(offset, slice):
+                offset = offset.start
+            raise ROMWriteError(self.base + offset)
+
+
+@dataclass
+class IOPage:
+    """
+    A page of memory with memory-mapped I/O handlers
+
+    The page table entry for a page with handlers.  Reads and writes
+    to offsets with a handler call the handler with the address,
+    other offsets go to the page's RAM or ROM.
+    """
+
+    base: int
+    "The address of the start of the page"
+
+    read_view: memoryview
+    "The RAM or ROM the page reads from when there is no read handler"
+
+    write_view: object
+    "The RAM or ROM the page writes to when there is no write handler"
+
+    read_handlers: list = field(default_factory=lambda: [None] * Memory.page_size)
+    "The read handler for each offset in the page, or None"
+
+    write_handlers: list = field(default_factory=lambda: [None] * Memory.page_size)
+    "The write handler for each offset in the page, or None"
+
+    def __getitem__(self, offset):
+        handler = self.read_handlers[offset]
+        if handler is None:
+            return self.read_view[offset]
+        return handler(self.base + offset)
+
+    def __setitem__(self, offset, value):
+        handler = self.write_handlers[offset]
+        if handler is None:
+            self.write_view[offset] = value
+        else:
+            handler(self.base + offset, value)
+
+    def is_empty(self):
+        "Return True if no offset in the page has a handler"
+        return not any(self.read_handlers) and not any(self.write_handlers)
+
+    def read_range(self, start, end):
+        "Read the offsets from start to end, calling any read handlers"
+        return bytearray(self[offset] for offset in range(start, end))
+
+
+@dataclass
+class BankedRegion:
+    """
+    A page aligned range of memory that is switched between banks
+
+    Each bank is a buffer the size of the region.  The page views of
+    every bank are built when the region is mapped, so switching banks
+    only repoints page table entries and no bytes are copied.  See
+    MappedMemory.map_banks
+
+    The snapshot state of the banks that aren't selected is kept here,
+    the selected bank uses the page flags and snapshot pages of the
+    memory like any other pages.
+    """
+
+    start: int
+    "The address of the start of the region"
+
+    end: int
+    "The address of the end of the region, the region doesn't include it"
+
+    bank_views: list = field(repr=False)
+    "The page views of each bank"
+
+    readonly: bool = False
+    "True if the banks are ROM"
+
+    bank: int = 0
+    "The selected bank"
+
+    saved_pages: list = field(default_factory=list, repr=False)
+    "The page contents of each bank saved by the last snapshot or restore"
+
+    clean_pages: list = field(default_factory=list, repr=False)
+    "The clean_page flags of the pages of each bank, see select_bank"
+
+
+class BankedSnapshot(tuple):
+    """
+    A snapshot of a MappedMemory with banked regions
+
+    It's a tuple of the page contents like any memory snapshot, and
+    also records the bank selected in each BankedRegion and the pages
+    of the banks that aren't selected, see MappedMemory.snapshot
+    """
+
+    banks = ()
+    "The bank selected in each BankedRegion when the snapshot was taken"
+
+    bank_pages = ()
+    """
+    The pages of each bank of each BankedRegion, None for the selected
+    bank whose pages are in the tuple
+    """
+
+
+@dataclass
+class MappedMemory(Memory):
+    """
+    Memory with a page table and memory-mapped I/O
+
+    Every page of the address space has an entry in a read page table
+    and a write page table.  RAM and ROM pages read through a
+    memoryview of the memory bytearray, so an access is two list and
+    view indexes no matter how many devices are mapped.  Writes to
+    ROM pages are ignored, or raise ROMWriteError if trap_rom_writes
+    is True.  Only pages with I/O handlers, see add_io_handler, go
+    through a Python callback.
+
+    An I/O handler only covers the addresses it is added for, the
+    rest of its page is still RAM or ROM.
+
+    Pages are backed by the memory bytearray unless they are mapped
+    to another buffer with map_buffer.  The memory bytearray doesn't
+    hold the contents of those pages.
+    """
+
+    def __init__(self, size=0x10000, trap_rom_writes=False):
+        "Initialize the memory to size bytes of RAM"
+        super().__init__(size)
+
+        self.trap_rom_writes = trap_rom_writes
+        "Raise ROMWriteError on writes to ROM instead of ignoring them"
+
+        num_pages = (size + Memory.page_size - 1) // Memory.page_size
+        view = memoryview(self.memory)
+        self.ram_views = [
+            view[page * Memory.page_size : (page + 1) * Memory.page_size]
+            for page in range(num_pages)
+        ]
+        "The part of the memory bytearray each page is backed by by default"
+
+        self.page_views = list(self.ram_views)
+        "The RAM or ROM backing each page"
+
+        self.rom_pages = bytearray(num_pages)
+        "One byte per page, set if the page is ROM"
+
+        self.io_pages = {}
+        "The IOPage of each page with I/O handlers"
+
+        self.read_pages = list(self.page_views)
+        "The read page table"
+
+        self.write_pages = list(self.page_views)
+        "The write page table"
+
+        self.banked_regions = []
+        "The BankedRegions mapped with map_banks"
+
+    def reset(self):
+        "Reset the RAM and ROM to zero, the memory map is kept"
+        self.memory[:] = bytes(len(self.memory))
+        self.code_changed(0, len(self.memory))
+        self.page_flags[:] = bytes(len(self.page_flags))
+        self.update_watch_pages()
+
+    def get_page(self, page):
+        "Get the contents of a page"
+        return bytes(self.page_views[page])
+
+    def set_page(self, page, data):
+        "Set the contents of a page, pages backed by read-only buffers are kept"
+        view = self.page_views[page]
+        if not view.readonly:
+            view[:] = data
+
+    def clone(self):
+        """
+        Return a copy of the memory and its memory map
+
+        RAM is copied and pages backed by read-only buffers share the
+        buffer.  Pages backed by writable buffers and I/O handlers
+        belong to devices and can't be cloned, MemoryMapError is raised
+        if there are any.  See Memory.clone
+        """
+        if self.io_pages:
+            raise MemoryMapError("Memory with I/O handlers can't be cloned")
+        clone = MappedMemory(len(self.memory), self.trap_rom_writes)
+        clone.memory[:] = self.memory
+        clone.rom_pages[:] = self.rom_pages
+        for page, view in enumerate(self.page_views):
+            if view is not self.ram_views[page]:
+                if not view.readonly:
+                    raise MemoryMapError(
+                        "Page 0x{:02x} is backed by a writable buffer".format(page)
+                    )
+                clone.page_views[page] = view
+            clone.update_page(page)
+        clone.banked_regions = [
+            replace(
+                region,
+                saved_pages=[list(pages) for pages in region.saved_pages],
+                clean_pages=[bytearray(clean) for clean in region.clean_pages],
+            )
+            for region in self.banked_regions
+        ]
+        self.copy_page_state(clone)
+        return clone
+
+    def pages(self, start, end):
+        """
+        Return the pages in a range
+        The range includes the start location but not the end location.
+        """
+        if (start < 0) or (end > len(self.memory)) or (start >= end):
+            raise MemoryMapError("Invalid range 0x{:04x}-0x{:04x}".format(start, end))
+        return range(start // Memory.page_size, (end - 1) // Memory.page_size + 1)
+
+    def update_page(self, page):
+        """
+        Rebuild the page table entries for a page
+        The page is dirty after this, its contents may have changed.
+        """
+        self.page_flags[page] &= ~Memory.clean_page
+        read_view = self.page_views[page]
+        write_view = read_view
+        if self.rom_pages[page]:
+            write_view = ReadOnlyPage(page * Memory.page_size, self)
+        io_page = self.io_pages.get(page)
+        if io_page is not None:
+            io_page.read_view = read_view
+            io_page.write_view = write_view
+            self.read_pages[page] = io_page
+            self.write_pages[page] = io_page
+        else:
+            self.read_pages[page] = read_view
+            self.write_pages[page] = write_view
+
+    def aligned_pages(self, start, end):
+        "Return the pages in a range that has to start and end on a page boundary"
+        if (start % Memory.page_size != 0) or (end % Memory.page_size != 0):
+            raise MemoryMapError(
+                "Range 0x{:04x}-0x{:04x} isn't page aligned".format(start, end)
+            )
+        return self.pages(start, end)
+
+    def map_rom(self, start, end, readonly=True):
+        """
+        Make a page aligned range ROM, or RAM again if readonly is False
+        The range includes the start location but not the end location.
+        """
+        pages = self.aligned_pages(start, end)
+        for page in pages:
+            if not readonly and self.page_views[page].readonly:
+                raise MemoryMapError(
+                    "Page 0x{:02x} is backed by a read-only buffer".format(page)
+                )
+        for page in pages:
+            self.rom_pages[page] = 1 if readonly else 0
+            self.update_page(page)
+
+    def map_buffer(self, start, buffer, readonly=True):
+        """
+        Back the pages starting at start with a buffer, without copying it
+
+        The buffer can be any object supporting the buffer protocol,
+        such as a bytearray or an mmap, and its length has to be a
+        multiple of the page size.  If readonly is True the pages are
+        ROM.  Read-only buffers such as bytes can only be mapped as
+        ROM.
+        """
+        view = memoryview(buffer).cast("B")
+        pages = self.aligned_pages(start, start + len(view))
+        if view.readonly and not readonly:
+            raise MemoryMapError("A read-only buffer can only be mapped as ROM")
+        for index, page in enumerate(pages):
+            self.page_views[page] = view[
+                index * Memory.page_size : (index + 1) * Memory.page_size
+            ]
+            self.rom_pages[page] = 1 if readonly else 0
+            self.update_page(page)
+        self.code_changed(start, start + len(view))
+
+    def map_banks(self, start, banks, readonly=False, register=None):
+        """
+        Map a list of banks to the pages starting at start
+
+        Every bank is a buffer supporting the buffer protocol, the
+        banks have to be the same size and a multiple of the page size.
+        Bank 0 is selected.  If register is an address, writes to it
+        select the bank with the value written, modulo the number of
+        banks, like a bank register on a board.  Returns the
+        BankedRegion, see select_bank.
+        """
+        views = [memoryview(bank).cast("B") for bank in banks]
+        if not views or any(len(view) != len(views[0]) for view in views):
+            raise MemoryMapError("Banks have to be the same size")
+        if not readonly and any(view.readonly for view in views):
+            raise MemoryMapError("A read-only buffer can only be mapped as ROM")
+        end = start + len(views[0])
+        self.aligned_pages(start, end)
+        bank_views = [
+            [
+                view[offset : offset + Memory.page_size]
+                for offset in range(0, len(view), Memory.page_size)
+            ]
+            for view in views
+        ]
+        num_pages = len(bank_views[0])
+        region = BankedRegion(
+            start,
+            end,
+            bank_views,
+            readonly,
+            saved_pages=[[None] * num_pages for view in views],
+            clean_pages=[bytearray(num_pages) for view in views],
+        )
+        self.banked_regions.append(region)
+        for index, page in enumerate(self.pages(start, end)):
+            self.page_views[page] = bank_views[0][index]
+            self.rom_pages[page] = 1 if readonly else 0
+            self.update_page(page)
+        self.code_changed(start, end)
+        if register is not None:
+            self.add_io_handler(
+                register,
+                register + 1,
+                write_handler=lambda address, value: self.select_bank(
+                    region, value % len(bank_views)
+                ),
+            )
+        return region
+
+    def select_bank(self, region, bank):
+        """
+        Switch a BankedRegion to another bank
+
+        The page table entries are repointed to the bank's page views
+        with slice assignments, no memory is copied.  The write entries
+        of ROM pages don't depend on the bank and are kept.  Only pages
+        with I/O handlers have their entries rebuilt.
+
+        The dirty page tracking of the old bank is saved in the region
+        and the new bank's is loaded, so snapshots only copy the pages
+        of each bank written to since the last one.
+        """
+        if (bank < 0) or (bank >= len(region.bank_views)):
+            raise MemoryMapError("Invalid bank {}".format(bank))
+        views = region.bank_views[bank]
+        (first, last) = (region.start >> 8, region.end >> 8)
+        page_flags = self.page_flags
+        clean_page = Memory.clean_page
+        region.clean_pages[region.bank][:] = bytes(
+            flags & clean_page for flags in page_flags[first:last]
+        )
+        region.saved_pages[region.bank] = self.snapshot_pages[first:last]
+
+        self.page_views[first:last] = views
+        self.read_pages[first:last] = views
+        if not region.readonly:
+            self.write_pages[first:last] = views
+        for page in self.io_pages:
+            if first <= page < last:
+                self.update_page(page)
+
+        code = 0
+        for index, page in enumerate(range(first, last)):
+            flags = page_flags[page]
+            code |= flags
+            page_flags[page] = (flags & ~clean_page) | region.clean_pages[bank][index]
+        self.snapshot_pages[first:last] = region.saved_pages[bank]
+        region.bank = bank
+        if code & Memory.code_page:
+            self.code_changed(region.start, region.end)
+
+    def snapshot(self):
+        """
+        Return a snapshot of the memory
+
+        With banked regions the snapshot is a BankedSnapshot, which
+        also records the selected banks and the pages of the other
+        banks.  Like other pages, bank pages that weren't written to
+        since the last snapshot or restore are shared with it.  Writes
+        to the bank buffers that don't go through the memory aren't
+        tracked.  See Memory.snapshot
+        """
+        pages = super().snapshot()
+        if not self.banked_regions:
+            return pages
+        snapshot = BankedSnapshot(pages)
+        snapshot.banks = tuple(region.bank for region in self.banked_regions)
+        snapshot.bank_pages = tuple(
+            self.snapshot_banks(region) for region in self.banked_regions
+        )
+        return snapshot
+
+    def snapshot_banks(self, region):
+        "Save the dirty pages of the banks of a region that aren't selected"
+        bank_pages = []
+        for bank, views in enumerate(region.bank_views):
+            if bank == region.bank:
+                bank_pages.append(None)
+                continue
+            saved = region.saved_pages[bank]
+            clean = region.clean_pages[bank]
+            for index, view in enumerate(views):
+                if not clean[index]:
+                    saved[index] = bytes(view)
+                    clean[index] = Memory.clean_page
+            bank_pages.append(tuple(saved))
+        return tuple(bank_pages)
+
+    def restore(self, snapshot):
+        """
+        Restore the memory from a snapshot
+
+        The banks selected when the snapshot was taken are selected
+        again before the pages are copied, so the saved pages are
+        copied back into the bank they were saved from.  The pages of
+        the other banks are restored too.  See Memory.restore
+        """
+        banks = getattr(snapshot, "banks", ())
+        for region, bank in zip(self.banked_regions, banks):
+            if region.bank != bank:
+                self.select_bank(region, bank)
+        super().restore(snapshot)
+        bank_pages = getattr(snapshot, "bank_pages", ())
+        for region, pages in zip(self.banked_regions, bank_pages):
+            self.restore_banks(region, pages)
+
+    def restore_banks(self, region, bank_pages):
+        "Restore the pages of the banks of a region that aren't selected"
+        for bank, pages in enumerate(bank_pages):
+            if (bank == region.bank) or (pages is None):
+                continue
+            saved = region.saved_pages[bank]
+            clean = region.clean_pages[bank]
+            views = region.bank_views[bank]
+            for index, data in enumerate(pages):
+                if clean[index] and (saved[index] is data):
+                    continue
+                if not views[index].readonly:
+                    views[index][:] = data
+                saved[index] = data
+                clean[index] = Memory.clean_page
+
+    def unmap_buffer(self, start, end):
+        """
+        Back a page aligned range with the memory bytearray again
+        The pages are RAM after this.
+        """
+        for page in self.aligned_pages(start, end):
+            self.page_views[page] = self.ram_views[page]
+            self.rom_pages[page] = 0
+            self.update_page(page)
+        self.code_changed(start, end)
+
+    def add_io_handler(self, start, end, read_handler=None, write_handler=None):
+        """
+        Map I/O handlers to a range of addresses
+
+        read_handler is called with the address and returns the byte
+        read.  write_handler is called with the address and the value.
+        If either is None, those accesses go to the RAM or ROM
+        underneath.  The range includes the start location but not the
+        end location.
+        """
+        for page in self.pages(start, end):
+            io_page = self.io_pages.get(page)
+            if io_page is None:
+                io_page = IOPage(page * Memory.page_size, None, None)
+                self.io_pages[page] = io_page
+            first = max(start, io_page.base) - io_page.base
+            last = min(end, io_page.base + Memory.page_size) - io_page.base
+            for offset in range(first, last):
+                io_page.read_handlers[offset] = read_handler
+                io_page.write_handlers[offset] = write_handler
+            self.update_page(page)
+
+    def remove_io_handler(self, start, end):
+        """
+        Remove the I/O handlers from a range of addresses
+        Pages without any handlers left are plain RAM or ROM again.
+        """
+        self.add_io_handler(start, end)
+        for page in self.pages(start, end):
+            if self.io_pages[page].is_empty():
+                del self.io_pages[page]
+                self.update_page(page)
+
+    def read(self, address):
+        """
+        Read a byte from memory
+        address is the location in memory to read from
+        """
+        if (address >= 0) and (address < len(self.memory)):
+            return self.read_pages[address >> 8][address & 0xFF]
+        else:
+            raise MemoryOutOfRange
+
+    def read_range(self, start, end):
+        """
+        Return a range of bytes.
+        The start and end match Python slice meaning.
+        Read handlers are called for any I/O addresses in the range.
+        Raise an exception if the memory access is out of range.
+        """
+        if (start < 0) or (end > len(self.memory)):
+            raise MemoryOutOfRange
+
+        result = bytearray()
+        while start < end:
+            page = start >> 8
+            page_end = min((page + 1) << 8, end)
+            (first, last) = (start & 0xFF, page_end - (page << 8))
+            entry = self.read_pages[page]
+            if isinstance(entry, IOPage):
+                result += entry.read_range(first, last)
+            else:
+                result += entry[first:last]
+            start = page_end
+        return result
+
+    def write(self, address, value):
+        """
+        Write a value in memory
+        address is the location to write to
+        value is the value to write
+        """
+        if (address >= 0) and (address < len(self.memory)):
+            page = address >> 8
+            if self.page_flags[page]:
+                self.flagged_write(address, value)
+            else:
+                self.write_pages[page][address & 0xFF] = value
+        else:
+            raise MemoryOutOfRange
+
+    def peek(self, address):
+        """
+        Read a byte from memory without any side effects
+        I/O handlers aren't called, the RAM or ROM under them is read.
+        """
+        return self.page_views[address >> 8][address & 0xFF]
+
+    def peek_range(self, start, end):
+        """
+        Return a copy of a range of bytes without any side effects
+        I/O handlers aren't called, the RAM or ROM under them is read.
+        """
+        result = bytearray()
+        while start < end:
+            page = start >> 8
+            page_end = min((page + 1) << 8, end)
+            result += self.page_views[page][start & 0xFF : page_end - (page << 8)]
+            start = page_end
+        return bytes(result)
+
+    def write_byte(self, address, value):
+        "Store a byte at an address that is known to be in range"
+        self.write_pages[address >> 8][address & 0xFF] = value
+
+    def store_range(self, start, end, data):
+        """
+        Store bytes in a range that is known to be inside the memory
+        RAM pages are written with one slice assignment per page,
+        ROM pages are skipped or trapped and I/O pages call their
+        write handlers.
+        """
+        data = memoryview(bytes(data))
+        address = start
+        while address < end:
+            page = address >> 8
+            page_end = min((page + 1) << 8, end)
+            (first, last) = (address & 0xFF, page_end - (page << 8))
+            entry = self.write_pages[page]
+            chunk = data[address - start : page_end - start]
+            if isinstance(entry, IOPage):
+                for offset, value in enumerate(chunk, first):
+                    entry[offset] = value
+            else:
+                entry[first:last] = chunk
+            address = page_end
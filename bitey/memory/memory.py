@@ -1,10 +1,40 @@
 from dataclasses import dataclass
+from typing import ClassVar
 
 
 class MemoryOutOfRange(Exception):
     "Attempt to access memory beyond the size of the memory"
 
 
+@dataclass
+class WatchpointHit:
+    """
+    An access to a watched address, see Memory.add_watchpoint
+    For a read the old value and the new value are the value read.
+    """
+
+    address: int
+    "The address accessed"
+
+    old_value: int
+    "The value at the address before the access"
+
+    new_value: int
+    "The value at the address after the access"
+
+    write: bool
+    "True if the access was a write, False if it was a read"
+
+    def __str__(self):
+        "Return a string representation of the hit"
+        return "Watchpoint {} 0x{:04X}: 0x{:02X} -> 0x{:02X}".format(
+            "write" if self.write else "read",
+            self.address,
+            self.old_value,
+            self.new_value,
+        )
+
+
 @dataclass
 class Memory:
     """
@@ -27,18 +57,349 @@ class Memory:
     memory: bytearray()
     "The memory"
 
+    page_size: ClassVar[int] = 0x100
+    "The size of a page, code and writes are tracked with page granularity"
+
+    code_page: ClassVar[int] = 0x01
+    "Page flag set if the page holds code that has been compiled or cached"
+
+    clean_page: ClassVar[int] = 0x02
+    """
+    Page flag set if the page hasn't been written to since it was
+    saved in a snapshot or restored from one
+    """
+
+    ascii_table: ClassVar[bytes] = bytes(
+        byte if 0x20 <= byte < 0x7F else ord(".") for byte in range(0x100)
+    )
+    "Translation table from bytes to the characters shown in memory dumps"
+
+    read_watch_page: ClassVar[int] = 0x04
+    "Page flag set if the page has an address with a read watchpoint"
+
+    write_watch_page: ClassVar[int] = 0x08
+    "Page flag set if the page has an address with a write watchpoint"
+
     def __init__(self, size=0):
         "Initialize the memory to size bytes"
         self.size = size
         self.memory = bytearray(size)
 
+        # One byte of flags per page.  Writes to pages with any flags
+        # set go through page_written, writes to other pages only pay
+        # for the test.
+        num_pages = max(len(self.memory), 0x10000) // Memory.page_size + 1
+        self.page_flags = bytearray(num_pages)
+        self.code_listeners = []
+
+        # The page contents saved by the last snapshot or restore
+        self.snapshot_pages = [None] * num_pages
+
+        # The read_watch_page and write_watch_page flags of each
+        # watched address, see add_watchpoint
+        self.watchpoints = {}
+        self.watch_listeners = []
+
     def __len__(self):
         "Get the size of the memory"
         return len(self.memory)
 
     def reset(self):
-        "Reset the memory to zero"
+        "Reset the memory to zero, watchpoints are kept"
         self.memory = bytearray(self.size)
+        self.code_changed(0, len(self.memory))
+        self.page_flags[:] = bytes(len(self.page_flags))
+        self.update_watch_pages()
+
+    def begin_batch(self):
+        """
+        Called before the CPU runs a batch of instructions
+        Memory that publishes its contents to other readers, such as
+        SharedMemory, uses this and end_batch to mark consistent frames.
+        Batches can be nested, for example Computer.run steps the CPU
+        with Computer.step, and only the outermost batch counts.
+        """
+
+    def end_batch(self):
+        "Called after the CPU runs a batch of instructions, see begin_batch"
+
+    def add_code_listener(self, listener):
+        """
+        Add a listener that is called when code changes
+
+        The listener is called with the start and end of the changed
+        range, in Python slice meaning, when memory in a page marked
+        with mark_code is written to or when the memory is reset.
+        """
+        self.code_listeners.append(listener)
+
+    def remove_code_listener(self, listener):
+        "Remove a listener added with add_code_listener"
+        self.code_listeners.remove(listener)
+
+    def mark_code(self, start, end):
+        """
+        Mark the pages in a range as holding code
+        The range includes the start location but not the end location.
+        """
+        first_page = start // Memory.page_size
+        last_page = (end - 1) // Memory.page_size
+        for page in range(first_page, last_page + 1):
+            self.page_flags[page] |= Memory.code_page
+
+    def code_changed(self, start, end):
+        "Notify the code listeners that a range of memory changed"
+        for listener in self.code_listeners:
+            listener(start, end)
+
+    def add_watch_listener(self, listener):
+        """
+        Add a listener that is called when a watched address is accessed
+        The listener is called with a WatchpointHit after the access.
+        """
+        self.watch_listeners.append(listener)
+
+    def remove_watch_listener(self, listener):
+        "Remove a listener added with add_watch_listener"
+        self.watch_listeners.remove(listener)
+
+    def add_watchpoint(self, start, end=None, read=False, write=True):
+        """
+        Watch reads, writes or both to a range of addresses
+
+        The range includes the start location but not the end
+        location, if end is None only start is watched.
+
+        Watchpoints are tracked with page flags, so only accesses to
+        pages with watched addresses pay for the check.  Reads are
+        only checked while there is a read watchpoint, see
+        watched_read.
+        """
+        if end is None:
+            end = start + 1
+        if (start < 0) or (end > len(self.memory)) or (start >= end):
+            raise MemoryOutOfRange
+        mode = (Memory.read_watch_page if read else 0) | (
+            Memory.write_watch_page if write else 0
+        )
+        for address in range(start, end):
+            self.watchpoints[address] = self.watchpoints.get(address, 0) | mode
+        self.update_watch_pages()
+
+    def remove_watchpoint(self, start, end=None):
+        """
+        Remove the watchpoints from a range of addresses
+        The range includes the start location but not the end location.
+        """
+        if end is None:
+            end = start + 1
+        for address in range(start, end):
+            self.watchpoints.pop(address, None)
+        self.update_watch_pages()
+
+    def update_watch_pages(self):
+        "Rebuild the watch page flags from the watchpoints"
+        watch_pages = Memory.read_watch_page | Memory.write_watch_page
+        page_flags = self.page_flags
+        for page in range(len(page_flags)):
+            page_flags[page] &= ~watch_pages
+        for address, mode in self.watchpoints.items():
+            page_flags[address >> 8] |= mode
+
+        # Reads only go through watched_read while there are read
+        # watchpoints, so reads cost nothing extra otherwise
+        if any(mode & Memory.read_watch_page for mode in self.watchpoints.values()):
+            self.read = self.watched_read
+            self.read_range = self.watched_read_range
+        elif "read" in self.__dict__:
+            del self.read
+            del self.read_range
+
+    def watched_read(self, address):
+        """
+        Read a byte from memory and check it for a read watchpoint
+        This replaces read while there are read watchpoints.
+        """
+        value = type(self).read(self, address)
+        if self.page_flags[address >> 8] & Memory.read_watch_page:
+            if self.watchpoints.get(address, 0) & Memory.read_watch_page:
+                self.watchpoint_hit(WatchpointHit(address, value, value, False))
+        return value
+
+    def watched_read_range(self, start, end):
+        """
+        Read a range of bytes and check it for read watchpoints
+        This replaces read_range while there are read watchpoints.
+        """
+        data = type(self).read_range(self, start, end)
+        for address in self.range_watchpoints(start, end, Memory.read_watch_page):
+            value = data[address - start]
+            self.watchpoint_hit(WatchpointHit(address, value, value, False))
+        return data
+
+    def range_watchpoints(self, start, end, mode):
+        """
+        Return the addresses in a range with a watchpoint
+        mode is read_watch_page or write_watch_page.  Only the page
+        flags are checked if none of the pages in the range are watched.
+        """
+        pages = range(start >> 8, ((end - 1) >> 8) + 1)
+        if (start >= end) or not any(self.page_flags[page] & mode for page in pages):
+            return []
+        return [
+            address
+            for address in range(start, end)
+            if self.watchpoints.get(address, 0) & mode
+        ]
+
+    def watchpoint_hit(self, hit):
+        "Notify the watch listeners of a watchpoint hit"
+        for listener in self.watch_listeners:
+            listener(hit)
+
+    def peek(self, address):
+        """
+        Read a byte from memory without any side effects
+        Watchpoints aren't checked.
+        """
+        return self.memory[address]
+
+    def peek_range(self, start, end):
+        """
+        Return a copy of a range of bytes without any side effects
+        Watchpoints aren't checked.
+        """
+        return bytes(self.memory[start:end])
+
+    def flagged_write(self, address, value):
+        """
+        Write a value to a page with page flags set
+        Write watchpoints are checked and the page flags updated.
+        """
+        if self.page_flags[address >> 8] & Memory.write_watch_page:
+            watched = self.watchpoints.get(address, 0) & Memory.write_watch_page
+        else:
+            watched = False
+        if watched:
+            old_value = self.peek(address)
+        self.write_byte(address, value)
+        self.page_written(address, address + 1)
+        if watched:
+            new_value = self.peek(address)
+            self.watchpoint_hit(WatchpointHit(address, old_value, new_value, True))
+
+    def write_byte(self, address, value):
+        "Store a byte at an address that is known to be in range"
+        self.memory[address] = value
+
+    def page_written(self, start, end):
+        """
+        Update the page flags after a range of memory is written to
+        The pages are dirty after this, and the code listeners are
+        notified if any of the pages hold code.
+        """
+        if start >= end:
+            return
+        code = 0
+        for page in range(start >> 8, ((end - 1) >> 8) + 1):
+            flags = self.page_flags[page]
+            code |= flags
+            self.page_flags[page] = flags & ~Memory.clean_page
+        if code & Memory.code_page:
+            self.code_changed(start, end)
+
+    def clone(self):
+        """
+        Return a copy of the memory
+
+        The clone is a plain Memory with its own copy of the contents.
+        It shares the pages saved by the last snapshot or restore, so
+        its snapshots share unmodified pages with the snapshots of this
+        memory, and restoring one of those only copies the pages the
+        clone changed.  Code listeners and watchpoints aren't copied.
+        """
+        clone = Memory(0)
+        clone.size = self.size
+        clone.memory = bytearray(self.memory)
+        self.copy_page_state(clone)
+        return clone
+
+    def copy_page_state(self, clone):
+        "Copy the dirty page tracking to a clone, see clone"
+        clone.page_flags = bytearray(
+            flags & Memory.clean_page for flags in self.page_flags
+        )
+        clone.snapshot_pages = list(self.snapshot_pages)
+
+    def num_pages(self):
+        "Get the number of pages in the memory"
+        return (len(self.memory) + Memory.page_size - 1) // Memory.page_size
+
+    def dirty_pages(self):
+        """
+        Return the pages written to since the last snapshot or restore
+        Memory changed without write or write_range, for example by
+        assigning to the memory bytearray directly, isn't tracked.
+        """
+        clean_page = Memory.clean_page
+        return [
+            page
+            for page in range(self.num_pages())
+            if not self.page_flags[page] & clean_page
+        ]
+
+    def get_page(self, page):
+        "Get the contents of a page"
+        return bytes(
+            self.memory[page * Memory.page_size : (page + 1) * Memory.page_size]
+        )
+
+    def set_page(self, page, data):
+        "Set the contents of a page"
+        self.memory[page * Memory.page_size : (page + 1) * Memory.page_size] = data
+
+    def snapshot(self):
+        """
+        Return a snapshot of the memory
+
+        A snapshot is a tuple with the contents of each page as an
+        immutable bytes object.  Pages that weren't written to since
+        the last snapshot or restore share the bytes object saved
+        then, so taking a snapshot only copies the dirty pages and
+        unmodified pages are shared between snapshots.
+
+        The dirty page bitmap is kept inverted, as the clean_page
+        flag, so only the first write to a page after a snapshot
+        leaves the fast write path.
+        """
+        pages = self.snapshot_pages
+        page_flags = self.page_flags
+        clean_page = Memory.clean_page
+        for page in range(self.num_pages()):
+            if not page_flags[page] & clean_page:
+                pages[page] = self.get_page(page)
+                page_flags[page] |= clean_page
+        return tuple(pages[: self.num_pages()])
+
+    def restore(self, snapshot):
+        """
+        Restore the memory from a snapshot
+        Only the pages that were written to, or that differ between
+        the snapshot and the last one taken or restored, are copied.
+        """
+        pages = self.snapshot_pages
+        page_flags = self.page_flags
+        clean_page = Memory.clean_page
+        for page, data in enumerate(snapshot):
+            flags = page_flags[page]
+            if (flags & clean_page) and (pages[page] is data):
+                continue
+            self.set_page(page, data)
+            pages[page] = data
+            page_flags[page] = flags | clean_page
+            if flags & Memory.code_page:
+                start = page * Memory.page_size
+                self.code_changed(start, start + len(data))
 
     def read(self, address):
         """
@@ -70,10 +431,34 @@ class Memory:
         value is the value to write
         """
         if (address >= 0) and (address < len(self.memory)):
-            self.memory[address] = value
+            if self.page_flags[address >> 8]:
+                self.flagged_write(address, value)
+            else:
+                self.memory[address] = value
         else:
             raise MemoryOutOfRange
 
+    def write_range(self, start, data):
+        """
+        Write bytes to memory starting at start, with one slice assignment
+        Raise an exception if the memory access is out of range.
+        """
+        end = start + len(data)
+        if (start < 0) or (end > len(self.memory)):
+            raise MemoryOutOfRange
+        watched = self.range_watchpoints(start, end, Memory.write_watch_page)
+        old_values = [self.peek(address) for address in watched]
+        self.store_range(start, end, data)
+        self.page_written(start, end)
+        for address, old_value in zip(watched, old_values):
+            self.watchpoint_hit(
+                WatchpointHit(address, old_value, self.peek(address), True)
+            )
+
+    def store_range(self, start, end, data):
+        "Store bytes in a range that is known to be inside the memory"
+        self.memory[start:end] = data
+
     def get_16bit_address(self, adl, adh):
         """
         Compute a 16-bit address from a low and high byte.
@@ -93,12 +478,13 @@ class Memory:
 
         return self.get_16bit_address(adl, adh)
 
-    def memory_dump(self, address=None):
+    def memory_dump(self, address=None, ascii=False):
         """
         Dump a range of memory starting at an address
 
-        Defaults to the zero page.
-        Rounds down the range to a 16-byte boundary.
+        Defaults to the zero page.  Dumps two lines of 16 bytes, or
+        less at the end of the memory.  If ascii is True, each line
+        ends with the printable ASCII characters of its bytes.
 
         Example:
 
@@ -112,14 +498,15 @@ class Memory:
             address = 0
         end = 0
         end = min(address + 32, len(self.memory))
-        return self.memory_range_dump(range(address, end))
+        return self.memory_range_dump(range(address, end), ascii)
 
-    def memory_range_dump(self, memory_range=None):
+    def memory_range_dump(self, memory_range=None, ascii=False):
         """
         Dump a range of memory
 
-        Defaults to the zero page.
-        Rounds down the range to a 16-byte boundary.
+        Defaults to the zero page.  Lines start at the start of the
+        range and hold 16 bytes, the last line holds the rest of the
+        range.  See memory_dump_lines
 
         Example:
 
@@ -128,32 +515,34 @@ class Memory:
         m = Memory(b)
         print(m.memory_range_dump(range(32, 64)))
         """
-        memory_dump = []
-        memory_range_len = None
-        num_lines = 0
+        return "\n".join(self.memory_dump_lines(memory_range, ascii))
+
+    def memory_dump_lines(self, memory_range=None, ascii=False):
+        """
+        Generate the lines of a memory dump, see memory_range_dump
+
+        The memory is read a chunk of lines at a time, so large ranges
+        can be streamed without building the whole dump.  If ascii is
+        True, each line ends with the printable ASCII characters of
+        its bytes, other bytes are shown as a period.
+        """
         if memory_range is None:
             memory_range = range(0x00, 0x100)
 
         if (memory_range.start < 0) or (memory_range.stop > len(self.memory)):
             raise MemoryOutOfRange
 
-        memory_range_len = len(memory_range)
-        num_lines = memory_range_len // 16
-        for line_index in range(num_lines):
-            line = []
-            line.append("0x{:04x} ".format(line_index * 0x10 + memory_range.start))
-            for x in range(
-                line_index * 0x10 + memory_range.start,
-                line_index * 0x10 + 0x08 + memory_range.start,
-            ):
-                line.append("{:02x}".format(self.memory[x]))
-            line.append("")
-            for x in range(
-                line_index * 0x10 + 0x08 + memory_range.start,
-                line_index * 0x10 + 0x10 + memory_range.start,
-            ):
-                line.append("{:02x}".format(self.memory[x]))
-            memory_dump.append("{}".format(" ".join(line)))
-        memory_dump = "\n".join(memory_dump)
-
-        return memory_dump
+        for chunk_start in range(memory_range.start, memory_range.stop, 0x1000):
+            chunk_end = min(chunk_start + 0x1000, memory_range.stop)
+            data = self.peek_range(chunk_start, chunk_end)
+            for offset in range(0, len(data), 0x10):
+                line = data[offset : offset + 0x10]
+                hex_dump = "{}  {}".format(line[:8].hex(" "), line[8:].hex(" "))
+                if ascii:
+                    yield "0x{:04x}  {:<48}  |{}|".format(
+                        chunk_start + offset,
+                        hex_dump,
+                        line.translate(Memory.ascii_table).decode("ascii"),
+                    )
+                else:
+                    yield "0x{:04x}  {}".format(chunk_start + offset, hex_dump.rstrip())
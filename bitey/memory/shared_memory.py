@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+import os
+import struct
+from typing import ClassVar
+
+from bitey.memory.memory import Memory
+
+
+@dataclass
+class SharedMemory(Memory):
+    """
+    Memory backed by a multiprocessing.shared_memory block
+
+    Other processes can attach to the block by name with attach and
+    get a live view of the memory without copying it.  The memory
+    attribute is a memoryview of the block instead of a bytearray, so
+    a reader with NumPy can wrap it with numpy.frombuffer.
+
+    The block starts with a header holding a generation counter and
+    the size of the memory.  The counter works like a sequence lock:
+    it is odd while the CPU is running a batch of instructions and
+    even between batches.  The Computer run methods and step call
+    begin_batch and end_batch around each run or instruction.  A
+    reader copying the memory has a consistent frame if the counter
+    was even and didn't change during the copy, see read_frame.
+
+    Call close when done with the memory, and unlink in the process
+    that created it to free the block.  Only the creating process
+    owns the block, processes that attach don't free it on exit.
+    """
+
+    header: ClassVar[struct.Struct] = struct.Struct("=QQ")
+    "The layout of the header, the generation counter and the memory size"
+
+    created_names: ClassVar[set] = set()
+    """
+    The names of the blocks created in this process, or in the parent
+    of a forked process, which share a resource tracker
+    """
+
+    def __init__(self, size=0x10000, name=None, create=True):
+        """
+        Create a shared memory block for size bytes of memory
+        If create is False, attach to the existing block called name
+        and size is read from its header.
+        """
+        self.shared_memory = shared_memory.SharedMemory(
+            name, create, SharedMemory.header.size + size if create else 0
+        )
+        buf = self.shared_memory.buf
+        if create:
+            SharedMemory.header.pack_into(buf, 0, 0, size)
+            SharedMemory.created_names.add(self.shared_memory.name)
+        else:
+            (_, size) = SharedMemory.header.unpack_from(buf, 0)
+            if (os.name == "posix") and (
+                self.shared_memory.name not in SharedMemory.created_names
+            ):
+                # Attaching registers the block with the resource
+                # tracker too, which would unlink it when this process
+                # exits and pull it out from under the other processes
+                resource_tracker.unregister(self.shared_memory._name, "shared_memory")
+
+        super().__init__(size)
+        self.memory = buf[SharedMemory.header.size : SharedMemory.header.size + size]
+        self.generation_view = buf[:8].cast("Q")
+
+        self.batch_depth = 0
+        "The number of nested batches running, see begin_batch"
+
+    @classmethod
+    def attach(cls, name):
+        "Attach to the shared memory block of another SharedMemory by name"
+        return cls(name=name, create=False)
+
+    @property
+    def name(self):
+        "The name other processes can attach to the block with"
+        return self.shared_memory.name
+
+    @property
+    def generation(self):
+        "The generation counter, odd while a batch of instructions is running"
+        return self.generation_view[0]
+
+    def reset(self):
+        "Reset the memory to zero"
+        self.memory[:] = bytes(len(self.memory))
+        self.code_changed(0, len(self.memory))
+        self.page_flags[:] = bytes(len(self.page_flags))
+        self.update_watch_pages()
+
+    def read_range(self, start, end):
+        """
+        Return a copy of a range of bytes
+        The start and end match Python slice meaning.
+        """
+        return bytearray(super().read_range(start, end))
+
+    def store_range(self, start, end, data):
+        "Store bytes in a range that is known to be inside the memory"
+        self.memory[start:end] = bytes(data)
+
+    def begin_batch(self):
+        """
+        Make the generation counter odd before a batch of instructions
+        Nested batches leave the counter odd until the outermost one
+        ends.
+        """
+        if self.batch_depth == 0:
+            self.generation_view[0] += 1
+        self.batch_depth += 1
+
+    def end_batch(self):
+        "Make the generation counter even again after a batch of instructions"
+        self.batch_depth -= 1
+        if self.batch_depth == 0:
+            self.generation_view[0] += 1
+
+    def read_frame(self, retries=100):
+        """
+        Return a consistent copy of the memory and its generation
+
+        The memory is copied between batches of instructions, a copy
+        that overlaps a batch is retried up to retries times.  Returns
+        None if no consistent copy could be made.
+        """
+        for _ in range(retries):
+            generation = self.generation
+            if generation & 1:
+                continue
+            frame = bytes(self.memory)
+            if self.generation == generation:
+                return (frame, generation)
+        return None
+
+    def close(self):
+        "Release the views of the block and close it"
+        self.memory.release()
+        self.generation_view.release()
+        self.shared_memory.close()
+
+    def unlink(self):
+        "Free the block, called by the process that created it"
+        self.shared_memory.unlink()
+        SharedMemory.created_names.discard(self.shared_memory.name)
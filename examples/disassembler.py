@@ -1,38 +1,50 @@
-# A small example to show how to disassemble a file
+# A small example to show how to disassemble files
 # Execute it with the following
-# PYTHONPATH=. pipenv run python examples/disassembler.py FILENAME
+# PYTHONPATH=. pipenv run python examples/disassembler.py FILENAME...
+#
+# Files are disassembled on a process pool, large files are split
+# into chunks.  Listings are cached, so unchanged files are skipped
+# when the command is run again.
 import click
 
 from bitey.logger import setup_logger
-from bitey.computer.computer import Computer
-from bitey.memory.memory import Memory
+from bitey.disasm.batch import BatchDisassembler, DisassemblyCache
+from bitey.disasm.disassembler import Disassembler
 
 
 @click.command()
-@click.argument("filename")
+@click.argument("filenames", nargs=-1, required=True)
 @click.option("--count", "-c", is_flag=False, type=int, help="Disassemble count bytes")
 @click.option("--skip", "-s", is_flag=False, type=int, help="Skip n bytes in input")
-def cli(filename, count, skip):
-    "Disassemble a file"
+@click.option("--jobs", "-j", is_flag=False, type=int, help="Number of processes")
+@click.option("--no-cache", is_flag=True, help="Don't use the disassembly cache")
+def cli(filenames, count, skip, jobs, no_cache):
+    "Disassemble files"
     setup_logger()
-    data = None
-    with open(filename, "rb") as f:
-        data = f.read()
-
-    subset = data
     computed_skip = 0
     if skip is not None:
         computed_skip = skip
-    if count is not None:
-        subset = data[computed_skip : computed_skip + count]  # noqa: E203
-    else:
-        subset = data[computed_skip:]
+
+    images = []
+    for filename in filenames:
+        with open(filename, "rb") as f:
+            data = f.read()
+        if count is not None:
+            subset = data[computed_skip : computed_skip + count]  # noqa: E203
+        else:
+            subset = data[computed_skip:]
+        images.append((subset, 0))
 
     with open("chip/6502.json") as f:
-        s = f.read()
-        computer = Computer.build_from_json(s)
-        computer.memory = Memory(subset)
-        print(computer.disassemble())
+        disassembler = Disassembler.build_from_json(f.read())
+    cache = None if no_cache else DisassemblyCache()
+    batch = BatchDisassembler(disassembler, cache, jobs)
+
+    listings = batch.disassemble_images(images)
+    for filename, listing in zip(filenames, listings):
+        if len(filenames) > 1:
+            print("{}:".format(filename))
+        print(listing)
 
 
 if __name__ == "__main__":
@@ -22,6 +22,7 @@ from bitey.debug.debugger import DebuggerStateChange
 from bitey.debug.cli_debugger import CLIDebugger
 from bitey.debug.config_decoder import ConfigDecoder
 from bitey.debug.debugger import DebuggerState
+from bitey.memory.memory import MemoryOutOfRange
 
 
 def get_computer():
@@ -52,9 +53,6 @@ def cli(filename, pc, reset, config, debug, eval_enabled):  # noqa: C901
     "Load a program into memory and run it"
 
     setup_logger()
-    data = None
-    with open(filename, "rb") as f:
-        data = f.read()
 
     debug_config = None
     if config is not None:
@@ -62,65 +60,66 @@ def cli(filename, pc, reset, config, debug, eval_enabled):  # noqa: C901
             debug_config_decoder = ConfigDecoder()
             debug_config = debug_config_decoder.decode(f.read())
 
-    if data is not None:
-        computer = get_computer()
-        computer.load(data)
+    computer = get_computer()
+    # The program is copied into RAM, it can modify itself
+    try:
+        size = computer.load_image(filename, 0, readonly=False)
+    except MemoryOutOfRange as e:
+        raise click.ClickException(str(e))
 
-        print("reset: {}".format(reset))
-        if reset is not None:
-            computer.memory.write(0xFFFC, (reset & 0xFF))
-            computer.memory.write(0xFFFD, ((reset >> 8) & 0xFF))
+    print("reset: {}".format(reset))
+    if reset is not None:
+        computer.memory.write(0xFFFC, (reset & 0xFF))
+        computer.memory.write(0xFFFD, ((reset >> 8) & 0xFF))
 
-        if pc is not None:
-            print("Setting PC to 0x{}".format(pc))
-            computer.cpu.registers["PC"].set(pc)
+    if pc is not None:
+        print("Setting PC to 0x{}".format(pc))
+        computer.cpu.registers["PC"].set(pc)
 
-        computer.cpu.reset(computer.memory, False, False)
+    computer.cpu.reset(computer.memory, False, False)
 
-        print("Computer PC: {}".format(computer.cpu.registers["PC"].get()))
+    print("Computer PC: {}".format(computer.cpu.registers["PC"].get()))
+    print(
+        "reset vector: {} {}".format(
+            computer.memory.read(0xFFFC), computer.memory.read(0xFFFD)
+        )
+    )
+
+    debugger = None
+    # The previous behavior of the 6502 emulator was to load the
+    # first instruction but not execute it.
+    # This run script doesn't load the first instruction, so the program
+    # starts with PC at the start of your routine and nothing loaded.
+    #
+    # In addition, no CPU "housekeeping" is done, so no instructions count toward
+    # the loaded or executed limit.
+    #
+    # This behavior may change as additional features are added to
+    # the emulator or additional systems are implemented.
+    instructions_loaded_limit = min(size, 100000) + computer.cpu.num_instructions_loaded
+    instructions_executed_limit = (
+        min(size, 100000) + computer.cpu.num_instructions_executed
+    )
+
+    if (debug is not None) and debug:
+        debugger = CLIDebugger(computer, DebuggerState.STEPPING, eval_enabled)
+        if debug_config is not None:
+            print("applying debugger configuration data:\n{}".format(debug_config))
+            debug_config.apply(debugger)
+        try:
+            debugger.run(instructions_loaded_limit, instructions_executed_limit)
+        except DebuggerStateChange as dsc:
+            print(dsc)
+            return
+    else:
+        computer.run(True, instructions_loaded_limit, instructions_executed_limit)
+        print(computer.cpu.registers)
         print(
-            "reset vector: {} {}".format(
-                computer.memory.read(0xFFFC), computer.memory.read(0xFFFD)
+            "Number of instructions executed: {}".format(
+                computer.cpu.num_instructions_executed
             )
         )
 
-        debugger = None
-        # The previous behavior of the 6502 emulator was to load the
-        # first instruction but not execute it.
-        # This run script doesn't load the first instruction, so the program
-        # starts with PC at the start of your routine and nothing loaded.
-        #
-        # In addition, no CPU "housekeeping" is done, so no instructions count toward
-        # the loaded or executed limit.
-        #
-        # This behavior may change as additional features are added to
-        # the emulator or additional systems are implemented.
-        instructions_loaded_limit = (
-            min(len(data), 100000) + computer.cpu.num_instructions_loaded
-        )
-        instructions_executed_limit = (
-            min(len(data), 100000) + computer.cpu.num_instructions_executed
-        )
-
-        if (debug is not None) and debug:
-            debugger = CLIDebugger(computer, DebuggerState.STEPPING, eval_enabled)
-            if debug_config is not None:
-                print("applying debugger configuration data:\n{}".format(debug_config))
-                debug_config.apply(debugger)
-            try:
-                debugger.run(instructions_loaded_limit, instructions_executed_limit)
-            except DebuggerStateChange as dsc:
-                print(dsc)
-                return
-        else:
-            computer.run(True, instructions_loaded_limit, instructions_executed_limit)
-            print(computer.cpu.registers)
-            print(
-                "Number of instructions executed: {}".format(
-                    computer.cpu.num_instructions_executed
-                )
-            )
-
 
 if __name__ == "__main__":
     # cProfile.run("cli()")
@@ -79,11 +79,14 @@ def execute_instruction(
 def execute_explicit_instruction(
     computer, opcode, instruction, expected_registers, expected_flags, expected_memory
 ):
-    "Execute an explicit instruction based on an opcode"
+    """
+    Execute an explicit instruction based on an opcode
+    Returns the result of the instruction
+    """
     flags = computer.cpu.flags
 
     try:
-        instruction.execute(computer.cpu, computer.memory)
+        result = instruction.execute(computer.cpu, computer.memory)
         for register, value in expected_registers:
             assert (
                 computer.cpu.registers[register].get() == value
@@ -105,6 +108,8 @@ def execute_explicit_instruction(
     except IncompleteInstruction:
         assert False
 
+    return result
+
 
 def run_adc_test(
     chip,
@@ -0,0 +1,21 @@
+import os
+import shutil
+import tempfile
+
+# The cache directory the tests write chip and disassembly caches to
+cache_directory = None
+
+
+def pytest_configure(config):
+    "Point the caches at a temporary directory instead of the user cache"
+    # This runs before the test modules are imported, so the chip
+    # cache created when bitey.cpu.chip_cache is imported uses it too
+    global cache_directory
+    cache_directory = tempfile.mkdtemp(prefix="bitey-test-cache-")
+    os.environ["BITEY_CACHE_DIR"] = cache_directory
+
+
+def pytest_unconfigure(config):
+    "Remove the temporary cache directory"
+    if cache_directory is not None:
+        shutil.rmtree(cache_directory, ignore_errors=True)
@@ -30,11 +30,11 @@ def test_cpu_instruction_bit_zeropage(setup):
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", False), ("N", False)], []
     )
 
-    assert i1.result == 0x20
+    assert result == 0x20
 
 
 def test_cpu_instruction_bit_zeropage_negative_flag(setup):
@@ -52,11 +52,11 @@ def test_cpu_instruction_bit_zeropage_negative_flag(setup):
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", False), ("N", True)], []
     )
 
-    assert i1.result == 0x01
+    assert result == 0x01
 
 
 def test_cpu_instruction_bit_zeropage_overflow_flag(setup):
@@ -74,11 +74,11 @@ def test_cpu_instruction_bit_zeropage_overflow_flag(setup):
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", True), ("N", False)], []
     )
 
-    assert i1.result == 0x01
+    assert result == 0x01
 
 
 def test_cpu_instruction_bit_zeropage_overflow_and_negative_flag(setup):
@@ -96,11 +96,11 @@ def test_cpu_instruction_bit_zeropage_overflow_and_negative_flag(setup):
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", True), ("N", True)], []
     )
 
-    assert i1.result == 0x81
+    assert result == 0x81
 
 
 def test_cpu_instruction_bit_zeropage_zero_flag(setup):
@@ -118,11 +118,11 @@ def test_cpu_instruction_bit_zeropage_zero_flag(setup):
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", False), ("N", False)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
 
 
 def test_cpu_instruction_bit_zeropage_zero_and_negative_flag(setup):
@@ -140,11 +140,11 @@ def test_cpu_instruction_bit_zeropage_zero_and_negative_flag(setup):
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", False), ("N", True)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
 
 
 def test_cpu_instruction_bit_zeropage_zero_and_overflow_flag(setup):
@@ -162,11 +162,11 @@ def test_cpu_instruction_bit_zeropage_zero_and_overflow_flag(setup):
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", True), ("N", False)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
 
 
 def test_cpu_instruction_bit_zeropage_zero_and_overflow_and_negative_flag(setup):
@@ -184,11 +184,11 @@ def test_cpu_instruction_bit_zeropage_zero_and_overflow_and_negative_flag(setup)
     i1_opcode = Opcode(0x24, ZeroPageAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", True), ("N", True)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
 
 
 def test_cpu_instruction_bit_absolute(setup):
@@ -207,11 +207,11 @@ def test_cpu_instruction_bit_absolute(setup):
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", False), ("N", False)], []
     )
 
-    assert i1.result == 0x20
+    assert result == 0x20
 
 
 def test_cpu_instruction_bit_absolute_negative_flag(setup):
@@ -231,11 +231,11 @@ def test_cpu_instruction_bit_absolute_negative_flag(setup):
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", False), ("N", True)], []
     )
 
-    assert i1.result == 0x01
+    assert result == 0x01
 
 
 def test_cpu_instruction_bit_absolute_overflow_flag(setup):
@@ -255,11 +255,11 @@ def test_cpu_instruction_bit_absolute_overflow_flag(setup):
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", True), ("N", False)], []
     )
 
-    assert i1.result == 0x01
+    assert result == 0x01
 
 
 def test_cpu_instruction_bit_absolute_overflow_and_negative_flag(setup):
@@ -279,11 +279,11 @@ def test_cpu_instruction_bit_absolute_overflow_and_negative_flag(setup):
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", False), ("V", True), ("N", True)], []
     )
 
-    assert i1.result == 0x81
+    assert result == 0x81
 
 
 def test_cpu_instruction_bit_absolute_zero_flag(setup):
@@ -303,11 +303,11 @@ def test_cpu_instruction_bit_absolute_zero_flag(setup):
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", False), ("N", False)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
 
 
 def test_cpu_instruction_bit_absolute_zero_and_negative_flag(setup):
@@ -327,11 +327,11 @@ def test_cpu_instruction_bit_absolute_zero_and_negative_flag(setup):
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", False), ("N", True)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
 
 
 def test_cpu_instruction_bit_absolute_zero_and_overflow_flag(setup):
@@ -351,11 +351,11 @@ def test_cpu_instruction_bit_absolute_zero_and_overflow_flag(setup):
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", True), ("N", False)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
 
 
 def test_cpu_instruction_bit_absolute_zero_and_overflow_and_negative_flag(setup):
@@ -375,8 +375,8 @@ def test_cpu_instruction_bit_absolute_zero_and_overflow_and_negative_flag(setup)
     i1_opcode = Opcode(0x2C, AbsoluteAddressingMode())
     i1 = BIT("BIT", i1_opcode, "Test Bits in Memory with Accumulator")
 
-    tests.computer.computer.execute_explicit_instruction(
+    result = tests.computer.computer.execute_explicit_instruction(
         computer, i1_opcode, i1, [], [("Z", True), ("V", True), ("N", True)], []
     )
 
-    assert i1.result == 0x00
+    assert result == 0x00
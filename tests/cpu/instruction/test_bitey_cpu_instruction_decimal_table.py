@@ -0,0 +1,35 @@
+from bitey.cpu.instruction.adc import ADCCMOS, ADCNMOS, nmos_decimal_add
+from bitey.cpu.instruction.decimal_table import DecimalTable
+from bitey.cpu.instruction.sbc import SBCCMOS, SBCNMOS, cmos_decimal_subtract
+
+
+def test_cpu_instruction_decimal_table_lookup():
+    table = DecimalTable(nmos_decimal_add)
+    assert table.entries is None
+
+    # 0x58 + 0x46 + 1 = 0x105, the result is 0x05 with the carry set
+    entry = table.lookup(0x58, 0x46, 1)
+    assert len(table.entries) == 0x20000
+    assert entry & 0xFF == 0x05
+    assert (entry >> 8) & DecimalTable.carry
+    assert not (entry >> 8) & DecimalTable.zero
+
+    assert table.lookup(0x12, 0x34, 0) & 0xFF == 0x46
+
+
+def test_cpu_instruction_decimal_table_matches_operation():
+    table = DecimalTable(cmos_decimal_subtract)
+    for accumulator, value, carry in [
+        (0x00, 0x01, 1),
+        (0x46, 0x12, 1),
+        (0x40, 0x13, 0),
+        (0x32, 0x02, 0),
+        (0xFF, 0xFF, 1),
+    ]:
+        (result, flags) = cmos_decimal_subtract(accumulator, value, carry)
+        assert table.lookup(accumulator, value, carry) == (flags << 8) | result
+
+
+def test_cpu_instruction_decimal_table_per_variant():
+    assert ADCNMOS.decimal_table is not ADCCMOS.decimal_table
+    assert SBCNMOS.decimal_table is not SBCCMOS.decimal_table
@@ -1,6 +1,7 @@
 from bitey.computer.computer import Computer
 from bitey.cpu.cpu import CPU
 from bitey.debug.debugger import Debugger, DebuggerState, DebuggerStateChange
+from bitey.debug.config_decoder import ConfigDecoder
 from collections import deque
 from dataclasses import dataclass, field
 import logging
@@ -85,3 +86,69 @@ def test_bitey_debug_debugger_run():
         assert e.state == DebuggerState.EXIT
     else:
         assert False
+
+
+def test_bitey_debug_debugger_watchpoint():
+    "Test that a watchpoint from a config stops the debugger and is reported"
+    with open("chip/6502.json") as f:
+        computer = Computer.build_from_json(f.read())
+
+    # 0x0000 LDA #$42
+    # 0x0002 STA $10
+    computer.load([0xA9, 0x42, 0x85, 0x10], 0x00)
+    computer.cpu.registers["PC"].set(0x00)
+
+    config = ConfigDecoder().decode(
+        '{"watchpoints": [{"description": "counter", "address": "0x10"}]}'
+    )
+    output = []
+    debugger = MockDebugger(computer, DebuggerState.RUNNING, deque(["q"]))
+    debugger.output_handler = output.append
+    config.apply(debugger)
+
+    try:
+        debugger.event_loop()
+    except DebuggerStateChange as e:
+        assert e.state == DebuggerState.EXIT
+    else:
+        assert False
+
+    assert "Watchpoint write 0x0010: 0x00 -> 0x42" in output
+    assert computer.cpu.registers["PC"].get() == 0x04
+
+
+def test_bitey_debug_debugger_conditional_breakpoint():
+    "Test that a conditional breakpoint from a config only stops when it's true"
+    with open("chip/6502.json") as f:
+        computer = Computer.build_from_json(f.read())
+
+    # 0x0000 INX
+    # 0x0001 JMP $0000
+    computer.load([0xE8, 0x4C, 0x00, 0x00], 0x00)
+    computer.cpu.registers["PC"].set(0x00)
+
+    config = ConfigDecoder().decode(
+        """
+        {"breakpoints": [
+            {"description": "loop", "address": "0x0001", "condition": "X >= 3",
+             "hit_count": "10", "one_shot": true}
+        ]}
+        """
+    )
+    assert config.breakpoints[0]["hit_count"] == 10
+    assert "condition: X >= 3" in str(config)
+    output = []
+    debugger = MockDebugger(computer, DebuggerState.RUNNING, deque(["q"]))
+    debugger.output_handler = output.append
+    config.apply(debugger)
+
+    try:
+        debugger.event_loop()
+    except DebuggerStateChange as e:
+        assert e.state == DebuggerState.EXIT
+    else:
+        assert False
+
+    assert output.count("Breakpoint") == 1
+    assert computer.cpu.registers["X"].get() == 12
+    assert computer.cpu.cpu_breakpoints == {}
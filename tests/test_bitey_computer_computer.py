@@ -1,7 +1,12 @@
-from bitey.computer.computer import Computer
-from bitey.memory.memory import Memory
 import json
 
+import pytest
+
+from bitey.computer.computer import Computer, StopReason
+from bitey.cpu.cpu import CPU, CPUWatchpoint
+from bitey.memory.mapped_memory import MappedMemory, MemoryMapError
+from bitey.memory.memory import Memory, MemoryOutOfRange, WatchpointHit
+
 
 def test_computer_computer_init():
     with open("chip/6502.json") as f:
@@ -66,3 +71,449 @@ def test_computer_computer_disassemble():
 
     computer.cpu.registers["PC"].set(0x00)
     assert computer.disassemble() == "0000  18        CLC"
+
+
+def test_computer_computer_disassemble_undocumented():
+    computer = None
+
+    with open("chip/6502.json") as f:
+        chip_data = f.read()
+
+        computer = Computer.build_from_json(chip_data)
+
+    computer.memory = Memory(bytearray(2))
+    computer.memory.write(0x00, 0x02)
+    computer.memory.write(0x01, 0x18)
+
+    assert computer.disassemble() == "0000  02        INV\n0001  18        CLC"
+
+
+def build_run_fast_computer():
+    with open("chip/6502.json") as f:
+        chip_data = f.read()
+        computer = Computer.build_from_json(chip_data)
+
+    # 0x0000 INX
+    # 0x0001 INX
+    # 0x0002 INX
+    # 0x0003 BRK
+    # 0x0004 0x02, an undocumented opcode
+    computer.load([0xE8, 0xE8, 0xE8, 0x00, 0x02], 0x00)
+    computer.cpu.registers["PC"].set(0x00)
+
+    return computer
+
+
+def test_computer_computer_run_fast_limit():
+    computer = build_run_fast_computer()
+    executed = computer.cpu.num_instructions_executed
+
+    result = computer.run_fast(2)
+
+    assert result.reason == StopReason.LIMIT
+    assert result.address == 0x02
+    assert result.instructions_executed == 2
+    assert computer.cpu.registers["X"].get() == 0x02
+    assert computer.cpu.num_instructions_executed == executed + 2
+
+
+def test_computer_computer_run_fast_breakpoint():
+    computer = build_run_fast_computer()
+    computer.cpu.set_breakpoint(0x01)
+
+    result = computer.run_fast()
+    assert result.reason == StopReason.BREAKPOINT
+    assert result.address == 0x01
+    assert computer.cpu.registers["X"].get() == 0x01
+
+    # Running again continues past the breakpoint
+    result = computer.run_fast(1)
+    assert result.reason == StopReason.LIMIT
+    assert computer.cpu.registers["X"].get() == 0x02
+
+
+def test_computer_computer_run_fast_trap_brk():
+    computer = build_run_fast_computer()
+
+    result = computer.run_fast(trap_brk=True)
+
+    assert result.reason == StopReason.BRK
+    assert result.address == 0x03
+    assert result.instructions_executed == 3
+    assert computer.cpu.registers["PC"].get() == 0x03
+
+
+def test_computer_computer_run_fast_illegal_opcode():
+    computer = build_run_fast_computer()
+    # Skip the BRK
+    computer.cpu.registers["PC"].set(0x04)
+
+    result = computer.run_fast()
+
+    assert result.reason == StopReason.ILLEGAL_OPCODE
+    assert result.address == 0x04
+    assert result.instructions_executed == 0
+
+
+def test_computer_computer_shared_instruction_set():
+    with open("chip/6502.json") as f:
+        chip_data = f.read()
+    first = Computer.build_from_json(chip_data)
+    second = Computer.build_from_json(chip_data, first.cpu.instruction_set)
+    assert second.cpu.instruction_set is first.cpu.instruction_set
+    assert second.cpu.opcode_table is first.cpu.opcode_table
+
+    # 0x0000 LDA #$..
+    # 0x0002 SEC
+    # 0x0003 SBC #$01
+    # 0x0005 BIT $10
+    # 0x0007 JMP $0002
+    program = [0xA9, 0x00, 0x38, 0xE9, 0x01, 0x24, 0x10, 0x4C, 0x02, 0x00]
+    for computer, accumulator in [(first, 0x80), (second, 0x03)]:
+        program[1] = accumulator
+        computer.load(program, 0x00)
+        computer.memory.write(0x10, 0xC0)
+        computer.cpu.registers["PC"].set(0x00)
+
+    # Interleave single steps, each computer only sees its own state
+    for _ in range(10):
+        first.step()
+        second.step()
+
+    assert first.cpu.registers["A"].get() == 0x7E
+    assert second.cpu.registers["A"].get() == 0x01
+    assert first.cpu.flags["C"].status is True
+    assert second.cpu.flags["Z"].status is True
+
+
+def test_computer_computer_trace_hook():
+    traced = []
+
+    def trace(cpu, address, instruction):
+        traced.append((address, instruction.name))
+
+    expected = [(0x00, "INX"), (0x01, "INX"), (0x02, "INX")]
+
+    computer = build_run_fast_computer()
+    computer.cpu.set_trace_hook(trace)
+    computer.step()
+    computer.step()
+    computer.step()
+    assert traced == expected
+
+    for run in [Computer.run_fast, Computer.run_compiled]:
+        traced.clear()
+        computer = build_run_fast_computer()
+        computer.cpu.set_trace_hook(trace)
+        run(computer, trap_brk=True)
+        assert traced == expected
+
+    # Tracing can be turned off again
+    traced.clear()
+    computer.cpu.set_trace_hook(None)
+    computer.cpu.registers["PC"].set(0x00)
+    computer.run_fast(3)
+    assert traced == []
+
+
+def test_computer_computer_cycle_budget():
+    # 0x0000 LDX #$00
+    # 0x0002 INX
+    # 0x0003 BNE $0002
+    # 0x0005 JMP $0000
+    program = [0xA2, 0x00, 0xE8, 0xD0, 0xFD, 0x4C, 0x00, 0x00]
+    computers = []
+    for _ in range(3):
+        computer = build_run_fast_computer()
+        computer.load(program, 0x00)
+        computers.append(computer)
+    (run, run_fast, run_compiled) = computers
+
+    # Run in slices of 100 cycles, each slice can go a few cycles over
+    for _ in range(20):
+        start = run.cpu.cycles
+        run.run(max_cycles=100)
+        assert 100 <= run.cpu.cycles - start < 100 + 7
+        result = run_fast.run_fast(max_cycles=100)
+        assert result.reason == StopReason.LIMIT
+        assert result.cycles == run.cpu.cycles - start
+        result = run_compiled.run_compiled(max_cycles=100)
+        assert result.cycles == run.cpu.cycles - start
+
+        for computer in [run_fast, run_compiled]:
+            assert computer.cpu.cycles == run.cpu.cycles
+            assert computer.cpu.register_data == run.cpu.register_data
+
+    # Each loop iteration is an INX and a taken BNE, five cycles
+    run_fast.cpu.registers["X"].set(0x00)
+    run_fast.cpu.registers["PC"].set(0x02)
+    result = run_fast.run_fast(10)
+    assert result.cycles == 25
+
+
+def test_computer_computer_load_image(tmp_path):
+    with open("chip/6502.json") as f:
+        cpu = CPU.build_from_json(f.read())
+    computer = Computer(cpu, MappedMemory())
+
+    # A ROM image that doesn't end on a page boundary
+    path = tmp_path / "rom.bin"
+    path.write_bytes(bytes([0xE8]) * 0x0180 + bytes([0x4C, 0x00, 0xF0]))
+    assert computer.load_image(path, 0xF000) == 0x0183
+    assert computer.memory.read(0xF000) == 0xE8
+    assert computer.memory.read_range(0xF180, 0xF184) == bytearray(
+        [0x4C, 0x00, 0xF0, 0x00]
+    )
+    computer.memory.write(0xF000, 0x00)
+    computer.memory.write(0xF181, 0x00)
+    assert computer.memory.read(0xF000) == 0xE8
+    assert computer.memory.read(0xF181) == 0x00
+
+    computer.cpu.registers["PC"].set(0xF000)
+    computer.run_fast(0x0181)
+    assert computer.cpu.registers["PC"].get() == 0xF000
+    assert computer.cpu.registers["X"].get() == 0x80
+
+    # RAM images are copied
+    path = tmp_path / "ram.bin"
+    path.write_bytes(bytes([0xCA, 0xCA]))
+    assert computer.load_image(path, 0x0200, readonly=False) == 2
+    computer.memory.write(0x0201, 0xE8)
+    assert computer.memory.read_range(0x0200, 0x0202) == bytearray([0xCA, 0xE8])
+    assert path.read_bytes() == bytes([0xCA, 0xCA])
+
+    # Images have to fit in memory
+    with pytest.raises(MemoryOutOfRange):
+        computer.load_image(path, 0xFFFF, readonly=False)
+    with pytest.raises(MemoryOutOfRange):
+        computer.load_image(path, 0xFFFF)
+
+    # ROM images need a page table
+    computer = build_run_fast_computer()
+    with pytest.raises(MemoryMapError):
+        computer.load_image(path, 0xF000)
+
+
+def test_computer_computer_load_invalidates_code():
+    computer = build_run_fast_computer()
+    computer.run_fast(1)
+    assert 0x00 in computer.cpu.decoded_instructions
+
+    # DEX DEX
+    computer.load([0xCA, 0xCA], 0x00)
+    assert computer.cpu.decoded_instructions == {}
+    computer.cpu.registers["PC"].set(0x00)
+    computer.run_fast(2)
+    assert computer.cpu.registers["X"].get() == 0xFF
+
+    # Data past the end of memory is dropped
+    computer.load([0x01, 0x02, 0x03], 0xFFFE)
+    assert computer.memory.read_range(0xFFFE, 0x10000) == bytearray([0x01, 0x02])
+
+
+def test_computer_computer_snapshot():
+    computer = build_run_fast_computer()
+    # 0x0000 LDA #$00
+    # 0x0002 STA $10
+    # 0x0004 INX
+    computer.load([0xA9, 0x00, 0x85, 0x10, 0xE8], 0x00)
+    computer.memory.write(0x10, 0xFF)
+    computer.cpu.registers["PC"].set(0x00)
+    snapshot = computer.snapshot()
+    assert snapshot.registers[computer.cpu.pc_index] == 0x00
+    assert computer.cpu.flags["Z"].status is False
+
+    computer.run_fast(2)
+    assert computer.cpu.flags["Z"].status is True
+    assert computer.cpu.cycles == snapshot.cycles + 5
+    assert computer.memory.read(0x10) == 0x00
+
+    # Code changed after the snapshot is restored too
+    computer.load([0xEA], 0x04)
+    computer.restore(snapshot)
+    assert computer.cpu.registers["PC"].get() == 0x00
+    assert computer.cpu.flags["Z"].status is False
+    assert computer.cpu.cycles == snapshot.cycles
+    assert computer.memory.read(0x04) == 0xE8
+    assert computer.memory.read(0x10) == 0xFF
+
+    computer.run_fast(3)
+    assert computer.cpu.registers["X"].get() == 0x01
+    assert computer.memory.read(0x10) == 0x00
+
+
+def test_computer_computer_clone():
+    template = build_run_fast_computer()
+    # 0x0000 LDA #$00
+    # 0x0002 STA $10
+    # 0x0004 INX
+    template.load([0xA9, 0x00, 0x85, 0x10, 0xE8], 0x00)
+    template.memory.write(0x10, 0xFF)
+    template.cpu.registers["PC"].set(0x00)
+    snapshot = template.snapshot()
+
+    clone = template.clone()
+    assert clone.cpu.instruction_set is template.cpu.instruction_set
+    assert clone.cpu.opcode_table is template.cpu.opcode_table
+    assert clone.cpu.registers["PC"].get() == 0x00
+    assert clone.cpu.cycles == template.cpu.cycles
+    assert clone.memory.read(0x10) == 0xFF
+
+    clone.run_fast(2)
+    assert clone.cpu.flags["Z"].status is True
+    assert clone.memory.read(0x10) == 0x00
+    clone.run_fast(1)
+    assert clone.cpu.registers["X"].get() == 0x01
+    assert template.cpu.flags["Z"].status is False
+    assert template.cpu.registers["PC"].get() == 0x00
+    assert template.cpu.registers["X"].get() == 0x00
+    assert template.cpu.cycles == snapshot.cycles
+    assert template.memory.read(0x10) == 0xFF
+
+    # The template's snapshots can be restored on its clones
+    clone.restore(snapshot)
+    assert clone.cpu.registers["X"].get() == 0x00
+    assert clone.memory.read(0x10) == 0xFF
+    clone.run_fast(2)
+    assert clone.memory.read(0x10) == 0x00
+
+
+def test_computer_computer_clone_mapped_memory(tmp_path):
+    with open("chip/6502.json") as f:
+        cpu = CPU.build_from_json(f.read())
+    memory = MappedMemory()
+    memory.write(0x8000, 0x12)
+    memory.map_rom(0x8000, 0x8100)
+    template = Computer(cpu, memory)
+
+    clone = template.clone()
+    assert isinstance(clone.memory, MappedMemory)
+    clone.memory.write(0x8000, 0x34)
+    clone.memory.write(0x1000, 0x56)
+    assert clone.memory.read(0x8000) == 0x12
+    assert template.memory.read(0x1000) == 0x00
+
+    # ROM images are read-only, including a partial last page
+    path = tmp_path / "rom.bin"
+    path.write_bytes(bytes([0xE8]) * 0x0180)
+    template.load_image(path, 0xA000)
+    clone = template.clone()
+    assert clone.memory.read(0xA17F) == 0xE8
+    assert clone.memory.read(0xA180) == 0x00
+
+    memory.map_buffer(0x9000, bytearray(0x100), readonly=False)
+    with pytest.raises(MemoryMapError):
+        template.clone()
+    memory.unmap_buffer(0x9000, 0x9100)
+    memory.add_io_handler(0x4000, 0x4001, lambda address: 0x00)
+    with pytest.raises(MemoryMapError):
+        template.clone()
+
+
+def test_computer_computer_conditional_breakpoint():
+    with open("chip/6502.json") as f:
+        chip_data = f.read()
+    for run in ["run_fast", "run_compiled"]:
+        computer = Computer.build_from_json(chip_data)
+        # 0x0000 INX
+        # 0x0001 BNE $0000
+        # 0x0003 BRK
+        computer.load([0xE8, 0xD0, 0xFD, 0x00], 0x00)
+        computer.cpu.registers["PC"].set(0x00)
+        computer.cpu.set_breakpoint(0x00, "X == 0x80")
+        computer.cpu.set_breakpoint(0x01, hit_count=200, one_shot=True)
+
+        result = getattr(computer, run)()
+        assert result.reason == StopReason.BREAKPOINT
+        assert result.address == 0x00
+        assert computer.cpu.registers["X"].get() == 0x80
+
+        # The one-shot breakpoint was hit 128 times in the first run,
+        # it stops on its 200th hit and only stops there once
+        computer.cpu.clear_breakpoint(0x00)
+        result = getattr(computer, run)()
+        assert result.address == 0x01
+        assert computer.cpu.registers["X"].get() == 200
+        assert 0x01 not in computer.cpu.cpu_breakpoints
+        result = getattr(computer, run)(trap_brk=True)
+        assert result.reason == StopReason.BRK
+
+
+def test_computer_computer_watchpoint():
+    computer = build_run_fast_computer()
+    # 0x0000 LDA #$42
+    # 0x0002 STA $10
+    # 0x0004 LDX $20
+    # 0x0006 BRK
+    computer.load([0xA9, 0x42, 0x85, 0x10, 0xA6, 0x20, 0x00], 0x00)
+    computer.memory.write(0x10, 0x01)
+    computer.cpu.set_watchpoint(0x10, computer.memory)
+    computer.cpu.set_watchpoint(0x20, computer.memory, 0x30, read=True, write=False)
+
+    with pytest.raises(CPUWatchpoint) as e:
+        computer.run()
+    assert e.value.hits == [WatchpointHit(0x10, 0x01, 0x42, True)]
+    assert computer.cpu.registers["PC"].get() == 0x04
+
+    with pytest.raises(CPUWatchpoint) as e:
+        computer.run()
+    assert e.value.hits == [WatchpointHit(0x20, 0x00, 0x00, False)]
+    assert computer.cpu.registers["PC"].get() == 0x06
+
+
+def test_computer_computer_run_fast_watchpoint():
+    for run in (Computer.run_fast, Computer.run_compiled):
+        computer = build_run_fast_computer()
+        # 0x0000 LDA #$42
+        # 0x0002 STA $10
+        # 0x0004 LDX $20
+        # 0x0006 INX
+        computer.load([0xA9, 0x42, 0x85, 0x10, 0xA6, 0x20, 0xE8], 0x00)
+        computer.memory.write(0x10, 0x01)
+        computer.cpu.set_watchpoint(0x10, computer.memory)
+        computer.cpu.set_watchpoint(0x20, computer.memory, read=True, write=False)
+
+        result = run(computer, 10)
+        assert result.reason == StopReason.WATCHPOINT
+        assert result.address == 0x04
+        assert result.instructions_executed == 2
+        assert result.watchpoint_hits == [WatchpointHit(0x10, 0x01, 0x42, True)]
+        assert computer.cpu.watchpoint_hits == []
+
+        # The reported hits are drained, the next run stops at the next hit
+        result = run(computer, 10)
+        assert result.reason == StopReason.WATCHPOINT
+        assert result.address == 0x06
+        assert result.watchpoint_hits == [WatchpointHit(0x20, 0x00, 0x00, False)]
+
+        result = run(computer, 1)
+        assert result.reason == StopReason.LIMIT
+        assert result.watchpoint_hits == []
+        assert computer.cpu.registers["X"].get() == 0x01
+
+
+def test_computer_computer_run_fast_fetch_reads():
+    traced = []
+
+    def trace(cpu, address, instruction):
+        traced.append(address)
+
+    for run in (Computer.run_fast, Computer.run_compiled):
+        traced.clear()
+        hits = []
+        for trap_brk, trace_hook in [(False, None), (True, None), (True, trace)]:
+            computer = build_run_fast_computer()
+            computer.cpu.set_watchpoint(0x01, computer.memory, read=True, write=False)
+            computer.cpu.set_trace_hook(trace_hook)
+
+            # The opcode is only read once when it is fetched, whether
+            # or not BRK is trapped or instructions are traced
+            result = run(computer, 10, trap_brk=trap_brk)
+            assert result.reason == StopReason.WATCHPOINT
+            assert result.address == 0x02
+            hits.append(result.watchpoint_hits)
+
+        assert hits[0] == [WatchpointHit(0x01, 0xE8, 0xE8, False)]
+        assert hits[1] == hits[0]
+        assert hits[2] == hits[0]
+        assert traced == [0x00, 0x01]
@@ -1,3 +1,5 @@
+import random
+
 import pytest
 
 from bitey.cpu.addressing_mode import (
@@ -54,9 +56,6 @@ def test_cpu_addressing_mode_absolute_get_value(setup):
     assert isinstance(aam, AbsoluteAddressingMode)
 
     value = aam.get_value(computer.cpu.flags, computer.cpu.registers, computer.memory)
-    assert aam.adl == 0x10
-    assert aam.adh == 0x20
-
     assert value == (0x2010, 0x33)
     assert computer.cpu.registers["PC"].get() == 0x0D
 
@@ -82,11 +81,6 @@ def test_cpu_addressing_mode_absolute_indirect_get_value(setup):
 
     value = aam.get_value(computer.cpu.flags, computer.cpu.registers, computer.memory)
 
-    # adl and adh are the effective address low and high bytes
-    # not the original address (PC + 1, PC + 2)
-    assert aam.adl == 0x33
-    assert aam.adh == 0x55
-
     assert value == (0x5533, 0x11)
     assert computer.cpu.registers["PC"].get() == 0x0D
 
@@ -587,9 +581,6 @@ def test_cpu_addressing_mode_absolute_x(setup):
     assert isinstance(axam, AbsoluteXAddressingMode)
 
     value = axam.get_value(computer.cpu.flags, computer.cpu.registers, computer.memory)
-    assert axam.adl == 0x10
-    assert axam.adh == 0x20
-
     assert value == (0x2015, 0x33)
     assert computer.cpu.registers["PC"].value == 13
 
@@ -609,9 +600,6 @@ def test_cpu_addressing_mode_absolute_x_page_crossing(setup):
     assert isinstance(axam, AbsoluteXAddressingMode)
 
     value = axam.get_value(computer.cpu.flags, computer.cpu.registers, computer.memory)
-    assert axam.adl == 0x10
-    assert axam.adh == 0x20
-
     assert value == (0x2105, 0x33)
     assert computer.cpu.registers["PC"].get() == 0x0D
 
@@ -633,9 +621,6 @@ def test_cpu_addressing_mode_absolute_x_eom_wrap(setup):
     (address, value) = axam.get_value(
         computer.cpu.flags, computer.cpu.registers, computer.memory
     )
-    assert axam.adl == 0x10
-    assert axam.adh == 0xFF
-
     assert address == 0x05
     assert value == 0x33
     assert computer.cpu.registers["PC"].get() == 0x0D
@@ -659,9 +644,6 @@ def test_cpu_addressing_mode_absolute_x_eom_nowrap_ffff(setup):
     (address, value) = axam.get_value(
         computer.cpu.flags, computer.cpu.registers, computer.memory
     )
-    assert axam.adl == 0x10
-    assert axam.adh == 0xFF
-
     assert address == 0xFFFF
     assert value == 0xC4
     assert computer.cpu.registers["PC"].get() == 0x0D
@@ -684,9 +666,6 @@ def test_cpu_addressing_mode_absolute_y(setup):
     (address, value) = ayam.get_value(
         computer.cpu.flags, computer.cpu.registers, computer.memory
     )
-    assert ayam.adl == 0x10
-    assert ayam.adh == 0x20
-
     assert value == 0x33
     assert address == 0x2023
     assert computer.cpu.registers["PC"].get() == 0x0D
@@ -709,9 +688,6 @@ def test_cpu_addressing_mode_absolute_y_page_crossing(setup):
     (address, value) = ayam.get_value(
         computer.cpu.flags, computer.cpu.registers, computer.memory
     )
-    assert ayam.adl == 0x10
-    assert ayam.adh == 0x20
-
     assert address == 0x2105
     assert value == 0x33
     assert computer.cpu.registers["PC"].value == 0x0D
@@ -734,9 +710,6 @@ def test_cpu_addressing_mode_absolute_y_eom_wrap(setup):
     (address, value) = ayam.get_value(
         computer.cpu.flags, computer.cpu.registers, computer.memory
     )
-    assert ayam.adl == 0x10
-    assert ayam.adh == 0xFF
-
     assert address == 0x0005
     assert value == 0x33
     assert computer.cpu.registers["PC"].value == 0x0D
@@ -759,9 +732,6 @@ def test_cpu_addressing_mode_absolute_y_eom_nowrap_ffff(setup):
     (address, value) = ayam.get_value(
         computer.cpu.flags, computer.cpu.registers, computer.memory
     )
-    assert ayam.adl == 0x10
-    assert ayam.adh == 0xFF
-
     assert value == 0x33
     assert address == 0xFFFF
     assert computer.cpu.registers["PC"].value == 0x0D
@@ -837,11 +807,6 @@ def test_cpu_addressing_mode_absolute_indirect_page_boundary_bug_get_value(setup
 
     value = aam.get_value(computer.cpu.flags, computer.cpu.registers, computer.memory)
 
-    # adl and adh are the effective address low and high bytes
-    # not the original address (PC + 1, PC + 2)
-    assert aam.adl == 0x33
-    assert aam.adh == 0x55
-
     assert value == (0x5533, 0x11)
     assert computer.cpu.registers["PC"].get() == 0x0D
 
@@ -867,13 +832,44 @@ def test_cpu_addressing_mode_absolute_indirect_page_boundary_bug_wrap_get_value(
 
     value = aam.get_value(computer.cpu.flags, computer.cpu.registers, computer.memory)
 
-    # adl and adh are the effective address low and high bytes
-    # not the original address (PC + 1, PC + 2)
-    assert aam.adl == 0x33
-    assert aam.adh == 0x55
-
     assert value == (0x5533, 0x11)
 
     # Technically, the JMP instruction is the only instruction that uses this "buggy"
     # mode, so this shouldn't matter
     assert computer.cpu.registers["PC"].get() == 0x101
+
+
+@pytest.mark.parametrize(
+    "chip", ["chip/6502.json", "chip/nmos-6502.json", "chip/cmos-6502.json"]
+)
+def test_cpu_addressing_mode_get_operand_value(chip):
+    with open(chip) as f:
+        computer = Computer.build_from_json(f.read())
+    cpu = computer.cpu
+    memory = computer.memory
+    rng = random.Random(6502)
+    memory.memory[:] = bytes(rng.randrange(0x100) for _ in range(0x10000))
+
+    modes = {}
+    for instruction in cpu.opcode_table:
+        if instruction.opcode is not None:
+            addressing_mode = instruction.opcode.addressing_mode
+            modes[type(addressing_mode)] = addressing_mode
+
+    for addressing_mode in modes.values():
+        # Include the addresses at the end of a page
+        for address in [rng.randrange(0xFFFD) for _ in range(50)] + [0x10FE, 0x20FF]:
+            cpu.registers["A"].set(rng.randrange(0x100))
+            cpu.registers["X"].set(rng.randrange(0x100))
+            cpu.registers["Y"].set(rng.randrange(0x100))
+
+            cpu.registers["PC"].set(address + 1)
+            expected = addressing_mode.get_value(cpu.flags, cpu.registers, memory)
+            assert cpu.registers["PC"].get() == address + addressing_mode.bytes
+
+            operand = addressing_mode.read_operand(memory, address)
+            assert len(operand) == addressing_mode.bytes - 1
+            value = addressing_mode.get_operand_value(
+                cpu.flags, cpu.registers, memory, operand
+            )
+            assert value == expected
@@ -0,0 +1,73 @@
+import pytest
+
+from bitey.cpu.breakpoint import Breakpoint, ConditionCompiler, ConditionError
+from bitey.cpu.cpu import CPU
+from bitey.memory.memory import Memory
+
+
+def build_cpu():
+    with open("chip/6502.json") as f:
+        return CPU.build_from_json(f.read())
+
+
+def test_cpu_breakpoint_condition():
+    cpu = build_cpu()
+    memory = Memory(bytearray(0x10000))
+    compiler = ConditionCompiler(cpu)
+
+    cpu.registers["A"].set(0x10)
+    memory.write(0x20, 0x04)
+    test = compiler.compile("A == 0x10 and mem[0x20] > 3")
+    assert test(cpu, memory)
+    memory.write(0x20, 0x03)
+    assert not test(cpu, memory)
+
+    # Flags are 0 or 1, and pending N and Z results are seen
+    cpu.flags.set_nz(0x00)
+    assert compiler.compile("Z == 1 and not n")(cpu, memory)
+    assert compiler.compile("P & 0x02")(cpu, memory)
+
+    cpu.registers["PC"].set(0x1234)
+    cpu.registers["X"].set(0x02)
+    assert compiler.compile("pc == 0x1234 and mem[0x1e + x] == 3")(cpu, memory)
+    # Addresses wrap around the address space
+    assert compiler.compile("mem[0x10020] == 3")(cpu, memory)
+
+
+def test_cpu_breakpoint_condition_restricted():
+    compiler = ConditionCompiler(build_cpu())
+    for condition in [
+        "A ==",
+        "__import__('os')",
+        "A.__class__",
+        "mem",
+        "len(mem)",
+        "Q == 1",
+        "A == 'a'",
+        "[A][0]",
+        "(lambda: 1)()",
+        "A if X else Y",
+    ]:
+        with pytest.raises(ConditionError):
+            compiler.compile(condition)
+
+
+def test_cpu_breakpoint_hit_count():
+    cpu = build_cpu()
+    memory = Memory(bytearray(0x10000))
+    breakpoint = Breakpoint(0x00, hit_count=3)
+    assert [breakpoint.should_stop(cpu, memory) for _ in range(4)] == [
+        False,
+        False,
+        True,
+        True,
+    ]
+
+    # Hits are only counted when the condition is true
+    breakpoint = Breakpoint(0x00, "X == 1", 2)
+    breakpoint.test = ConditionCompiler(cpu).compile(breakpoint.condition)
+    assert not breakpoint.should_stop(cpu, memory)
+    assert breakpoint.hits == 0
+    cpu.registers["X"].set(0x01)
+    assert not breakpoint.should_stop(cpu, memory)
+    assert breakpoint.should_stop(cpu, memory)
@@ -0,0 +1,89 @@
+import os
+
+from bitey.cpu.chip_cache import ChipCache, ChipDefinition, chip_cache
+from bitey.cpu.cpu import CPU
+
+
+def read_chip():
+    with open("chip/6502.json") as f:
+        return f.read()
+
+
+def test_cpu_chip_cache_load(tmp_path):
+    chip_data = read_chip()
+    cache = ChipCache(str(tmp_path))
+    definition = cache.load(chip_data)
+    assert isinstance(definition, ChipDefinition)
+    assert "instructions" not in definition.parsed_json
+    assert "registers" in definition.parsed_json
+    assert os.path.exists(cache.path(definition.key))
+
+    # Loading again in this process returns the same definition
+    assert cache.load(chip_data) is definition
+
+    # Another process loads the cache file instead of decoding the JSON
+    other = ChipCache(str(tmp_path))
+    other.decode = None
+    loaded = other.load(chip_data)
+    assert loaded.key == definition.key
+    assert loaded.instruction_set.opcode_table[0xA9].name == "LDA"
+
+    # A different chip gets a different key
+    assert cache.key(chip_data + " ") != definition.key
+
+
+def test_cpu_chip_cache_invalid_file(tmp_path):
+    chip_data = read_chip()
+    cache = ChipCache(str(tmp_path))
+    key = cache.key(chip_data)
+    with open(cache.path(key), "wb") as f:
+        f.write(b"not a pickle")
+
+    # An invalid file is rebuilt
+    definition = cache.load(chip_data)
+    assert definition.key == key
+    assert ChipCache(str(tmp_path)).read(key).key == key
+
+    # A cache directory that can't be written only caches in memory
+    path = tmp_path / "file"
+    path.write_text("")
+    cache = ChipCache(str(path / "cache"))
+    assert cache.load(chip_data).instruction_set is not None
+
+
+def test_cpu_chip_cache_prune(tmp_path):
+    chip_data = read_chip()
+    cache = ChipCache(str(tmp_path))
+    key = cache.key(chip_data)
+    other_key = cache.key(chip_data + " ")
+    # A file from a changed bitey, one of another chip and one from
+    # before keys started with the chip hash
+    stale = tmp_path / "chip-{}-{}.pickle".format(key.split("-")[0], "0" * 64)
+    other = tmp_path / "chip-{}.pickle".format(other_key)
+    legacy = tmp_path / "chip-{}.pickle".format("0" * 64)
+    for path in (stale, other, legacy):
+        path.write_bytes(b"")
+
+    cache.load(chip_data)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(cache.path(key)), other.name]
+    )
+
+
+def test_cpu_chip_cache_build_from_json():
+    chip_data = read_chip()
+    first = CPU.build_from_json(chip_data)
+    second = CPU.build_from_json(chip_data)
+    assert second.instruction_set is first.instruction_set
+    assert second.registers is not first.registers
+    assert second.flags is not first.flags
+
+    uncached = CPU.build_from_json(chip_data, cache=False)
+    assert uncached.instruction_set is not first.instruction_set
+    assert [str(i) for i in uncached.instruction_set] == [
+        str(i) for i in first.instruction_set
+    ]
+
+    # The tests don't write to the user cache directory
+    assert chip_cache.directory == os.environ["BITEY_CACHE_DIR"]
+    assert os.path.exists(chip_cache.path(chip_cache.key(chip_data)))
@@ -1,4 +1,7 @@
+import pytest
+
 from bitey.cpu.addressing_mode import AccumulatorAddressingMode, ImpliedAddressingMode
+from bitey.cpu.breakpoint import Breakpoint, ConditionError
 from bitey.cpu.cpu import (
     CPU,
     CPUBreakpoint,
@@ -9,6 +12,10 @@ from bitey.cpu.cpu import (
     StackUnderflow,
 )
 from bitey.cpu.instruction.cli import CLI
+from bitey.cpu.instruction.instruction import (
+    UndocumentedInstruction,
+    UndocumentedOpcode,
+)
 from bitey.cpu.instruction.opcode import Opcode
 from bitey.memory.memory import Memory
 
@@ -51,11 +58,48 @@ def test_cpu_cpu_decode_instruction():
     # CLI
     memory.write(0, 0x58)
     instruction = cpu.get_next_instruction(memory)
-    opcode = Opcode(0x58, ImpliedAddressingMode())
+    opcode = Opcode(0x58, ImpliedAddressingMode(), 2)
     expected_instruction = CLI("CLI", opcode, "Clear Interrupt Disable Bit", None)
     assert instruction == expected_instruction
 
 
+def test_cpu_cpu_opcode_table():
+    "Each documented opcode gets its own instruction bound to that opcode"
+    cpu = build_cpu()
+
+    assert len(cpu.opcode_table) == 256
+
+    # LDA immediate and LDA absolute
+    lda_immediate = cpu.opcode_table[0xA9]
+    lda_absolute = cpu.opcode_table[0xAD]
+    assert lda_immediate.short_str() == "LDA"
+    assert lda_absolute.short_str() == "LDA"
+    assert lda_immediate.opcode.opcode == 0xA9
+    assert lda_absolute.opcode.opcode == 0xAD
+    assert lda_immediate is not lda_absolute
+
+    # 0x02 isn't a documented opcode
+    assert isinstance(cpu.opcode_table[0x02], UndocumentedOpcode)
+
+
+def test_cpu_cpu_decode_undocumented_instruction():
+    "Undocumented opcodes decode, but raise when they are executed"
+    cpu = build_cpu()
+    memory = Memory(bytearray(65536))
+    memory.write(0, 0x02)
+
+    instruction = cpu.get_next_instruction(memory)
+    assert isinstance(instruction, UndocumentedOpcode)
+    assert cpu.registers["PC"].get() == 0x01
+
+    try:
+        cpu.execute_instruction(memory)
+    except UndocumentedInstruction as e:
+        assert e.args[0] == 0x02
+    else:
+        assert False
+
+
 def test_cpu_cpu_stack_init():
     cpu = build_cpu()
     cpu.stack_init()
@@ -244,6 +288,27 @@ def test_cpu_cpu_flags_set_updates_p_register():
 # Tests around changing processor state
 
 
+def test_cpu_cpu_fast_register_access():
+    "The fast register properties read and write the register file"
+    cpu = build_cpu()
+
+    cpu.registers["A"].set(0x12)
+    assert cpu.a == 0x12
+    cpu.x = 0x34
+    assert cpu.registers["X"].get() == 0x34
+    cpu.y = 0x56
+    assert cpu.registers["Y"].get() == 0x56
+    cpu.pc = 0x1234
+    assert cpu.registers["PC"].get() == 0x1234
+    cpu.s = 0xFD
+    assert cpu.registers["S"].get() == 0xFD
+
+    # Setting P updates the flags
+    cpu.p = 0x01
+    assert cpu.flags["C"].status
+    assert cpu.flags.data == 0x01
+
+
 def test_cpu_cpu_set_state_change():
     "Test that changing the processor state to a different state works"
     cpu = build_cpu()
@@ -659,3 +724,126 @@ def test_cpu_cpu_clear_breakpoint():
         assert False
     else:
         assert True
+
+
+def test_cpu_cpu_breakpoint_map():
+    """
+    Test that breakpoints switch the CPU to the breakpoint-checking fetch
+    """
+    cpu = build_cpu()
+    cpu.stack_init()
+    # NOP instructions
+    memory = Memory(bytearray([0xEA]) * 65536)
+
+    assert "get_next_instruction" not in cpu.__dict__
+    cpu.set_breakpoint(0x01)
+    assert cpu.breakpoint_map[0x01] == 1
+    assert cpu.get_next_instruction == cpu.get_next_instruction_debug
+
+    # The CPU stops at the breakpoint once, then continues past it
+    cpu.step(memory)
+    with pytest.raises(CPUBreakpoint) as e:
+        cpu.step(memory)
+    assert e.value.address == 0x01
+    cpu.step(memory)
+    assert cpu.registers["PC"].get() == 0x02
+
+    cpu.clear_breakpoint(0x01)
+    assert cpu.breakpoint_map[0x01] == 0
+    assert "get_next_instruction" not in cpu.__dict__
+
+    # Changes to cpu_breakpoints are picked up by update_breakpoints
+    cpu.cpu_breakpoints[0x02] = Breakpoint(0x02)
+    cpu.update_breakpoints()
+    with pytest.raises(CPUBreakpoint):
+        cpu.step(memory)
+
+    # A clone checks its own breakpoints
+    clone = cpu.clone()
+    clone.clear_breakpoint(0x02)
+    assert cpu.breakpoint_map[0x02] == 1
+    clone.step(memory)
+    assert clone.registers["PC"].get() == 0x03
+
+
+def test_cpu_cpu_decoded_instruction_cache():
+    cpu = build_cpu()
+    memory = Memory(bytearray(65536))
+    # 0x0000 LDA #$07
+    # 0x0002 STA $0010
+    memory.write(0x00, 0xA9)
+    memory.write(0x01, 0x07)
+    memory.write(0x02, 0x8D)
+    memory.write(0x03, 0x10)
+    memory.write(0x04, 0x00)
+
+    decoded = cpu.decode_instruction(memory, 0x02)
+    instruction, handler, operand, length, cycles = decoded
+    assert instruction.name == "STA"
+    assert operand == bytes([0x10, 0x00])
+    assert length == 3
+    assert cycles == 4
+    assert cpu.decode_instruction(memory, 0x02) is decoded
+
+    # Executing from the cache
+    cpu.step(memory)
+    cpu.step(memory)
+    assert cpu.registers["PC"].get() == 0x05
+    assert memory.read(0x10) == 0x07
+    assert sorted(cpu.decoded_instructions.keys()) == [0x00, 0x02]
+
+    # Writing to data doesn't drop the cached instructions
+    memory.write(0x10, 0x00)
+    assert sorted(cpu.decoded_instructions.keys()) == [0x00, 0x02]
+
+    # Writing to an operand drops the instruction
+    memory.write(0x04, 0x01)
+    assert sorted(cpu.decoded_instructions.keys()) == [0x00]
+    assert cpu.decode_instruction(memory, 0x02)[2] == bytes([0x10, 0x01])
+
+    # Instructions running past the end of memory aren't cached
+    memory.write(0xFFFF, 0xA9)
+    assert cpu.decode_instruction(memory, 0xFFFF) is None
+    assert 0xFFFF not in cpu.decoded_instructions
+
+    # Decoding from another memory starts a new cache
+    other = Memory(bytearray(65536))
+    assert cpu.decode_instruction(other, 0x02)[0].name == "BRK"
+    assert list(cpu.decoded_instructions.keys()) == [0x02]
+    memory.write(0x02, 0xEA)
+    assert list(cpu.decoded_instructions.keys()) == [0x02]
+
+
+def test_cpu_cpu_cycles():
+    cpu = build_cpu()
+    memory = Memory(bytearray(65536))
+    # 0x0000 LDX #$10
+    # 0x0002 LDA $00F8,X, crosses a page
+    # 0x0005 LDA $0010,X
+    # 0x0008 STA $00F8,X, stores don't take a page crossing penalty
+    # 0x000B CLC
+    # 0x000C BCC $0010, taken
+    # 0x0010 JMP $00FC
+    # 0x00FC BCC $0100, taken and crosses a page
+    # 0x0100 NOP
+    # 0x0101 LDY #$01
+    # 0x0103 LDA ($40),Y, crosses a page
+    # 0x0105 SEC
+    # 0x0106 BCC $0118, not taken
+    program = [0xA2, 0x10, 0xBD, 0xF8, 0x00, 0xBD, 0x10, 0x00, 0x9D, 0xF8, 0x00]
+    program += [0x18, 0x90, 0x02, 0xEA, 0xEA, 0x4C, 0xFC, 0x00]
+    for address, value in enumerate(program):
+        memory.write(address, value)
+    for address, value in enumerate([0x90, 0x02, 0xEA, 0xEA, 0xEA, 0xA0, 0x01]):
+        memory.write(0xFC + address, value)
+    for address, value in enumerate([0xB1, 0x40, 0x38, 0x90, 0x10]):
+        memory.write(0x0103 + address, value)
+    memory.write(0x40, 0xFF)
+    memory.write(0x41, 0x00)
+
+    expected = [2, 5, 4, 5, 2, 3, 3, 4, 2, 2, 6, 2, 2]
+    for cycles in expected:
+        before = cpu.cycles
+        cpu.step(memory)
+        assert cpu.cycles - before == cycles
+    assert cpu.registers["PC"].get() == 0x0108
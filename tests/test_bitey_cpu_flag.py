@@ -1,7 +1,7 @@
 from bitey.cpu.flag.flag import Flag, Flags
 from bitey.cpu.flag.flag_json_decoder import FlagsJSONDecoder
 from bitey.cpu.flag.zero_flag import ZeroFlag
-from bitey.cpu.register import Register
+from bitey.cpu.register import Register, Registers, StatusRegister
 
 
 def test_cpu_flag_init():
@@ -162,6 +162,39 @@ def test_cpu_flags_flag_set():
     assert flags["Z"].status is True
 
 
+def test_cpu_flags_set_bits():
+    s = """
+    [
+    {
+        "short_name": "C",
+        "name": "Carry",
+        "bit_field_pos": 0,
+        "status": 0
+    },
+    {
+        "short_name": "Z",
+        "name": "Zero Result",
+        "bit_field_pos": 1,
+        "status": 0
+    }
+    ]
+    """
+    f = FlagsJSONDecoder()
+    flags = f.decode(s)
+    flags.data = 0
+
+    flags.set_bits(0x03, 0x02)
+    assert flags.data == 2
+    assert flags["C"].status is False
+    assert flags["Z"].status is True
+
+    # Flags outside the mask aren't changed
+    flags.set_bits(0x01, 0x01)
+    assert flags.data == 3
+    assert flags["C"].status is True
+    assert flags["Z"].status is True
+
+
 def test_cpu_flags_json_decoder():
     s = """
     [
@@ -351,3 +384,99 @@ def test_cpu_flags_flags_set_updates_negative_flag():
     assert negative_flag.status
 
     assert (flags.data & 0b10000000) == 0b10000000
+
+
+def build_lazy_flags():
+    s = """
+    [
+    {
+        "short_name": "C",
+        "name": "Carry",
+        "bit_field_pos": 0,
+        "status": 0
+    },
+    {
+        "short_name": "Z",
+        "name": "Zero Result",
+        "bit_field_pos": 1,
+        "status": 0
+    },
+    {
+        "short_name": "N",
+        "name": "Negative Result",
+        "bit_field_pos": 7,
+        "status": 0
+    }
+    ]
+    """
+    flags = FlagsJSONDecoder().decode(s)
+    p = StatusRegister("P", "Processor Status Register", 8, 0)
+    Registers([p])
+    flags.attach_register(p, True)
+
+    return (flags, p)
+
+
+def test_cpu_flags_lazy_nz_status():
+    "The N and Z status is computed from a pending result"
+    (flags, p) = build_lazy_flags()
+
+    flags.set_nz(0x80)
+    assert flags.nz_result == 0x80
+    assert flags["N"].status is True
+    assert flags["Z"].status is False
+
+    flags.set_nz(0x00)
+    assert flags["N"].status is False
+    assert flags["Z"].status is True
+
+    # Reading the status doesn't materialize the result
+    assert flags.nz_result == 0x00
+
+
+def test_cpu_flags_lazy_nz_other_flags():
+    "Setting other flags doesn't materialize the pending result"
+    (flags, p) = build_lazy_flags()
+
+    flags.set_nz(0x80)
+    flags["C"].set()
+    assert flags.nz_result == 0x80
+    assert p.get() == 0x81
+    assert flags.nz_result is None
+
+
+def test_cpu_flags_lazy_nz_register_read():
+    "Reading the status register materializes the pending result"
+    (flags, p) = build_lazy_flags()
+
+    flags.set_nz(0x00)
+    assert p.get() == 0x02
+    assert flags.nz_result is None
+    assert flags["Z"].status is True
+
+    flags.set_nz(0xFF)
+    assert flags.data == 0x80
+    assert flags["Z"].status is False
+
+
+def test_cpu_flags_lazy_nz_register_set():
+    "Setting the status register replaces the pending result"
+    (flags, p) = build_lazy_flags()
+
+    flags.set_nz(0x00)
+    p.set(0x80)
+    assert flags.nz_result is None
+    assert flags["N"].status is True
+    assert flags["Z"].status is False
+    assert p.get() == 0x80
+
+
+def test_cpu_flags_lazy_nz_flag_set():
+    "Setting N or Z directly keeps the other pending flag"
+    (flags, p) = build_lazy_flags()
+
+    flags.set_nz(0x00)
+    flags["N"].set()
+    assert flags["N"].status is True
+    assert flags["Z"].status is True
+    assert flags.data == 0x82
@@ -1,7 +1,13 @@
+import subprocess
+import sys
+
 from bitey.cpu.instruction.opcode import Opcode
 from bitey.cpu.instruction.ld import LDA
 from bitey.cpu.addressing_mode import AbsoluteAddressingMode
-from bitey.cpu.instruction.instruction_factory import InstructionFactory
+from bitey.cpu.instruction.instruction_factory import (
+    InstructionFactory,
+    InstructionRegistry,
+)
 
 
 def test_cpu_instruction_map():
@@ -29,3 +35,41 @@ def test_cpu_instruction_factory_implemented():
     assert instruction.opcode.opcode == 173
     assert instruction.opcode.addressing_mode == AbsoluteAddressingMode()
     assert instruction.description == "Load Accumulator with Memory"
+
+
+def test_cpu_instruction_registry():
+    registry = InstructionRegistry({0xA9: ("ld", "LDA")})
+    assert 0xA9 in registry
+    assert 0xEA not in registry
+    assert registry[0xA9] is LDA
+    assert registry.classes == {0xA9: LDA}
+
+
+# The budget for importing bitey.computer.computer in a new interpreter,
+# in seconds.  This is several times the measured time, so it only
+# catches an import of something large.
+import_time_budget = 0.5
+
+
+def test_cpu_instruction_import_time():
+    "Importing the computer doesn't import the instruction implementations"
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import bitey.computer.computer\n"
+        "print(time.perf_counter() - start)\n"
+        "print(' '.join(sorted(sys.modules)))\n"
+    )
+    times = []
+    for _ in range(3):
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+        (import_time, modules) = result.stdout.splitlines()
+        times.append(float(import_time))
+
+    modules = modules.split()
+    assert "bitey.cpu.instruction.adc" not in modules
+    assert "bitey.cpu.instruction.ld" not in modules
+    assert "bitey.cpu.jit" not in modules
+    assert min(times) < import_time_budget
@@ -34,3 +34,20 @@ def test_cpu_instruction_opcodes_json_decoder():
     assert 154 in opcodes
     assert opcodes[154].opcode == 154
     assert opcodes[154].addressing_mode == ImpliedAddressingMode()
+
+
+def test_cpu_instruction_opcode_json_decoder_cycles():
+    json_string = (
+        '{ "opcode": 189, "addressing_mode": "absolute_x", "bytes": 3,'
+        ' "cycles": 4, "page_cross_cycles": 1 }'
+    )
+    opcode_decoder = OpcodeJSONDecoder()
+    opcode = opcode_decoder.decode(json_string)
+
+    assert opcode.cycles == 4
+    assert opcode.page_cross_cycles == 1
+
+    # Opcodes without timing information take no cycles
+    opcode = opcode_decoder.decode('{ "opcode": 154, "addressing_mode": "implied" }')
+    assert opcode.cycles == 0
+    assert opcode.page_cross_cycles == 0
@@ -0,0 +1,268 @@
+import random
+
+import pytest
+
+from bitey.computer.computer import Computer, StopReason
+from bitey.cpu.cpu import CPU
+from bitey.cpu.instruction.instruction import UndocumentedOpcode
+from bitey.cpu.jit import BlockCompiler, LockstepMismatch
+from bitey.memory.mapped_memory import MappedMemory, ROMWriteError
+
+
+def build_computer(program=None, chip="chip/6502.json"):
+    with open(chip) as f:
+        chip_data = f.read()
+        computer = Computer.build_from_json(chip_data)
+
+    if program is not None:
+        computer.load(program, 0x00)
+    computer.cpu.registers["PC"].set(0x00)
+
+    return computer
+
+
+# 0x0000 LDX #$00
+# 0x0002 INX
+# 0x0003 CLC
+# 0x0004 ADC #$01
+# 0x0006 STA $10
+# 0x0008 BNE $0002
+# 0x000A JMP $0000
+loop_program = [0xA2, 0x00, 0xE8, 0x18, 0x69, 0x01, 0x85, 0x10, 0xD0, 0xF8]
+loop_program += [0x4C, 0x00, 0x00]
+
+
+def test_cpu_jit_matches_run_fast():
+    compiled = build_computer(loop_program)
+    interpreted = build_computer(loop_program)
+
+    result = compiled.run_compiled(1000)
+    expected = interpreted.run_fast(1000)
+
+    assert result == expected
+    assert compiled.cpu.register_data == interpreted.cpu.register_data
+    assert compiled.cpu.registers["P"].get() == interpreted.cpu.registers["P"].get()
+    assert compiled.memory.memory == interpreted.memory.memory
+    assert (
+        compiled.cpu.num_instructions_executed
+        == interpreted.cpu.num_instructions_executed
+    )
+    assert compiled.cpu.cycles == interpreted.cpu.cycles
+
+
+def test_cpu_jit_block_cache():
+    computer = build_computer(loop_program)
+
+    # One pass through each of the first two blocks
+    computer.run_compiled(11)
+    compiler = computer.block_compiler
+    assert sorted(compiler.blocks.keys()) == [0x00, 0x02]
+    block = compiler.blocks[0x02]
+    assert (block.start, block.end, block.count) == (0x02, 0x0A, 5)
+
+    # Writing to data doesn't drop any blocks
+    computer.memory.write(0x10, 0x00)
+    assert sorted(compiler.blocks.keys()) == [0x00, 0x02]
+
+    # Writing to the code drops the blocks compiled from it
+    computer.memory.write(0x05, 0x02)
+    assert compiler.blocks == {}
+    assert not block.valid
+
+
+def test_cpu_jit_limit_inside_block():
+    computer = build_computer(loop_program)
+
+    result = computer.run_compiled(3)
+
+    assert result.reason == StopReason.LIMIT
+    assert result.instructions_executed == 3
+    assert computer.cpu.registers["PC"].get() == 0x04
+
+
+def test_cpu_jit_self_modifying_code():
+    # 0x0000 LDA #$07
+    # 0x0002 STA $0006, the operand of the LDX
+    # 0x0005 LDX #$01
+    # 0x0007 BRK
+    program = [0xA9, 0x07, 0x8D, 0x06, 0x00, 0xA2, 0x01, 0x00]
+
+    for lockstep in (False, True):
+        computer = build_computer(program)
+
+        result = computer.run_compiled(trap_brk=True, lockstep=lockstep)
+
+        assert result.reason == StopReason.BRK
+        assert result.address == 0x07
+        assert result.instructions_executed == 3
+        assert computer.cpu.registers["X"].get() == 0x07
+
+
+def test_cpu_jit_breakpoint():
+    # 0x0000 INX
+    # 0x0001 INX
+    # 0x0002 INX
+    # 0x0003 BRK
+    # 0x0004 0x02, an undocumented opcode
+    computer = build_computer([0xE8, 0xE8, 0xE8, 0x00, 0x02])
+    computer.cpu.set_breakpoint(0x01)
+
+    result = computer.run_compiled()
+    assert result.reason == StopReason.BREAKPOINT
+    assert result.address == 0x01
+    assert computer.cpu.registers["X"].get() == 0x01
+
+    result = computer.run_compiled(trap_brk=True)
+    assert result.reason == StopReason.BRK
+    assert result.address == 0x03
+    assert computer.cpu.registers["X"].get() == 0x03
+
+    computer.cpu.registers["PC"].set(0x04)
+    result = computer.run_compiled()
+    assert result.reason == StopReason.ILLEGAL_OPCODE
+    assert result.address == 0x04
+
+
+def test_cpu_jit_lockstep_mismatch():
+    computer = build_computer(loop_program)
+    compiler = BlockCompiler(computer.cpu, computer.memory)
+    block = compiler.compile_block(0x00)
+    function = block.function
+
+    def broken():
+        count = function()
+        computer.cpu.registers["X"].set(0x42)
+        return count
+
+    block.function = broken
+
+    with pytest.raises(LockstepMismatch) as e:
+        compiler.run(6, lockstep=True)
+    assert e.value.address == 0x00
+    assert e.value.differences == ["X: expected 0x01, got 0x42"]
+
+
+def test_cpu_jit_lockstep_mapped_memory():
+    with open("chip/6502.json") as f:
+        cpu = CPU.build_from_json(f.read())
+    memory = MappedMemory()
+    buffer = bytearray(0x100)
+    memory.map_buffer(0x9000, buffer, readonly=False)
+    computer = Computer(cpu, memory)
+    # 0x0000 INC $9000
+    # 0x0003 INX
+    # 0x0004 JMP $0000
+    computer.load([0xEE, 0x00, 0x90, 0xE8, 0x4C, 0x00, 0x00], 0x00)
+    computer.cpu.registers["PC"].set(0x00)
+
+    # Pages backed by other buffers are restored before the block is
+    # run again with the interpreter
+    computer.run_compiled(3, lockstep=True)
+    assert buffer[0] == 0x01
+
+    # And compared after
+    compiler = computer.get_block_compiler()
+    block = compiler.blocks[0x00]
+    function = block.function
+
+    def broken():
+        count = function()
+        buffer[1] = 0x42
+        return count
+
+    block.function = broken
+    with pytest.raises(LockstepMismatch) as e:
+        compiler.run(3, lockstep=True)
+    assert e.value.differences == ["0x9001: expected 0x00, got 0x42"]
+
+
+def test_cpu_jit_exception_state():
+    states = []
+    for run in (Computer.run_fast, Computer.run_compiled):
+        with open("chip/6502.json") as f:
+            cpu = CPU.build_from_json(f.read())
+        memory = MappedMemory(trap_rom_writes=True)
+        memory.map_rom(0xF000, 0xF100)
+        computer = Computer(cpu, memory)
+        # 0x0000 LDA #$42
+        # 0x0002 INX
+        # 0x0003 STA $F000
+        # 0x0006 INX
+        # 0x0007 JMP $0000
+        computer.load([0xA9, 0x42, 0xE8, 0x8D, 0x00, 0xF0, 0xE8, 0x4C, 0x00, 0x00])
+        computer.cpu.registers["PC"].set(0x00)
+        executed = computer.cpu.num_instructions_executed
+
+        with pytest.raises(ROMWriteError):
+            run(computer, 5)
+        registers = computer.cpu.registers
+        states.append(
+            (
+                registers["A"].get(),
+                registers["X"].get(),
+                registers["PC"].get(),
+                computer.cpu.cycles,
+            )
+        )
+
+    # The registers are written back when a compiled block raises
+    assert states[1] == states[0]
+    assert states[0][:3] == (0x42, 0x01, 0x06)
+    assert computer.cpu.num_instructions_executed == executed + 2
+
+
+def test_cpu_jit_page_cross_side_effects():
+    for run in (Computer.run_fast, Computer.run_compiled):
+        with open("chip/6502.json") as f:
+            cpu = CPU.build_from_json(f.read())
+        memory = MappedMemory()
+        reads = []
+
+        def read_pointer(address):
+            reads.append(address)
+            return memory.peek(address)
+
+        # The pointer is 0x0201, reads of it are counted
+        memory.write_range(0x10, [0x01, 0x02])
+        memory.add_io_handler(0x10, 0x12, read_pointer)
+        memory.write(0x0300, 0x42)
+        computer = Computer(cpu, memory)
+        # 0x0000 LDY #$FF
+        # 0x0002 LDA ($10),Y
+        # 0x0004 JMP $0000
+        computer.load([0xA0, 0xFF, 0xB1, 0x10, 0x4C, 0x00, 0x00], 0x00)
+        computer.cpu.registers["PC"].set(0x00)
+
+        # The page crossing check doesn't read the pointer again
+        result = run(computer, 3)
+        assert computer.cpu.registers["A"].get() == 0x42
+        assert reads == [0x10, 0x11]
+        assert result.cycles == 2 + 6 + 3
+
+
+@pytest.mark.parametrize(
+    "chip", ["chip/6502.json", "chip/nmos-6502.json", "chip/cmos-6502.json"]
+)
+def test_cpu_jit_lockstep_random_programs(chip):
+    computer = build_computer(chip=chip)
+    opcodes = [
+        opcode
+        for opcode in range(0x100)
+        if not isinstance(computer.cpu.opcode_table[opcode], UndocumentedOpcode)
+    ]
+
+    rng = random.Random(6502)
+    for _ in range(5):
+        # Every byte is a documented opcode, so jumps and branches
+        # almost always land on valid code
+        computer.memory.write_range(
+            0, bytes(rng.choice(opcodes) for _ in range(0x10000))
+        )
+        computer.cpu.registers["PC"].set(rng.randrange(0x0200, 0xF000))
+        computer.cpu.registers["A"].set(rng.randrange(0x100))
+        computer.cpu.registers["X"].set(rng.randrange(0x100))
+        computer.cpu.registers["P"].set(rng.randrange(0x100))
+
+        compiler = BlockCompiler(computer.cpu, computer.memory)
+        result = compiler.run(300, lockstep=True)
+        assert result.reason in (StopReason.LIMIT, StopReason.ILLEGAL_OPCODE)
@@ -151,3 +151,32 @@ def test_cpu_register_watcher():
     register.register(listener)
     listener.register_callback(lambda register: assert_register_equals(register, 10))
     register.set(10)
+
+
+def test_cpu_registers_register_file():
+    "Registers in a set share one register file"
+    a = Register("A", "Accumulator", 8, 0x12)
+    x = Register("X", "Index register X", 8, 0x34)
+    registers = Registers([a, x])
+
+    assert registers.data == [0x12, 0x34]
+    assert registers.index("A") == 0
+    assert registers.index("X") == 1
+
+    a.set(0x56)
+    assert registers.data[0] == 0x56
+
+    registers.data[1] = 0x78
+    assert x.get() == 0x78
+    assert x.value == 0x78
+
+
+def test_cpu_register_no_listeners():
+    "Registers without listeners don't need a Listener to be updated"
+    register = Register("A", "Accumulator", 8, 0)
+    assert register.listeners == []
+    register.set(10)
+    register.inc()
+    register.dec()
+    register.add(1)
+    assert register.get() == 11
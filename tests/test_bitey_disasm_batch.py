@@ -0,0 +1,54 @@
+import random
+
+from bitey.disasm.batch import BatchDisassembler, DisassemblyCache
+from bitey.disasm.disassembler import Disassembler
+
+
+def build_disassembler():
+    with open("chip/6502.json") as f:
+        return Disassembler.build_from_json(f.read())
+
+
+def test_disasm_batch_split_points():
+    batch = BatchDisassembler(build_disassembler(), chunk_size=4)
+    # 0x0000 LDA #$01
+    # 0x0002 STA $1234
+    # 0x0005 CLC
+    # 0x0006 JMP $0000
+    data = bytes([0xA9, 0x01, 0x8D, 0x34, 0x12, 0x18, 0x4C, 0x00, 0x00])
+    assert batch.split_points(data) == [5, 9]
+    assert batch.split_points(b"") == [0]
+
+
+def test_disasm_batch_matches_serial(tmp_path):
+    disassembler = build_disassembler()
+    generator = random.Random(1)
+    images = [
+        (bytes(generator.randrange(256) for _ in range(size)), start)
+        for (size, start) in [(0x1000, 0xC000), (0x10, 0x0000), (0, 0x8000)]
+    ]
+    batch = BatchDisassembler(disassembler, max_workers=2, chunk_size=0x100)
+
+    listings = batch.disassemble_images(images)
+    assert listings == [disassembler.disassemble(d, s) for (d, s) in images]
+
+    path = tmp_path / "image.bin"
+    path.write_bytes(images[0][0])
+    assert batch.disassemble_files([path], 0xC000) == listings[:1]
+
+
+def test_disasm_batch_cache(tmp_path):
+    disassembler = build_disassembler()
+    cache = DisassemblyCache(str(tmp_path))
+    batch = BatchDisassembler(disassembler, cache, max_workers=1)
+    data = bytes([0x18, 0xE8])
+    assert batch.disassemble_image(data) == "0000  18        CLC\n0001  e8        INX"
+
+    key = cache.key(disassembler, data, 0)
+    assert cache.read(key) == "0000  18        CLC\n0001  e8        INX"
+    assert cache.key(disassembler, data, 0x1000) != key
+
+    # Cached listings are used without disassembling the image again
+    with open(cache.path(key), "w") as f:
+        f.write("cached")
+    assert batch.disassemble_image(data) == "cached"
@@ -0,0 +1,98 @@
+from bitey.computer.computer import Computer
+from bitey.disasm.control_flow import RecursiveDisassembler
+from bitey.disasm.disassembler import Disassembler
+
+
+def build_image():
+    "A 16K ROM image at 0xC000 with code, data and interrupt vectors"
+    image = bytearray(0x4000)
+    # 0xC000 LDX #$05
+    # 0xC002 JSR $C00B
+    # 0xC005 DEX
+    # 0xC006 BNE $C002
+    # 0xC008 JMP $C008
+    # 0xC00B RTS
+    # 0xC00C two data bytes
+    # 0xC00E RTI
+    image[0:15] = bytes(
+        [0xA2, 0x05, 0x20, 0x0B, 0xC0, 0xCA, 0xD0, 0xFA, 0x4C, 0x08, 0xC0]
+        + [0x60, 0xFF, 0xFF, 0x40]
+    )
+    image[0x3FFA:] = bytes([0x0E, 0xC0, 0x00, 0xC0, 0x0E, 0xC0])
+    return image
+
+
+def build_recursive_disassembler():
+    with open("chip/6502.json") as f:
+        return RecursiveDisassembler(Disassembler.build_from_json(f.read()))
+
+
+def test_disasm_control_flow_graph():
+    disassembler = build_recursive_disassembler()
+    image = build_image()
+    graph = disassembler.analyze(image, 0xC000)
+
+    assert sorted(graph.blocks) == [0xC000, 0xC002, 0xC005, 0xC008, 0xC00B, 0xC00E]
+    assert graph.blocks[0xC000].successors == [0xC002]
+    assert graph.blocks[0xC002].calls == [0xC00B]
+    assert graph.blocks[0xC002].successors == [0xC005]
+    assert graph.blocks[0xC005].instructions == [0xC005, 0xC006]
+    assert graph.blocks[0xC005].successors == [0xC002, 0xC008]
+    assert graph.blocks[0xC008].successors == [0xC008]
+    assert graph.blocks[0xC00B].successors == []
+    assert graph.block_at(0xC006) is graph.blocks[0xC005]
+    assert graph.block_at(0xC00C) is None
+
+    assert graph.labels[0xC000] == "reset"
+    assert graph.labels[0xC00E] == "nmi"
+    assert graph.labels[0xC00B] == "sub_c00b"
+    assert graph.labels[0xC002] == "loc_c002"
+
+    assert graph.is_code(0xC00B)
+    assert not graph.is_code(0xC00C)
+    assert graph.coverage() == (13, 0x4000 - 13)
+
+    # Without vectors, analysis starts at the given entry points
+    graph = disassembler.analyze(image[:0x10], 0xC000, [0xC00B])
+    assert list(graph.blocks) == [0xC00B]
+
+
+def test_disasm_control_flow_lines():
+    disassembler = build_recursive_disassembler()
+    image = build_image()
+    graph = disassembler.analyze(image, 0xC000)
+    lines = disassembler.lines(graph, image)
+    assert [next(lines) for _ in range(14)] == [
+        "reset:",
+        "c000  a2 05     LDX  #$05",
+        "loc_c002:",
+        "c002  20 0b c0  JSR  sub_c00b",
+        "c005  ca        DEX",
+        "c006  d0 fa     BNE  loc_c002",
+        "loc_c008:",
+        "c008  4c 08 c0  JMP  loc_c008",
+        "sub_c00b:",
+        "c00b  60        RTS",
+        "c00c  ff ff     .byte  $ff,$ff",
+        "nmi:",
+        "c00e  40        RTI",
+        "c00f  00 00 00  .byte  $00,$00,$00",
+    ]
+
+
+def test_disasm_control_flow_precompile():
+    with open("chip/6502.json") as f:
+        chip_data = f.read()
+    computer = Computer.build_from_json(chip_data)
+    image = build_image()
+    computer.load(image, 0xC000)
+    computer.cpu.registers["PC"].set(0xC000)
+
+    graph = RecursiveDisassembler(Disassembler.build_from_json(chip_data)).analyze(
+        image, 0xC000
+    )
+    assert computer.precompile(graph.blocks) == len(graph.blocks)
+    blocks = dict(computer.block_compiler.blocks)
+    computer.run_compiled(17)
+    assert computer.cpu.registers["X"].get() == 0x01
+    assert all(computer.block_compiler.blocks[a] is b for (a, b) in blocks.items())
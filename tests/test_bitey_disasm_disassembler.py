@@ -0,0 +1,59 @@
+from bitey.computer.computer import Computer
+from bitey.disasm.disassembler import Disassembler
+from bitey.memory.memory import Memory
+
+
+def build_disassembler():
+    with open("chip/6502.json") as f:
+        return Disassembler.build_from_json(f.read())
+
+
+def test_disasm_disassembler_tables():
+    disassembler = build_disassembler()
+    assert disassembler.mnemonics[0xA9] == "LDA"
+    assert disassembler.modes[0xA9] == "immediate"
+    assert disassembler.lengths[0xA9] == 2
+    assert disassembler.lengths[0x4C] == 3
+    # BRK is decoded as one byte, like the CPU decodes it
+    assert disassembler.lengths[0x00] == 1
+    assert disassembler.mnemonics[0x02] == "INV"
+    assert disassembler.lengths[0x02] == 1
+
+
+def test_disasm_disassembler_lines():
+    disassembler = build_disassembler()
+    data = bytes(
+        [0xA9, 0x42, 0x8D, 0x00, 0x40, 0xB5, 0x10, 0x6C, 0x34, 0x12]
+        + [0xB1, 0x20, 0xD0, 0xF4, 0x0A, 0x02, 0x18]
+    )
+    lines = disassembler.lines(data, 0xC000)
+    assert next(lines) == "c000  a9 42     LDA  #$42"
+    assert list(lines) == [
+        "c002  8d 00 40  STA  $4000",
+        "c005  b5 10     LDA  $10,X",
+        "c007  6c 34 12  JMP  ($1234)",
+        "c00a  b1 20     LDA  ($20),Y",
+        "c00c  d0 f4     BNE  $c002",
+        "c00e  0a        ASL",
+        "c00f  02        INV",
+        "c010  18        CLC",
+    ]
+
+    # An instruction cut off by the end of the data is invalid
+    assert disassembler.disassemble(memoryview(data)[:4]) == (
+        "0000  a9 42     LDA  #$42\n0002  8d 00     INV"
+    )
+
+
+def test_disasm_disassembler_matches_computer():
+    with open("chip/6502.json") as f:
+        chip_data = f.read()
+    computer = Computer.build_from_json(chip_data)
+    disassembler = Disassembler.build_from_json(chip_data)
+    data = bytearray([0x18, 0x02, 0xE6, 0xCC, 0xBD, 0x00, 0x80, 0x10, 0xFE, 0x00])
+    computer.memory = Memory(data)
+    computer.cpu.registers["PC"].set(0x1234)
+
+    listing = disassembler.disassemble(computer.memory.memory)
+    assert computer.cpu.registers["PC"].get() == 0x1234
+    assert listing == computer.disassemble()
@@ -0,0 +1,262 @@
+import pytest
+
+from bitey.computer.computer import Computer
+from bitey.cpu.cpu import CPU
+from bitey.memory.mapped_memory import MappedMemory, MemoryMapError, ROMWriteError
+from bitey.memory.memory import MemoryOutOfRange
+
+
+def test_memory_mapped_memory_ram():
+    memory = MappedMemory()
+    assert len(memory) == 0x10000
+
+    memory.write(0x1234, 0x56)
+    assert memory.read(0x1234) == 0x56
+    assert memory.memory[0x1234] == 0x56
+    assert memory.read_range(0x1233, 0x1236) == bytearray([0x00, 0x56, 0x00])
+
+    with pytest.raises(MemoryOutOfRange):
+        memory.read(0x10000)
+    with pytest.raises(MemoryOutOfRange):
+        memory.read(-1)
+    with pytest.raises(MemoryOutOfRange):
+        memory.write(0x10000, 0x00)
+
+
+def test_memory_mapped_memory_rom():
+    memory = MappedMemory()
+    memory.write(0x8000, 0x12)
+    memory.map_rom(0x8000, 0x10000)
+
+    # Writes to ROM are ignored
+    memory.write(0x8000, 0x34)
+    assert memory.read(0x8000) == 0x12
+    memory.write(0x7FFF, 0x34)
+    assert memory.read(0x7FFF) == 0x34
+
+    memory.map_rom(0x8000, 0x10000, readonly=False)
+    memory.write(0x8000, 0x34)
+    assert memory.read(0x8000) == 0x34
+
+    with pytest.raises(MemoryMapError):
+        memory.map_rom(0x8000, 0x8010)
+
+
+def test_memory_mapped_memory_io_handler():
+    memory = MappedMemory()
+    written = []
+    memory.add_io_handler(
+        0x4000,
+        0x4004,
+        lambda address: address & 0xFF,
+        lambda address, value: written.append((address, value)),
+    )
+
+    assert memory.read(0x4003) == 0x03
+    memory.write(0x4001, 0x41)
+    assert written == [(0x4001, 0x41)]
+    assert memory.memory[0x4001] == 0x00
+
+    # The rest of the page is still RAM
+    memory.write(0x4004, 0x42)
+    assert memory.read(0x4004) == 0x42
+    assert memory.read_range(0x4002, 0x4006) == bytearray([0x02, 0x03, 0x42, 0x00])
+
+    # A device with only a read handler writes through to RAM
+    memory.add_io_handler(0x4010, 0x4011, read_handler=lambda address: 0xFF)
+    memory.write(0x4010, 0x10)
+    assert memory.read(0x4010) == 0xFF
+    assert memory.memory[0x4010] == 0x10
+
+    memory.remove_io_handler(0x4000, 0x4004)
+    assert memory.read(0x4003) == 0x00
+    assert 0x40 in memory.io_pages
+    memory.remove_io_handler(0x4010, 0x4011)
+    assert memory.io_pages == {}
+    assert memory.read(0x4010) == 0x10
+
+
+def test_memory_mapped_memory_computer():
+    with open("chip/6502.json") as f:
+        cpu = CPU.build_from_json(f.read())
+    memory = MappedMemory()
+    output = []
+    memory.add_io_handler(0x4000, 0x4001, lambda address: 0x21)
+    memory.add_io_handler(0x4001, 0x4002, None, lambda address, v: output.append(v))
+    computer = Computer(cpu, memory)
+
+    # 0x0000 LDA $4000
+    # 0x0003 STA $4001
+    # 0x0006 STA $10
+    computer.load([0xAD, 0x00, 0x40, 0x8D, 0x01, 0x40, 0x85, 0x10], 0x00)
+    computer.cpu.registers["PC"].set(0x00)
+    computer.run_fast(3)
+
+    assert output == [0x21]
+    assert memory.read(0x10) == 0x21
+
+
+def test_memory_mapped_memory_map_buffer():
+    memory = MappedMemory()
+    rom = bytes(range(0x100)) * 2
+    memory.map_buffer(0x8000, rom)
+
+    assert memory.read(0x8001) == 0x01
+    assert memory.read(0x81FF) == 0xFF
+    assert memory.read_range(0x80FE, 0x8102) == bytearray([0xFE, 0xFF, 0x00, 0x01])
+    # The memory bytearray isn't used for mapped pages
+    assert memory.memory[0x8001] == 0x00
+
+    # A read-only buffer can't be written
+    memory.write(0x8001, 0x42)
+    assert memory.read(0x8001) == 0x01
+    with pytest.raises(MemoryMapError):
+        memory.map_rom(0x8000, 0x8100, readonly=False)
+    with pytest.raises(MemoryMapError):
+        memory.map_buffer(0x8000, rom, readonly=False)
+    with pytest.raises(MemoryMapError):
+        memory.map_buffer(0x8000, bytes(0x10))
+
+    # A writable buffer can be mapped as RAM
+    ram = bytearray(0x100)
+    memory.map_buffer(0x9000, ram, readonly=False)
+    memory.write_range(0x8FFF, [0x01, 0x02, 0x03])
+    assert ram[:2] == bytearray([0x02, 0x03])
+    assert memory.read(0x8FFF) == 0x01
+
+    assert memory.memory_dump(0x80FE).startswith("0x80fe  fe ff 00 01")
+
+    memory.unmap_buffer(0x8000, 0x8200)
+    assert memory.read(0x8001) == 0x00
+    memory.write(0x8001, 0x42)
+    assert memory.read(0x8001) == 0x42
+
+
+def test_memory_mapped_memory_trap_rom_writes():
+    memory = MappedMemory(trap_rom_writes=True)
+    memory.map_rom(0xF000, 0x10000)
+
+    with pytest.raises(ROMWriteError) as e:
+        memory.write(0xF123, 0x00)
+    assert e.value.address == 0xF123
+    with pytest.raises(ROMWriteError) as e:
+        memory.write_range(0xEFFF, [0x00, 0x00])
+    assert e.value.address == 0xF000
+
+    memory.trap_rom_writes = False
+    memory.write(0xF123, 0x00)
+
+
+def test_memory_mapped_memory_snapshot():
+    memory = MappedMemory()
+    memory.write(0x8000, 0x12)
+    memory.map_rom(0x8000, 0x8100)
+    memory.map_buffer(0x9000, bytes([0x34]) * 0x100)
+    snapshot = memory.snapshot()
+    assert snapshot[0x80][0x00] == 0x12
+    assert snapshot[0x90][0x00] == 0x34
+
+    memory.write(0x1000, 0x56)
+    memory.unmap_buffer(0x9000, 0x9100)
+    memory.write(0x9000, 0x78)
+    memory.restore(snapshot)
+    assert memory.read(0x1000) == 0x00
+    assert memory.read(0x8000) == 0x12
+    # Remapped pages are restored into their current backing
+    assert memory.read(0x9000) == 0x34
+
+
+def test_memory_mapped_memory_banks():
+    memory = MappedMemory()
+    banks = [bytearray([bank]) * 0x4000 for bank in range(4)]
+    region = memory.map_banks(0x8000, banks, register=0x4000)
+    assert memory.read(0x8000) == 0x00
+
+    memory.select_bank(region, 2)
+    assert region.bank == 2
+    assert memory.read(0xBFFF) == 0x02
+    memory.write(0x8000, 0x22)
+    assert banks[2][0] == 0x22
+
+    # The bank register selects the bank modulo the number of banks
+    memory.write(0x4000, 0x05)
+    assert region.bank == 1
+    assert memory.read(0x8000) == 0x01
+    memory.write(0x4000, 0x02)
+    assert memory.read(0x8000) == 0x22
+
+    with pytest.raises(MemoryMapError):
+        memory.select_bank(region, 4)
+    with pytest.raises(MemoryMapError):
+        memory.map_banks(0x8000, [bytearray(0x100), bytearray(0x200)])
+    with pytest.raises(MemoryMapError):
+        memory.map_banks(0x8000, [bytes(0x100)])
+
+    rom = memory.map_banks(0xC000, [bytes([0x10]) * 0x100, bytes([0x11]) * 0x100], True)
+    memory.select_bank(rom, 1)
+    memory.write(0xC000, 0x00)
+    assert memory.read(0xC000) == 0x11
+
+
+def test_memory_mapped_memory_banks_snapshot():
+    memory = MappedMemory()
+    banks = [bytearray(0x1000) for bank in range(2)]
+    region = memory.map_banks(0x8000, banks)
+    memory.write(0x8000, 0xAA)
+    snapshot = memory.snapshot()
+    assert snapshot.banks == (0,)
+
+    memory.select_bank(region, 1)
+    memory.write(0x8001, 0xBB)
+    memory.restore(snapshot)
+    # The saved bank is selected again and the writes to the other
+    # bank are rolled back too
+    assert region.bank == 0
+    assert memory.read(0x8000) == 0xAA
+    assert banks[1][0] == 0x00
+    assert banks[1][1] == 0x00
+
+    # Snapshots taken with another bank selected save every bank
+    memory.select_bank(region, 1)
+    memory.write(0x8002, 0xCC)
+    snapshot = memory.snapshot()
+    assert snapshot.banks == (1,)
+    memory.write(0x8002, 0xDD)
+    memory.select_bank(region, 0)
+    memory.write(0x8000, 0xEE)
+    memory.write(0x9000, 0xFF)
+    memory.restore(snapshot)
+    assert region.bank == 1
+    assert memory.read(0x8002) == 0xCC
+    assert banks[0][0] == 0xAA
+    assert memory.read(0x9000) == 0x00
+
+    # Unmodified bank pages are shared between snapshots
+    again = memory.snapshot()
+    assert again.bank_pages[0][0][0] is snapshot.bank_pages[0][0][0]
+
+    # Without banked regions snapshots are plain tuples
+    assert type(MappedMemory().snapshot()) is tuple
+
+
+def test_memory_mapped_memory_banks_computer():
+    with open("chip/6502.json") as f:
+        cpu = CPU.build_from_json(f.read())
+    memory = MappedMemory()
+    banks = [bytearray([bank]) * 0x1000 for bank in range(2)]
+    memory.map_banks(0x8000, banks, register=0x4000)
+    computer = Computer(cpu, memory)
+
+    # 0x0000 LDA $8000
+    # 0x0003 LDX #$01
+    # 0x0005 STX $4000
+    # 0x0008 ADC $8000
+    # 0x000B PHA
+    computer.load(
+        [0xAD, 0x00, 0x80, 0xA2, 0x01, 0x8E, 0x00, 0x40, 0x6D, 0x00, 0x80, 0x48], 0x00
+    )
+    computer.cpu.registers["PC"].set(0x00)
+    computer.run_fast(5)
+
+    assert computer.cpu.registers["A"].get() == 0x01
+    assert memory.read(0x0100 + computer.cpu.registers["S"].get() + 1) == 0x01
@@ -1,4 +1,4 @@
-from bitey.memory.memory import Memory, MemoryOutOfRange
+from bitey.memory.memory import Memory, MemoryOutOfRange, WatchpointHit
 
 
 def test_memory_init():
@@ -164,11 +164,36 @@ def test_memory_memory_range_dump_specified_range_non_16_byte_multiple_length():
     m = Memory(b)
 
     expected_test_result = """0x0010  10 11 12 13 14 15 16 17  18 19 1a 1b 1c 1d 1e 1f
-0x0020  20 21 22 23 24 25 26 27  28 29 2a 2b 2c 2d 2e 2f"""
+0x0020  20 21 22 23 24 25 26 27  28 29 2a 2b 2c 2d 2e 2f
+0x0030  30 31 32"""
 
     assert expected_test_result == m.memory_range_dump(range(0x10, 0x33))
 
 
+def test_memory_memory_range_dump_ascii():
+    "Test memory_range_dump with the ASCII column"
+    b = bytes(range(256)) * 10
+    m = Memory(b)
+
+    expected_test_result = """0x003b  3b 3c 3d 3e 3f 40 41 42  43 44 45 46 47 48 49 4a  |;<=>?@ABCDEFGHIJ|
+0x004b  4b 4c 4d 4e 4f 50 51 52  53 54 55 56 57 58 59 5a  |KLMNOPQRSTUVWXYZ|
+0x005b  5b 5c 5d 5e 5f 60 61 62                           |[\\]^_`ab|"""
+
+    assert expected_test_result == m.memory_range_dump(range(0x3B, 0x63), ascii=True)
+    assert m.memory_range_dump(range(0x7E, 0x82), ascii=True).endswith("|~...|")
+
+
+def test_memory_memory_dump_lines():
+    "Test streaming a dump larger than a chunk"
+    m = Memory(2**16)
+    m.write(0xFFFF, 0x42)
+
+    lines = list(m.memory_dump_lines(range(0x0000, 0x10000)))
+    assert len(lines) == 0x1000
+    assert lines[0x100] == "0x1000  00 00 00 00 00 00 00 00  00 00 00 00 00 00 00 00"
+    assert lines[-1].endswith("00 42")
+
+
 def test_memory_memory_range_dump_too_small():
     "Test memory_range_dump with a start less than the memory start"
     b = bytes(range(0x20))
@@ -191,3 +216,134 @@ def test_memory_memory_range_dump_too_large():
         assert False
     except MemoryOutOfRange:
         assert True
+
+
+def test_memory_code_listener():
+    memory = Memory(2**16)
+    changes = []
+    memory.add_code_listener(lambda start, end: changes.append((start, end)))
+
+    # Writes to pages without code don't notify the listeners
+    memory.write(0x0210, 0x01)
+    assert changes == []
+
+    memory.mark_code(0x0200, 0x0310)
+    memory.write(0x0210, 0x02)
+    memory.write(0x0300, 0x03)
+    memory.write(0x0400, 0x04)
+    assert changes == [(0x0210, 0x0211), (0x0300, 0x0301)]
+
+    # A reset changes all the code and clears the code pages
+    memory.reset()
+    assert changes[-1] == (0x0000, 0x10000)
+    memory.write(0x0210, 0x05)
+    assert len(changes) == 3
+
+
+def test_memory_snapshot():
+    memory = Memory(2**16)
+    memory.write(0x0210, 0x01)
+    first = memory.snapshot()
+    assert len(first) == 0x100
+    assert first[0x02][0x10] == 0x01
+    assert memory.dirty_pages() == []
+
+    # Only the written pages are copied, the rest are shared
+    memory.write(0x0310, 0x02)
+    memory.write_range(0x04FF, [0x03, 0x04])
+    assert memory.dirty_pages() == [0x03, 0x04, 0x05]
+    second = memory.snapshot()
+    assert second[0x02] is first[0x02]
+    assert second[0x03] is not first[0x03]
+    assert second[0x05][0x00] == 0x04
+
+    memory.restore(first)
+    assert memory.read(0x0310) == 0x00
+    assert memory.read(0x0500) == 0x00
+    assert memory.read(0x0210) == 0x01
+    memory.restore(second)
+    assert memory.read(0x0310) == 0x02
+    assert memory.dirty_pages() == []
+
+
+def test_memory_snapshot_restore_code():
+    memory = Memory(2**16)
+    changes = []
+    memory.add_code_listener(lambda start, end: changes.append((start, end)))
+    memory.mark_code(0x0200, 0x0300)
+    snapshot = memory.snapshot()
+
+    # Restoring a clean page doesn't change the code on it
+    memory.restore(snapshot)
+    assert changes == []
+
+    memory.write(0x0210, 0x01)
+    memory.restore(snapshot)
+    assert changes == [(0x0210, 0x0211), (0x0200, 0x0300)]
+    assert memory.read(0x0210) == 0x00
+
+
+def test_memory_clone():
+    memory = Memory(0x10000)
+    memory.write(0x1000, 0x12)
+    memory.add_watchpoint(0x2000)
+    snapshot = memory.snapshot()
+    memory.write(0x3000, 0x34)
+
+    clone = memory.clone()
+    assert clone.read(0x1000) == 0x12
+    assert clone.read(0x3000) == 0x34
+    assert clone.watchpoints == {}
+    clone.write(0x1000, 0x56)
+    assert memory.read(0x1000) == 0x12
+
+    # Pages unchanged since the snapshot are shared with it
+    clone_snapshot = clone.snapshot()
+    assert clone_snapshot[0x00] is snapshot[0x00]
+    assert clone_snapshot[0x10] is not snapshot[0x10]
+    assert clone_snapshot[0x30] is not snapshot[0x30]
+
+    clone.restore(snapshot)
+    assert clone.read(0x1000) == 0x12
+    assert clone.read(0x3000) == 0x00
+
+
+def test_memory_watchpoint():
+    memory = Memory(2**16)
+    hits = []
+    memory.add_watch_listener(hits.append)
+    memory.add_watchpoint(0x0210)
+    memory.add_watchpoint(0x0300, 0x0310, read=True, write=False)
+    assert memory.page_flags[0x02] == Memory.write_watch_page
+    assert memory.page_flags[0x03] == Memory.read_watch_page
+    assert memory.page_flags[0x04] == 0
+
+    memory.write(0x0211, 0x01)
+    memory.write(0x0210, 0x02)
+    memory.write(0x0210, 0x03)
+    memory.write(0x0300, 0x04)
+    assert hits == [
+        WatchpointHit(0x0210, 0x00, 0x02, True),
+        WatchpointHit(0x0210, 0x02, 0x03, True),
+    ]
+
+    hits.clear()
+    assert memory.read(0x030F) == 0x00
+    assert memory.read(0x0310) == 0x00
+    assert memory.read_range(0x02FF, 0x0302) == bytearray([0x00, 0x04, 0x00])
+    memory.write_range(0x020F, [0x05, 0x06])
+    assert hits == [
+        WatchpointHit(0x030F, 0x00, 0x00, False),
+        WatchpointHit(0x0300, 0x04, 0x04, False),
+        WatchpointHit(0x0301, 0x00, 0x00, False),
+        WatchpointHit(0x0210, 0x03, 0x06, True),
+    ]
+    assert str(hits[-1]) == "Watchpoint write 0x0210: 0x03 -> 0x06"
+
+    # Reads are only checked while there are read watchpoints
+    memory.remove_watchpoint(0x0300, 0x0310)
+    assert "read" not in memory.__dict__
+    assert memory.page_flags[0x03] == 0
+    hits.clear()
+    memory.read(0x0300)
+    assert hits == []
@@ -0,0 +1,103 @@
+import subprocess
+import sys
+
+from bitey.computer.computer import Computer
+from bitey.cpu.cpu import CPU
+from bitey.memory.shared_memory import SharedMemory
+
+
+def test_memory_shared_memory():
+    memory = SharedMemory(0x1000)
+    try:
+        assert len(memory) == 0x1000
+        memory.write(0x0123, 0x45)
+
+        reader = SharedMemory.attach(memory.name)
+        assert len(reader) == 0x1000
+        assert reader.read(0x0123) == 0x45
+        assert reader.memory[0x0123] == 0x45
+
+        # Writes are visible to the reader without copying
+        memory.write_range(0x0200, [0x01, 0x02])
+        assert bytes(reader.memory[0x0200:0x0202]) == bytes([0x01, 0x02])
+
+        memory.reset()
+        assert reader.read(0x0123) == 0x00
+        reader.close()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def test_memory_shared_memory_attach_process():
+    memory = SharedMemory(0x1000)
+    try:
+        memory.write(0x0123, 0x45)
+        reader = (
+            "import sys\n"
+            "from bitey.memory.shared_memory import SharedMemory\n"
+            "reader = SharedMemory.attach(sys.argv[1])\n"
+            "print(reader.read(0x0123))\n"
+            "reader.close()\n"
+        )
+        for _ in range(2):
+            # A reader exiting doesn't free the block for the others
+            result = subprocess.run(
+                [sys.executable, "-c", reader, memory.name],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            assert result.stdout.strip() == str(0x45)
+        SharedMemory.attach(memory.name).close()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def test_memory_shared_memory_generation():
+    with open("chip/6502.json") as f:
+        cpu = CPU.build_from_json(f.read())
+    memory = SharedMemory()
+    try:
+        computer = Computer(cpu, memory)
+        reader = SharedMemory.attach(memory.name)
+        assert reader.generation == 0
+
+        # INX INX INX
+        computer.load([0xE8, 0xE8, 0xE8], 0x00)
+        computer.cpu.registers["PC"].set(0x00)
+        computer.run_fast(2)
+        assert reader.generation == 2
+        computer.run_compiled(1)
+        assert reader.generation == 4
+        computer.step()
+        assert reader.generation == 6
+
+        # run steps the CPU in one batch, the counter stays odd
+        # while the instructions run
+        generations = []
+        computer.cpu.set_trace_hook(
+            lambda cpu, pc, instruction: generations.append(reader.generation)
+        )
+        computer.set_instructions_executed_limit(
+            computer.cpu.num_instructions_executed + 2
+        )
+        computer.load([0xE8, 0xE8], 0x03)
+        computer.run()
+        computer.cpu.set_trace_hook(None)
+        assert generations and all(generation == 7 for generation in generations)
+        assert reader.generation == 8
+
+        (frame, generation) = reader.read_frame()
+        assert generation == 8
+        assert frame[:3] == bytes([0xE8, 0xE8, 0xE8])
+
+        # A copy during a batch isn't consistent
+        memory.begin_batch()
+        assert reader.read_frame(retries=1) is None
+        memory.end_batch()
+        reader.close()
+    finally:
+        memory.close()
+        memory.unlink()